@@ -1 +1,15 @@
-from .main import create_app  # noqa
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .main import create_app  # noqa
+
+
+def __getattr__(name: str) -> Any:
+    # The application is imported on first use (for example by `uvicorn app:create_app --factory`),
+    # so importing `app.settings` doesn't import FastAPI and the models.
+    if name == "create_app":
+        from .main import create_app
+
+        return create_app
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,51 +1,234 @@
-from typing import Generator
+from typing import TYPE_CHECKING, AsyncGenerator, Generator
 
-from fastapi import FastAPI, Depends
+from functools import partial
+import asyncio
+import logging
+
+from fastapi import FastAPI, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.future import Engine
 from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app_utils.replicas import REPLICA_SESSION_INFO_KEY, ReadYourWritesMiddleware, ReplicaPool, use_replica
 from app_utils.typing import APIFactory
 
 from .settings import Settings, get_settings
 
+if TYPE_CHECKING:
+    from app_model.coupon.service import CouponValidityCache
+    from app_model.customer_coupon.eligibility import EligibleCouponView
+
+logger = logging.getLogger(__name__)
+
+
+def create_database_engine(settings: Settings) -> "Engine":
+    """
+    Creates a new database engine (and connection pool) from the given settings.
+
+    The application creates a single engine in `create_app()`, use this method
+    only if you need an engine outside of the application (for example in the CLI).
+
+    Arguments:
+        settings: The settings to create the engine from.
+    """
+    return create_engine(settings.database_url, **_make_engine_args(settings, settings.database_url))
+
+
+def create_async_database_engine(settings: Settings) -> AsyncEngine | None:
+    """
+    Creates a new async database engine (and connection pool) from the given settings
+    if `settings.database_async_url` is set.
+
+    Arguments:
+        settings: The settings to create the engine from.
+    """
+    url = settings.database_async_url
+    return None if url is None else create_async_engine(url, **_make_engine_args(settings, url))
+
+
+def create_replica_database_engines(settings: Settings) -> list["Engine"]:
+    """
+    Creates the engines (and connection pools) of the read replicas in `settings.database_replica_urls`.
+
+    Arguments:
+        settings: The settings to create the engines from.
+    """
+    return [create_engine(url, **_make_engine_args(settings, url)) for url in settings.database_replica_urls]
+
 
-def get_database_engine(settings: Settings = Depends(get_settings)) -> "Engine":
+def create_async_replica_database_engines(settings: Settings) -> list[AsyncEngine]:
     """
-    Returns a database engine instance.
+    Creates the async engines (and connection pools) of the read replicas in `settings.database_async_replica_urls`.
+
+    Arguments:
+        settings: The settings to create the engines from.
+    """
+    return [
+        create_async_engine(url, **_make_engine_args(settings, url)) for url in settings.database_async_replica_urls
+    ]
+
+
+def _make_engine_args(settings: Settings, url: str) -> dict:
     """
-    if settings.database_url.startswith("sqlite"):
-        connect_args = {"check_same_thread": False}
+    Returns the engine arguments for the given database URL based on the settings.
+
+    Arguments:
+        settings: The settings to create the engine arguments from.
+        url: The URL of the database.
+    """
+    engine_args: dict = {
+        "echo": settings.database_echo,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+        "pool_recycle": settings.database_pool_recycle,
+    }
+
+    if url.startswith("sqlite"):
+        engine_args["connect_args"] = {"check_same_thread": False}
     else:
-        connect_args = {}
+        engine_args["pool_size"] = settings.database_pool_size
+        engine_args["max_overflow"] = settings.database_max_overflow
+
+    return engine_args
+
+
+def get_database_engine(request: Request) -> "Engine":
+    """
+    FastAPI dependency that returns the database engine of the application.
+    """
+    return request.app.state.database_engine
+
+
+def get_replica_database_engine(request: Request) -> "Engine | None":
+    """
+    FastAPI dependency that returns the engine of a read replica if the application has replicas
+    and the request can be served by one (see `app_utils.replicas.use_replica()`), `None` otherwise.
+    """
+    replicas: "ReplicaPool[Engine] | None" = getattr(request.app.state, "database_replicas", None)
+    return replicas.get() if replicas is not None and use_replica(request) else None
+
+
+def get_database_session(
+    engine: "Engine" = Depends(get_database_engine),
+    replica_engine: "Engine | None" = Depends(get_replica_database_engine),
+) -> Generator[Session, None, None]:
+    """
+    Session provider FastAPI dependency. Read requests use a read replica if possible,
+    see `app_utils.replicas.is_replica_session()`.
+    """
+    with Session(
+        engine if replica_engine is None else replica_engine,
+        info={REPLICA_SESSION_INFO_KEY: replica_engine is not None},
+    ) as session:
+        yield session
+
 
-    return create_engine(settings.database_url, echo=settings.database_echo, connect_args=connect_args)
+def get_async_database_engine(request: Request) -> AsyncEngine:
+    """
+    FastAPI dependency that returns the async database engine of the application.
+    """
+    return request.app.state.async_database_engine
 
 
-def get_database_session(engine: "Engine" = Depends(get_database_engine)) -> Generator[Session, None, None]:
+def get_async_replica_database_engine(request: Request) -> AsyncEngine | None:
     """
-    Session provider FastAPI dependency.
+    FastAPI dependency that returns the async engine of a read replica if the application has async
+    replicas and the request can be served by one, `None` otherwise.
     """
-    with Session(engine) as session:
+    replicas: "ReplicaPool[AsyncEngine] | None" = getattr(request.app.state, "async_database_replicas", None)
+    return replicas.get() if replicas is not None and use_replica(request) else None
+
+
+async def get_async_database_session(
+    engine: AsyncEngine = Depends(get_async_database_engine),
+    replica_engine: AsyncEngine | None = Depends(get_async_replica_database_engine),
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async session provider FastAPI dependency. Read requests use a read replica if possible,
+    see `app_utils.replicas.is_replica_session()`.
+    """
+    async with AsyncSession(
+        engine if replica_engine is None else replica_engine,
+        info={REPLICA_SESSION_INFO_KEY: replica_engine is not None},
+    ) as session:
         yield session
 
 
-def register_routes(app: FastAPI, *, api_prefix="/api/v1") -> None:
+def register_routes(
+    app: FastAPI,
+    *,
+    api_prefix="/api/v1",
+    coupon_validity_cache: "CouponValidityCache | None" = None,
+    eligible_coupon_view: "EligibleCouponView | None" = None,
+    async_database: bool = False,
+    fast_serialization: bool = False,
+) -> None:
     """
     Registers all the routes of the application.
 
     Arguments:
         app: The FastAPI application where the routes should be registered.
         api_prefix: API prefix for the included routes.
+        coupon_validity_cache: Optional coupon validity cache for the coupon API.
+        eligible_coupon_view: Optional eligible coupon view for the coupon, customer and customer coupon APIs.
+        async_database: Whether the routes that support it should use the async session provider.
+        fast_serialization: Whether list routes should serialize database rows directly to JSON.
     """
     from app_model.coupon.api import make_api as make_coupon_api
     from app_model.customer.api import make_api as make_customer_api
     from app_model.customer_coupon.api import make_api as make_customer_coupon_api
 
-    api_factories: tuple[APIFactory, ...] = (make_coupon_api, make_customer_api, make_customer_coupon_api)
+    api_factories: tuple[APIFactory, ...] = (
+        partial(
+            make_coupon_api,
+            validity_cache=coupon_validity_cache,
+            eligible_coupon_view=eligible_coupon_view,
+            fast_serialization=fast_serialization,
+        ),
+        partial(make_customer_api, eligible_coupon_view=eligible_coupon_view, fast_serialization=fast_serialization),
+        partial(
+            make_customer_coupon_api,
+            eligible_coupon_view=eligible_coupon_view,
+            fast_serialization=fast_serialization,
+        ),
+    )
+
+    async_session_provider = get_async_database_session if async_database else None
 
     # Register all APIs with the same settings.
     for make_api in api_factories:
-        app.include_router(make_api(session_provider=get_database_session), prefix=api_prefix)
+        app.include_router(
+            make_api(session_provider=get_database_session, async_session_provider=async_session_provider),
+            prefix=api_prefix,
+        )
+
+
+async def _run_redemption_compaction(engine: "Engine", *, interval: float, settle_seconds: float) -> None:
+    """
+    Compacts the coupon redemption counters every `interval` seconds until cancelled.
+
+    Arguments:
+        engine: The database engine.
+        interval: The time between compactions in seconds.
+        settle_seconds: The minimum age of the compacted redemptions in seconds.
+    """
+    from app_model.coupon_redemption.service import CouponRedemptionService
+    from app_utils.service import CommitFailed
+
+    def compact() -> None:
+        with Session(engine) as session:
+            CouponRedemptionService(session).compact(settle_seconds=settle_seconds)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(compact)
+        except CommitFailed:
+            # Another worker compacted the same redemptions, the next run compacts the remaining ones.
+            logger.info("Redemption compaction skipped.", exc_info=True)
+        except Exception:
+            logger.exception("Redemption compaction failed.")
 
 
 def create_app() -> FastAPI:
@@ -58,15 +241,148 @@ def create_app() -> FastAPI:
 
     app = FastAPI()
 
+    # -- Database
+
+    # The engine owns the connection pool, it must be shared by all requests.
+    app.state.database_engine = create_database_engine(settings)
+    app.state.async_database_engine = create_async_database_engine(settings)
+
+    # Read requests are served by the replicas (if there are any), except for the clients that wrote recently.
+    replica_engines = create_replica_database_engines(settings)
+    async_replica_engines = create_async_replica_database_engines(settings)
+    app.state.database_replicas = ReplicaPool(replica_engines) if replica_engines else None
+    app.state.async_database_replicas = ReplicaPool(async_replica_engines) if async_replica_engines else None
+    if replica_engines or async_replica_engines:
+        app.add_middleware(ReadYourWritesMiddleware, window=settings.database_replica_window)
+
     @app.on_event("startup")
     def on_startup() -> None:
         from app_model import initialize_database
 
-        engine = get_database_engine(get_settings())
-        initialize_database(engine)
+        initialize_database(app.state.database_engine)
+
+    # -- Redemption counter compaction
+
+    app.state.redemption_compaction_task = None
+    if settings.redemption_compaction_interval > 0:
+
+        @app.on_event("startup")
+        async def start_redemption_compaction() -> None:
+            app.state.redemption_compaction_task = asyncio.create_task(
+                _run_redemption_compaction(
+                    app.state.database_engine,
+                    interval=settings.redemption_compaction_interval,
+                    settle_seconds=settings.redemption_compaction_settle,
+                )
+            )
+
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        if app.state.redemption_compaction_task is not None:
+            app.state.redemption_compaction_task.cancel()
+
+        app.state.database_engine.dispose()
+        if app.state.async_database_engine is not None:
+            await app.state.async_database_engine.dispose()
+
+        for engine in replica_engines:
+            engine.dispose()
+        for async_engine in async_replica_engines:
+            await async_engine.dispose()
+
+    # -- Metrics
+
+    if settings.metrics:
+        from app_utils.metrics import (
+            PROMETHEUS_CONTENT_TYPE,
+            MetricsMiddleware,
+            RequestMetrics,
+            instrument_engine,
+        )
+
+        app.state.metrics = RequestMetrics()
+        app.add_middleware(MetricsMiddleware, metrics=app.state.metrics, server_timing=settings.metrics_server_timing)
+
+        instrument_engine(app.state.database_engine)
+        if app.state.async_database_engine is not None:
+            instrument_engine(app.state.async_database_engine.sync_engine)
+        for engine in replica_engines:
+            instrument_engine(engine)
+        for async_engine in async_replica_engines:
+            instrument_engine(async_engine.sync_engine)
+
+        @app.get("/metrics", include_in_schema=False)
+        def get_metrics() -> Response:
+            return Response(app.state.metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    # -- Idempotency keys
+
+    if settings.idempotency_ttl > 0:
+        from app_model.idempotency.store import DatabaseIdempotencyStore
+        from app_utils.idempotency import IdempotencyMiddleware
+
+        idempotency_store = DatabaseIdempotencyStore(
+            app.state.database_engine,
+            ttl=settings.idempotency_ttl,
+            lock_timeout=settings.idempotency_lock_timeout,
+            cache_size=settings.idempotency_cache_size,
+        )
+        # Added after the metrics middleware, so only executed requests are included in the metrics.
+        app.add_middleware(
+            IdempotencyMiddleware,
+            store=idempotency_store,
+            max_body_size=settings.idempotency_max_body_size,
+            max_response_size=settings.idempotency_max_response_size,
+        )
+
+        @app.on_event("startup")
+        def delete_expired_idempotency_keys() -> None:
+            idempotency_store.delete_expired()
+
+    # -- Caches
+
+    coupon_validity_cache: "CouponValidityCache | None" = None
+    if settings.coupon_validity_cache_size > 0:
+        from app_utils.cache import TTLCache
+
+        coupon_validity_cache = TTLCache(
+            max_size=settings.coupon_validity_cache_size, ttl=settings.coupon_validity_cache_ttl
+        )
+
+    eligible_coupon_view: "EligibleCouponView | None" = None
+    if settings.eligible_coupon_view_size > 0:
+        from app_model.customer_coupon.eligibility import EligibleCouponView
+
+        eligible_coupon_view = EligibleCouponView(
+            max_size=settings.eligible_coupon_view_size, ttl=settings.eligible_coupon_view_ttl
+        )
 
     # -- Routing
 
-    register_routes(app, api_prefix=settings.api_prefix)
+    register_routes(
+        app,
+        api_prefix=settings.api_prefix,
+        coupon_validity_cache=coupon_validity_cache,
+        eligible_coupon_view=eligible_coupon_view,
+        async_database=app.state.async_database_engine is not None,
+        fast_serialization=settings.fast_serialization,
+    )
+
+    # -- Profiling
+
+    if settings.profiling:
+        from pathlib import Path
+
+        from app_utils.profiling import ProfilingMiddleware, instrument_routes
+
+        instrument_routes(app.routes)
+        app.add_middleware(
+            ProfilingMiddleware,
+            directory=Path(settings.profiling_dir),
+            header=settings.profiling_header,
+            secret=settings.profiling_secret,
+            sample_rate=settings.profiling_sample_rate,
+            max_profiles=settings.profiling_max_profiles,
+        )
 
     return app
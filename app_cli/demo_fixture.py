@@ -3,7 +3,7 @@ import random
 
 from sqlmodel import Session, select
 
-from app.main import get_database_engine
+from app.main import create_database_engine
 from app.settings import get_settings
 
 from app_model import initialize_database
@@ -16,7 +16,7 @@ def run_fixture():
     """
     Executes the demo fixture.
     """
-    engine = get_database_engine(get_settings())
+    engine = create_database_engine(get_settings())
     initialize_database(engine)
 
     now = datetime.utcnow()
@@ -0,0 +1,237 @@
+from typing import Any, Iterable, Iterator, NamedTuple
+
+from datetime import datetime, timedelta
+from enum import Enum
+import csv
+import io
+import random
+import time
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.future import Engine
+
+from app_model import initialize_database
+from app_model.coupon.model import CouponTable, DiscountType
+from app_model.customer.model import CustomerTable
+from app_model.customer_coupon.model import CustomerCouponTable
+
+
+class Distribution(str, Enum):
+    """
+    Distribution of the generated customer-coupon links among customers.
+    """
+
+    uniform = "uniform"
+    skewed = "skewed"  # A small number of customers get most of the coupons.
+
+
+class InsertStats(NamedTuple):
+    """
+    Insert statistics of a single table.
+    """
+
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def iter_customer_rows(count: int) -> Iterator[dict[str, Any]]:
+    """
+    Yields `count` customer rows with IDs starting from 1.
+    """
+    now = datetime.utcnow()
+    for i in range(count):
+        yield {"id": i + 1, "username": f"gen{i:09d}", "name": f"Customer {i}", "created_at": now, "version": 1}
+
+
+def iter_coupon_rows(count: int, *, seed: int) -> Iterator[dict[str, Any]]:
+    """
+    Yields `count` coupon rows with IDs starting from 1 and random validity windows around the current time.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    for i in range(count):
+        valid_from = now + timedelta(hours=rng.randint(-24 * 60, 24 * 30))
+        yield {
+            "id": i + 1,
+            "code": f"GEN{i:09d}",
+            "description": f"Coupon {i}",
+            "discount": rng.randint(1, 50),
+            "discount_type": DiscountType.percent if rng.random() < 0.5 else DiscountType.fix,
+            "valid_from": valid_from,
+            "valid_until": valid_from + timedelta(hours=rng.randint(1, 24 * 90)),
+            "created_at": now,
+            # COPY only writes the given columns, Python-side defaults are not applied.
+            "uses": 0,
+            "version": 1,
+        }
+
+
+def iter_link_rows(
+    count: int, *, customers: int, coupons: int, seed: int, distribution: Distribution
+) -> Iterator[dict[str, Any]]:
+    """
+    Yields `count` unique customer-coupon links without keeping the generated links in memory.
+
+    Link `k` belongs to coupon `k % coupons` and to the `k // coupons`th customer after a random
+    starting customer of the coupon, so links are unique as long as `count <= customers * coupons`.
+    The starting customer is drawn from the given distribution.
+
+    Raises:
+        ValueError: If more links are requested than there are customer-coupon pairs.
+    """
+    if count > customers * coupons:
+        raise ValueError("More links requested than there are customer-coupon pairs.")
+
+    rng = random.Random(seed)
+    if distribution == Distribution.uniform:
+        starts = [rng.randrange(customers) for _ in range(min(count, coupons))]
+    else:
+        starts = [int(customers * rng.random() ** 4) for _ in range(min(count, coupons))]
+
+    for k in range(count):
+        coupon, offset = k % coupons, k // coupons
+        yield {"customer_id": (starts[coupon] + offset) % customers + 1, "coupon_id": coupon + 1}
+
+
+def _copy_batch(engine: Engine, table: Any, batch: list[dict[str, Any]]) -> None:
+    """
+    Inserts the given rows with PostgreSQL `COPY`.
+    """
+    columns = list(batch[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        writer.writerow(v.value if isinstance(v, Enum) else v for v in row.values())
+    buffer.seek(0)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.copy_expert(  # type: ignore[attr-defined]
+            f"COPY {table.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def insert_rows(engine: Engine, table: Any, rows: Iterable[dict[str, Any]], *, batch_size: int = 50_000) -> int:
+    """
+    Inserts the given rows in batches, one transaction per batch.
+
+    PostgreSQL databases are loaded with `COPY`, other databases with Core bulk inserts.
+    ORM objects are never constructed.
+
+    Arguments:
+        engine: The engine of the database to insert the rows into.
+        table: The table (model) to insert the rows into.
+        rows: The rows to insert. Every row must have the same keys.
+        batch_size: The number of rows per statement and transaction.
+
+    Returns:
+        The number of inserted rows.
+    """
+    use_copy = engine.dialect.name == "postgresql"
+    count = 0
+
+    def flush(batch: list[dict[str, Any]]) -> None:
+        if use_copy:
+            _copy_batch(engine, table, batch)
+        else:
+            with engine.begin() as connection:
+                connection.execute(insert(table), batch)
+
+    batch: list[dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            flush(batch)
+            count += len(batch)
+            batch = []
+
+    if batch:
+        flush(batch)
+        count += len(batch)
+
+    return count
+
+
+def _sync_sequence(engine: Engine, table: Any) -> None:
+    """
+    Moves the ID sequence of the given table past the explicitly inserted IDs on PostgreSQL.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    name = table.__tablename__
+    with engine.begin() as connection:
+        connection.execute(
+            text(f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), coalesce(max(id), 1)) FROM {name}")
+        )
+
+
+def generate(
+    engine: Engine,
+    *,
+    customers: int,
+    coupons: int,
+    links: int,
+    seed: int = 0,
+    distribution: Distribution = Distribution.uniform,
+    batch_size: int = 50_000,
+    clear: bool = False,
+) -> list[InsertStats]:
+    """
+    Generates synthetic customers, coupons and customer-coupon links.
+
+    Arguments:
+        engine: The engine of the database to fill.
+        customers: The number of customers to generate.
+        coupons: The number of coupons to generate.
+        links: The number of customer-coupon links to generate.
+        seed: Random seed, the same seed generates the same data.
+        distribution: Distribution of links among customers.
+        batch_size: The number of rows per statement and transaction.
+        clear: Whether to delete existing customers, coupons and links first.
+
+    Returns:
+        Insert statistics per table.
+
+    Raises:
+        ValueError: If the database is not empty and `clear` is not set, or if more links
+            are requested than there are customer-coupon pairs.
+    """
+    if links > customers * coupons:
+        raise ValueError("More links requested than there are customer-coupon pairs.")
+
+    initialize_database(engine)
+    tables = (CustomerCouponTable, CouponTable, CustomerTable)
+    with engine.begin() as connection:
+        if clear:
+            for table in tables:
+                connection.execute(delete(table))
+        elif any(connection.execute(select(func.count()).select_from(table)).scalar() for table in tables):
+            raise ValueError("The database is not empty.")
+
+    result: list[InsertStats] = []
+    for table, rows in (
+        (CustomerTable, iter_customer_rows(customers)),
+        (CouponTable, iter_coupon_rows(coupons, seed=seed)),
+        (
+            CustomerCouponTable,
+            iter_link_rows(links, customers=customers, coupons=coupons, seed=seed, distribution=distribution),
+        ),
+    ):
+        start = time.perf_counter()
+        count = insert_rows(engine, table, rows, batch_size=batch_size)
+        result.append(InsertStats(table.__tablename__, count, time.perf_counter() - start))
+
+    _sync_sequence(engine, CustomerTable)
+    _sync_sequence(engine, CouponTable)
+    return result
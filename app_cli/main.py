@@ -1,4 +1,12 @@
-from typer import Typer
+from typing import Optional
+
+from pathlib import Path
+
+from typer import Option, Typer
+
+from app_utils.serialization import FileFormat
+
+from .generate import Distribution
 
 
 def create_cli_app() -> Typer:
@@ -17,6 +25,142 @@ def create_cli_app() -> Typer:
         else:
             raise ValueError("Unknown fixture")
 
+    @app.command()
+    def generate(
+        customers: int = 1_000,
+        coupons: int = 10_000,
+        links: int = 10_000,
+        seed: int = 0,
+        distribution: Distribution = Distribution.uniform,
+        batch_size: int = 50_000,
+        clear: bool = Option(False, help="Delete existing customers, coupons and links first."),
+    ):
+        """
+        Generates synthetic customers, coupons and customer-coupon links in the configured database.
+        """
+        from app.main import create_database_engine
+        from app.settings import get_settings
+
+        from .generate import generate
+
+        engine = create_database_engine(get_settings())
+        try:
+            stats = generate(
+                engine,
+                customers=customers,
+                coupons=coupons,
+                links=links,
+                seed=seed,
+                distribution=distribution,
+                batch_size=batch_size,
+                clear=clear,
+            )
+        finally:
+            engine.dispose()
+
+        for item in stats:
+            print(f"{item.table}: {item.rows} rows in {item.seconds:.2f}s ({item.rows_per_second:,.0f} rows/sec)")
+
+    @app.command("import")
+    def import_coupons(
+        path: Path,
+        format: Optional[FileFormat] = Option(None, help="The format of the file, by default its extension."),
+        batch_size: int = 5000,
+        workers: Optional[int] = Option(None, help="Parallel insert workers, by default 4 on PostgreSQL, else 1."),
+        max_errors: int = Option(20, help="The maximum number of rejected rows to print."),
+    ):
+        """
+        Imports coupons from a CSV or NDJSON file into the configured database.
+        """
+        from sqlmodel import Session
+
+        from app.main import create_database_engine
+        from app.settings import get_settings
+        from app_model import initialize_database
+        from app_model.coupon.importer import import_coupons
+
+        if format is None:
+            format = FileFormat(path.suffix.lstrip(".").lower())
+
+        engine = create_database_engine(get_settings())
+        try:
+            initialize_database(engine)
+            with Session(engine) as session, path.open(encoding="utf-8", newline="") as file:
+                result = import_coupons(
+                    session, file, format=format, batch_size=batch_size, workers=workers, max_errors=max_errors
+                )
+        finally:
+            engine.dispose()
+
+        for error in result.errors:
+            print(f"Line {error.line}: {error.detail}")
+
+        print(
+            f"Imported {result.imported} coupons, rejected {result.rejected} rows in {result.seconds:.2f}s "
+            f"({result.rows_per_second:,.0f} rows/sec)"
+        )
+
+    @app.command()
+    def compact_redemptions(settle_seconds: float = 5):
+        """
+        Compacts the coupon redemption ledger into the per-coupon redemption counters.
+        """
+        from sqlmodel import Session
+
+        from app.main import create_database_engine
+        from app.settings import get_settings
+        from app_model.coupon_redemption.service import CouponRedemptionService
+
+        engine = create_database_engine(get_settings())
+        try:
+            with Session(engine) as session:
+                result = CouponRedemptionService(session).compact(settle_seconds=settle_seconds)
+        finally:
+            engine.dispose()
+
+        print(
+            f"Compacted {result.redemptions} redemptions of {result.coupons} coupons, watermark: {result.watermark}"
+        )
+
+    @app.command()
+    def profile_summary(
+        directory: Optional[Path] = Option(
+            None, help="The directory of the profiles, by default the configured one."
+        ),
+        route: Optional[str] = Option(None, help="Only summarize the profiles of this route (path template)."),
+        sort: str = Option("cumulative", help="The pstats sort key of the functions, for example tottime."),
+        limit: int = Option(20, help="The number of functions to print."),
+    ):
+        """
+        Summarizes the collected request profiles by route and prints the hottest functions.
+        """
+        import pstats
+        import sys
+
+        from app.settings import get_settings
+        from app_utils.profiling import load_profiles
+
+        profiles = load_profiles(directory or Path(get_settings().profiling_dir), route=route)
+        if len(profiles) == 0:
+            print("No profiles found.")
+            return
+
+        routes: dict[tuple[str, str], list[float]] = {}
+        services: dict[tuple[str, str], set[str]] = {}
+        for _, info in profiles:
+            key = (info.method, info.route)
+            routes.setdefault(key, []).append(info.seconds)
+            services.setdefault(key, set()).update(info.services)
+
+        for (method, path), durations in sorted(routes.items()):
+            print(
+                f"{method} {path}: {len(durations)} profiles, {sum(durations) / len(durations) * 1000:.1f} ms avg, "
+                f"services: {', '.join(sorted(services[(method, path)])) or '-'}"
+            )
+
+        stats = pstats.Stats(*(str(path) for path, _ in profiles), stream=sys.stdout)
+        stats.sort_stats(sort).print_stats(limit)
+
     return app
 
 
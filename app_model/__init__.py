@@ -6,9 +6,49 @@ if TYPE_CHECKING:
     from sqlalchemy.future import Engine
 
 
-def initialize_database(engine: "Engine") -> None:
+def initialize_database(engine: "Engine", *, force: bool = False) -> bool:
+    """
+    Creates the missing tables and indexes of the application in the database.
+
+    The DDL is skipped if the schema fingerprint stored in the database matches the current models,
+    so workers don't inspect every table on startup. The fingerprint only reflects the models, tables
+    that were dropped manually are recreated only with `force`.
+
+    Columns can not be added to existing tables, they must be migrated manually. If an existing table
+    doesn't have every column of its model, the fingerprint is not stored and `SchemaMismatch` is raised.
+
+    Arguments:
+        engine: The database engine.
+        force: Whether to create the missing tables even if the stored fingerprint is current.
+
+    Returns:
+        Whether the tables were checked and created.
+
+    Raises:
+        SchemaMismatch: If existing tables are missing columns of their models.
+    """
     from .coupon.model import CouponTable  # noqa
+    from .coupon_redemption.model import CouponRedemptionCounterTable, CouponRedemptionTable  # noqa
     from .customer.model import CustomerTable  # noqa
     from .customer_coupon.model import CustomerCouponTable  # noqa
+    from .idempotency.model import IdempotencyKeyTable  # noqa
+    from .schema import (
+        SchemaMismatch,
+        create_missing_indexes,
+        get_missing_columns,
+        get_schema_fingerprint,
+        read_schema_fingerprint,
+        write_schema_fingerprint,
+    )
+
+    fingerprint = get_schema_fingerprint(SQLModel.metadata, engine.dialect)
+    if not force and read_schema_fingerprint(engine) == fingerprint:
+        return False
 
     SQLModel.metadata.create_all(engine)
+    if missing_columns := get_missing_columns(engine, SQLModel.metadata):
+        raise SchemaMismatch(f"Missing columns, migrate the database: {', '.join(missing_columns)}.")
+
+    create_missing_indexes(engine, SQLModel.metadata)
+    write_schema_fingerprint(engine, fingerprint)
+    return True
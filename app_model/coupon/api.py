@@ -1,39 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app_model.coupon_redemption.model import CouponRedemption, CouponRedemptionStats
+from app_model.coupon_redemption.service import CouponRedemptionService
 from app_model.customer.model import Customer
-from app_utils.service import CommitFailed, NotFound
-from app_utils.typing import SessionContextProvider
+from app_model.customer_coupon.eligibility import EligibleCouponView
+from app_utils.api import add_async_create_route, add_async_get_all_route, add_async_versioned_item_routes
+from app_utils.cache import CacheStats
+from app_utils.etag import get_expected_version, is_not_modified, make_etag, make_version_conflict_error
+from app_utils.pagination import set_next_page_link
+from app_utils.serialization import (
+    FileFormat,
+    ORJSONBytesResponse,
+    get_response_columns,
+    iter_text_lines,
+    make_export_response,
+    serialize_rows,
+)
+from app_utils.service import BulkResult, CommitFailed, InvalidCursor, NotFound, RelationLoading, VersionConflict
+from app_utils.typing import AsyncSessionContextProvider, SessionContextProvider, UTCDatetime
 
-from .model import Coupon, CouponCreate, CouponStatusResponse, CouponUpdate
-from .service import CouponService
+from .importer import ImportResult, import_coupons
+from .model import (
+    Coupon,
+    CouponBulkUpdate,
+    CouponCreate,
+    CouponRedeemRequest,
+    CouponStatusBatchItem,
+    CouponStatusBatchRequest,
+    CouponStatusResponse,
+    CouponUpdate,
+)
+from .service import AsyncCouponService, CouponService, CouponValidityCache, RedemptionFailed
 
 
 def make_api(
     *,
     session_provider: SessionContextProvider,
+    async_session_provider: AsyncSessionContextProvider | None = None,
     prefix="/coupon",
+    add_bulk=True,
     add_create=True,
     add_delete=True,
+    add_export=True,
+    add_import=True,
     add_get_customers=True,
     add_get_all=True,
+    add_get_by_code=True,
     add_get_by_id=True,
+    add_get_valid=True,
+    add_get_redemptions=True,
+    add_redeem=True,
+    add_redemption_stats=True,
     add_status=True,
+    add_status_batch=True,
+    add_status_by_code=True,
+    add_status_cache_stats=True,
     add_update=True,
+    page_size=100,
+    max_page_size=1000,
+    fast_serialization=False,
+    bulk_batch_size=1000,
+    export_batch_size=1000,
+    import_batch_size=5000,
+    customers_loading: RelationLoading = RelationLoading.joined,
+    max_status_batch_size=100,
+    validity_cache: CouponValidityCache | None = None,
+    eligible_coupon_view: EligibleCouponView | None = None,
 ) -> APIRouter:
     """
     Coupon `APIRouter` factory.
 
     Arguments:
         session_provider: Session context provider dependency.
+        async_session_provider: Optional async session context provider dependency. If set, the get all,
+            create, get by ID, update, delete and `/{id}/status` routes are `async` and use this provider.
         prefix: The prefix for the created `APIRouter`.
+        add_bulk: Whether to add the `/bulk` POST, PUT and DELETE routes.
         add_create: Whether to add the create route.
         add_delete: Whether to add the delete route.
+        add_export: Whether to add the `/export` GET route.
+        add_import: Whether to add the `/import` POST route.
         add_get_customers: Whether to add the `/{id}/customers` GET route.
         add_get_all: Whether to add the get all route.
+        add_get_by_code: Whether to add the `/by-code/{code}` GET route.
         add_get_by_id: Whether to add the get by ID route.
+        add_get_valid: Whether to add the `/valid` GET route.
+        add_get_redemptions: Whether to add the `/{id}/redemptions` GET route.
+        add_redeem: Whether to add the `/by-code/{code}/redeem` POST route.
+        add_redemption_stats: Whether to add the `/{id}/redemptions/stats` GET route.
         add_status: Whether to add the `/{id}/status` route.
+        add_status_batch: Whether to add the `/status/batch` POST route.
+        add_status_by_code: Whether to add the `/by-code/{code}/status` route.
+        add_status_cache_stats: Whether to add the `/status/cache` GET route. Requires `validity_cache`.
         add_update: Whether to add the update route.
+        page_size: The default number of items per page in list routes.
+        max_page_size: The maximum number of items per page clients can request in list routes.
+        fast_serialization: Whether the get all route should serialize database rows directly to JSON,
+            skipping the creation and validation of model instances. The output is the same.
+        bulk_batch_size: The maximum number of items per transaction in bulk routes.
+        export_batch_size: The number of rows the export route fetches from the database at once.
+        import_batch_size: The number of rows the import route validates and inserts at once.
+        customers_loading: The loading strategy of the `/{id}/customers` route.
+        max_status_batch_size: The maximum number of IDs and codes in a status batch request.
+        validity_cache: Optional, application-wide coupon validity cache for the status routes.
+        eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+            The services of the API keep it up to date.
     """
 
     api = APIRouter(prefix=prefix)
@@ -42,15 +118,41 @@ def make_api(
         """
         FastAPI dependency that creates a service instance for the API.
         """
-        return CouponService(session)
+        return CouponService(session, validity_cache=validity_cache, eligible_coupon_view=eligible_coupon_view)
 
-    if add_get_all:
+    def get_redemption_service(session: Session = Depends(session_provider)) -> CouponRedemptionService:
+        """
+        FastAPI dependency that creates a redemption service instance for the API.
+        """
+        return CouponRedemptionService(session)
+
+    if add_get_all and async_session_provider is None:
 
         @api.get("/", response_model=list[Coupon])
-        def get_all(service: CouponService = Depends(get_service)):
-            return service.get_all()
+        def get_all(
+            request: Request,
+            response: Response,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CouponService = Depends(get_service),
+        ):
+            try:
+                if fast_serialization:
+                    # Serialize the rows directly, the returned response skips response model validation.
+                    columns = get_response_columns(Coupon)
+                    rows, next_cursor = service.get_row_page(columns, limit=limit, cursor=cursor)
+                    fast_response = ORJSONBytesResponse(serialize_rows(columns, rows))
+                    set_next_page_link(request, fast_response, next_cursor)
+                    return fast_response
 
-    if add_create:
+                items, next_cursor = service.get_page(limit=limit, cursor=cursor)
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
+
+    if add_create and async_session_provider is None:
 
         @api.post("/", response_model=Coupon)
         def create(coupon: CouponCreate, service: CouponService = Depends(get_service)):
@@ -62,40 +164,166 @@ def make_api(
                     detail="Failed to created coupon. Code is probably already in use.",
                 )
 
-    if add_get_by_id:
+    if add_bulk:
+
+        @api.post("/bulk", response_model=BulkResult)
+        def create_many(items: list[CouponCreate], service: CouponService = Depends(get_service)):
+            """
+            Creates coupons in batched transactions and reports the failed items.
+            """
+            return service.create_many(items, batch_size=bulk_batch_size)
+
+        @api.put("/bulk", response_model=BulkResult)
+        def update_many(items: list[CouponBulkUpdate], service: CouponService = Depends(get_service)):
+            """
+            Updates coupons in batched transactions and reports the failed items.
+            """
+            return service.update_many([(item.id, item.data) for item in items], batch_size=bulk_batch_size)
+
+        @api.delete("/bulk", response_model=BulkResult)
+        def delete_many(ids: list[int], service: CouponService = Depends(get_service)):
+            """
+            Deletes coupons in batched transactions and reports the failed items.
+            """
+            return service.delete_many(ids, batch_size=bulk_batch_size)
+
+    if add_export:
+
+        @api.get("/export", response_class=StreamingResponse)
+        def export(
+            format: FileFormat = FileFormat.ndjson,
+            valid_from_min: UTCDatetime | None = None,
+            valid_from_max: UTCDatetime | None = None,
+            valid_until_min: UTCDatetime | None = None,
+            valid_until_max: UTCDatetime | None = None,
+            service: CouponService = Depends(get_service),
+        ):
+            """
+            Streams all coupons whose validity window matches the given (inclusive) filters as NDJSON or CSV.
+            """
+            columns = get_response_columns(Coupon)
+            rows = service.iter_export(
+                columns,
+                valid_from_min=valid_from_min,
+                valid_from_max=valid_from_max,
+                valid_until_min=valid_until_min,
+                valid_until_max=valid_until_max,
+                batch_size=export_batch_size,
+            )
+            return make_export_response(columns, rows, format=format, filename="coupons")
+
+    if add_import:
+
+        @api.post("/import", response_model=ImportResult)
+        def import_(
+            file: UploadFile,
+            format: FileFormat = FileFormat.ndjson,
+            session: Session = Depends(session_provider),
+        ):
+            """
+            Imports coupons from an uploaded NDJSON or CSV file.
+
+            The file is parsed and inserted in batches as it is read. Rejected rows are reported
+            with their line numbers.
+            """
+            try:
+                return import_coupons(
+                    session,
+                    iter_text_lines(file.file),
+                    format=format,
+                    batch_size=import_batch_size,
+                    eligible_coupon_view=eligible_coupon_view,
+                )
+            except UnicodeDecodeError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The file must be UTF-8 encoded.")
+
+    if add_get_valid:
+
+        @api.get("/valid", response_model=list[Coupon])
+        def get_valid(
+            request: Request,
+            response: Response,
+            at: UTCDatetime | None = None,
+            customer_id: int | None = None,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CouponService = Depends(get_service),
+        ):
+            """
+            Returns the coupons that are valid at the given time (now by default).
+
+            If a customer ID is given, only the coupons the customer is eligible for are returned.
+            """
+            try:
+                items, next_cursor = service.get_valid_page(
+                    datetime.utcnow() if at is None else at, customer_id=customer_id, limit=limit, cursor=cursor
+                )
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
+
+    if add_get_by_id and async_session_provider is None:
 
         @api.get("/{id}", response_model=Coupon)
-        def get_by_id(id: int, service: CouponService = Depends(get_service)):
+        def get_by_id(
+            id: int,
+            response: Response,
+            if_none_match: str | None = Header(None),
+            service: CouponService = Depends(get_service),
+        ):
             coupon = service.get_by_pk(id)
             if coupon is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+
+            etag = make_etag(coupon.version)
+            if is_not_modified(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+            response.headers["ETag"] = etag
             return coupon
 
-    if add_update:
+    if add_update and async_session_provider is None:
 
         @api.put("/{id}", response_model=Coupon)
-        def update_by_id(id: int, data: CouponUpdate, service: CouponService = Depends(get_service)):
+        def update_by_id(
+            id: int,
+            data: CouponUpdate,
+            response: Response,
+            if_match: str | None = Header(None),
+            service: CouponService = Depends(get_service),
+        ):
+            expected_version = get_expected_version(if_match)
             try:
-                return service.update(id, data)
+                coupon = service.update(id, data, expected_version=expected_version)
             except NotFound:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+            except VersionConflict:
+                raise make_version_conflict_error(if_match)
             except Exception:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Coupon update failed.")
 
-    if add_delete:
+            response.headers["ETag"] = make_etag(coupon.version)
+            return coupon
+
+    if add_delete and async_session_provider is None:
 
         @api.delete("/{id}")
-        def delete_by_id(id: int, service: CouponService = Depends(get_service)):
+        def delete_by_id(id: int, if_match: str | None = Header(None), service: CouponService = Depends(get_service)):
+            expected_version = get_expected_version(if_match)
             try:
-                service.delete_by_pk(id)
+                service.delete_by_pk(id, expected_version=expected_version)
             except NotFound:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+            except VersionConflict:
+                raise make_version_conflict_error(if_match)
             except CommitFailed:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to delete coupon.")
 
             return Response(status_code=status.HTTP_200_OK)
 
-    if add_status:
+    if add_status and async_session_provider is None:
 
         @api.get("/{id}/status", response_model=CouponStatusResponse)
         def coupon_status(id: int, service: CouponService = Depends(get_service)):
@@ -108,14 +336,221 @@ def make_api(
             except NotFound:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
 
+    if add_get_by_code:
+
+        @api.get("/by-code/{code}", response_model=Coupon)
+        def get_by_code(code: str, service: CouponService = Depends(get_service)):
+            coupon = service.get_by_code(code)
+            if coupon is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+            return coupon
+
+    if add_redeem:
+
+        @api.post("/by-code/{code}/redeem", response_model=Coupon)
+        def redeem(code: str, data: CouponRedeemRequest | None = None, service: CouponService = Depends(get_service)):
+            """
+            Redeems the coupon with the given code.
+
+            `customer_id` is required for coupons that are linked to customers, each of them can
+            redeem the coupon once. Public coupons can be redeemed by anyone until they run out of uses.
+            """
+            try:
+                return service.redeem(code, customer_id=None if data is None else data.customer_id)
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+            except RedemptionFailed as e:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.reason.value)
+            except CommitFailed:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to redeem coupon.")
+
+    if add_status_batch:
+
+        @api.post("/status/batch", response_model=list[CouponStatusBatchItem])
+        def coupon_status_batch(data: CouponStatusBatchRequest, service: CouponService = Depends(get_service)):
+            """
+            Returns the status of the coupons with the given IDs and codes at the time of the request.
+
+            If `customer_id` is set, coupons the customer is not eligible for are invalid.
+            The status of missing coupons is `null`.
+            """
+            if len(data.ids) + len(data.codes) > max_status_batch_size:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"At most {max_status_batch_size} coupons can be checked at once.",
+                )
+
+            return service.status_batch(ids=data.ids, codes=data.codes, customer_id=data.customer_id)
+
+    if add_status_by_code:
+
+        @api.get("/by-code/{code}/status", response_model=CouponStatusResponse)
+        def coupon_status_by_code(code: str, service: CouponService = Depends(get_service)):
+            """
+            Returns the status of the coupon with the given code at the time of the request.
+            """
+            try:
+                result = service.status_by_code(code)
+                return CouponStatusResponse(status=result)
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+
+    if add_status_cache_stats and validity_cache is not None:
+
+        @api.get("/status/cache", response_model=CacheStats)
+        def status_cache_stats():
+            """
+            Returns the statistics of the coupon validity cache.
+            """
+            return validity_cache.stats()
+
     if add_get_customers:
 
         @api.get("/{id}/customers", response_model=list[Customer])
-        def get_coupon_customers(id: int, service: CouponService = Depends(get_service)):
-            coupon = service.get_by_pk(id)
-            if coupon is None:
+        def get_coupon_customers(
+            id: int,
+            request: Request,
+            response: Response,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CouponService = Depends(get_service),
+        ):
+            try:
+                items, next_cursor = service.get_related_page(
+                    id, "customers", limit=limit, cursor=cursor, loading=customers_loading
+                )
+            except NotFound:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
 
-            return coupon.customers
+    if add_get_redemptions:
+
+        @api.get("/{id}/redemptions", response_model=list[CouponRedemption])
+        def get_coupon_redemptions(
+            id: int,
+            request: Request,
+            response: Response,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CouponRedemptionService = Depends(get_redemption_service),
+        ):
+            try:
+                items, next_cursor = service.get_page_by_coupon(id, limit=limit, cursor=cursor)
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
+
+    if add_redemption_stats:
+
+        @api.get("/{id}/redemptions/stats", response_model=CouponRedemptionStats)
+        def coupon_redemption_stats(id: int, service: CouponRedemptionService = Depends(get_redemption_service)):
+            """
+            Returns the redemption statistics of the coupon.
+
+            `count` is the number of compacted redemptions, `pending` is the number of redemptions
+            since the last compaction of the coupon's redemptions.
+            """
+            try:
+                return service.stats(id)
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
+
+    if async_session_provider is not None:
+        _add_async_routes(
+            api,
+            async_session_provider=async_session_provider,
+            add_create=add_create,
+            add_delete=add_delete,
+            add_get_all=add_get_all,
+            add_get_by_id=add_get_by_id,
+            add_status=add_status,
+            add_update=add_update,
+            page_size=page_size,
+            max_page_size=max_page_size,
+            fast_serialization=fast_serialization,
+            validity_cache=validity_cache,
+            eligible_coupon_view=eligible_coupon_view,
+        )
 
     return api
+
+
+def _add_async_routes(
+    api: APIRouter,
+    *,
+    async_session_provider: AsyncSessionContextProvider,
+    add_create: bool,
+    add_delete: bool,
+    add_get_all: bool,
+    add_get_by_id: bool,
+    add_status: bool,
+    add_update: bool,
+    page_size: int,
+    max_page_size: int,
+    fast_serialization: bool,
+    validity_cache: CouponValidityCache | None,
+    eligible_coupon_view: EligibleCouponView | None,
+) -> None:
+    """
+    Adds the `async` variant of the CRUD and status routes to the given `APIRouter`.
+
+    The routes are added last, so they can not shadow the static routes of `make_api()`.
+    See `make_api()` for the description of the arguments.
+    """
+
+    def get_service(session: AsyncSession = Depends(async_session_provider)) -> AsyncCouponService:
+        """
+        FastAPI dependency that creates an async service instance for the API.
+        """
+        return AsyncCouponService(session, validity_cache=validity_cache, eligible_coupon_view=eligible_coupon_view)
+
+    if add_get_all:
+        add_async_get_all_route(
+            api,
+            get_service=get_service,
+            model=Coupon,
+            page_size=page_size,
+            max_page_size=max_page_size,
+            fast_serialization=fast_serialization,
+        )
+
+    if add_create:
+        add_async_create_route(
+            api,
+            get_service=get_service,
+            model=Coupon,
+            create_model=CouponCreate,
+            error_detail="Failed to created coupon. Code is probably already in use.",
+        )
+
+    add_async_versioned_item_routes(
+        api,
+        get_service=get_service,
+        model=Coupon,
+        update_model=CouponUpdate,
+        name="Coupon",
+        add_delete=add_delete,
+        add_get_by_id=add_get_by_id,
+        add_update=add_update,
+    )
+
+    if add_status:
+
+        @api.get("/{id}/status", response_model=CouponStatusResponse)
+        async def coupon_status(id: int, service: AsyncCouponService = Depends(get_service)):
+            """
+            Returns the status of the coupon with the given ID at the time of the request.
+            """
+            try:
+                result = await service.status_by_id(id)
+                return CouponStatusResponse(status=result)
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coupon not found.")
@@ -0,0 +1,328 @@
+from typing import Any, Callable, Iterable, Iterator
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import csv
+import heapq
+import json
+import re
+import time
+
+from pydantic import BaseModel
+from pydantic.datetime_parse import parse_datetime
+from sqlmodel import Session
+
+from app_model.customer_coupon.eligibility import EligibleCouponView
+from app_utils.serialization import FileFormat
+from app_utils.service import BulkResult
+from app_utils.typing import UTCDatetime
+
+from .model import CouponCreate, DiscountType
+from .service import CouponService
+
+Record = tuple[int, dict[str, Any]]
+"""
+A parsed input record and the line number it ends on.
+"""
+
+
+class ImportRejection(BaseModel):
+    """
+    Describes why a row of an import was rejected.
+    """
+
+    line: int
+    detail: str
+
+
+class ImportResult(BaseModel):
+    """
+    Coupon import result model.
+    """
+
+    imported: int
+    rejected: int
+    errors: list[ImportRejection]  # The first `max_errors` rejections, ordered by line number.
+    seconds: float
+    rows_per_second: float
+
+
+def iter_records(lines: Iterable[str], format: FileFormat) -> Iterator[Record | ImportRejection]:
+    """
+    Parses the given lines one by one and yields the records (with line numbers) or the parsing errors.
+
+    CSV input must have a header row, empty CSV values are treated as missing. Blank NDJSON lines are skipped.
+
+    Arguments:
+        lines: The lines of the input, for example an open text file.
+        format: The format of the input.
+    """
+    if format == FileFormat.csv:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}
+
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if line.strip() == "":
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield ImportRejection(line=line_number, detail=f"Invalid JSON: {e}")
+            continue
+
+        if isinstance(record, dict):
+            yield line_number, record
+        else:
+            yield ImportRejection(line=line_number, detail="Not a JSON object.")
+
+
+class CouponBatchValidator:
+    """
+    Validates batches of coupon records column by column and converts them to database rows.
+
+    The rules are the same as those of `CouponCreate` (the `code` regex is taken from the model),
+    plus `valid_from` must be earlier than `valid_until`. Validating a batch column-wise with
+    precompiled rules is much faster than creating a model instance for every record.
+    """
+
+    __slots__ = ("_code_pattern",)
+
+    def __init__(self) -> None:
+        # pydantic matches the regex at the beginning of the value (`re.match()`), so does the validator.
+        self._code_pattern = re.compile(CouponCreate.__fields__["code"].field_info.regex)
+
+    def validate(self, records: list[Record]) -> tuple[list[int], list[dict[str, Any]], list[ImportRejection]]:
+        """
+        Validates the given records.
+
+        Arguments:
+            records: The records to validate with their line numbers.
+
+        Returns:
+            The line numbers and database rows of the valid records, and the rejections.
+        """
+        errors: list[list[str]] = [[] for _ in records]
+        columns: dict[str, list[Any]] = {}
+        for name, convert in (
+            ("code", self._convert_code),
+            ("description", _convert_str),
+            ("discount", _convert_discount),
+            ("discount_type", DiscountType),
+            ("valid_from", _convert_datetime),
+            ("valid_until", _convert_datetime),
+        ):
+            columns[name] = self._convert_column(records, name, convert, errors, required=True)
+
+        columns["max_uses"] = self._convert_column(records, "max_uses", _convert_max_uses, errors, required=False)
+
+        for i, (valid_from, valid_until) in enumerate(zip(columns["valid_from"], columns["valid_until"])):
+            if valid_from is not None and valid_until is not None and valid_from >= valid_until:
+                errors[i].append("valid_from: must be earlier than valid_until")
+
+        now = datetime.utcnow()
+        lines: list[int] = []
+        rows: list[dict[str, Any]] = []
+        rejections: list[ImportRejection] = []
+        for i, (line, _) in enumerate(records):
+            if errors[i]:
+                rejections.append(ImportRejection(line=line, detail="; ".join(errors[i])))
+            else:
+                lines.append(line)
+                rows.append({**{name: values[i] for name, values in columns.items()}, "created_at": now, "uses": 0})
+
+        return lines, rows, rejections
+
+    def _convert_column(
+        self,
+        records: list[Record],
+        name: str,
+        convert: Callable[[Any], Any],
+        errors: list[list[str]],
+        *,
+        required: bool,
+    ) -> list[Any]:
+        """
+        Converts the values of the given column, and records the errors of invalid values.
+
+        Arguments:
+            records: The records whose column should be converted.
+            name: The name of the column.
+            convert: The conversion method. It must raise `ValueError` or `TypeError` for invalid values.
+            errors: The error list of each record.
+            required: Whether the column is required.
+        """
+        result: list[Any] = []
+        for i, (_, record) in enumerate(records):
+            value = record.get(name)
+            if value is None:
+                if required:
+                    errors[i].append(f"{name}: field required")
+                result.append(None)
+                continue
+
+            try:
+                result.append(convert(value))
+            except (TypeError, ValueError) as e:
+                errors[i].append(f"{name}: {e}")
+                result.append(None)
+
+        return result
+
+    def _convert_code(self, value: Any) -> str:
+        code = _convert_str(value)
+        if self._code_pattern.match(code) is None:
+            raise ValueError(f'string does not match regex "{self._code_pattern.pattern}"')
+        return code
+
+
+def _convert_str(value: Any) -> str:
+    if not isinstance(value, str):
+        raise TypeError("str type expected")
+    return value
+
+
+def _convert_discount(value: Any) -> float:
+    discount = float(value)
+    if not discount > 0:
+        raise ValueError("ensure this value is greater than 0")
+    return discount
+
+
+def _convert_datetime(value: Any) -> datetime:
+    return UTCDatetime.ensure_utc(parse_datetime(value))
+
+
+def _convert_max_uses(value: Any) -> int:
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError("value is not a valid integer")
+    max_uses = int(value)
+    if max_uses <= 0:
+        raise ValueError("ensure this value is greater than 0")
+    return max_uses
+
+
+def get_default_import_workers(session: Session) -> int:
+    """
+    Returns the default number of parallel insert workers for the database of the given session.
+
+    PostgreSQL handles concurrent inserts well, SQLite only has a single writer.
+    """
+    return 4 if session.get_bind().dialect.name == "postgresql" else 1
+
+
+def import_coupons(
+    session: Session,
+    lines: Iterable[str],
+    *,
+    format: FileFormat,
+    batch_size: int = 5000,
+    workers: int | None = None,
+    max_errors: int = 1000,
+    eligible_coupon_view: EligibleCouponView | None = None,
+) -> ImportResult:
+    """
+    Imports coupons from the given lines.
+
+    The input is parsed as a stream and validated in batches of `batch_size` records, then each batch
+    is inserted in its own transaction. Insert failures (for example duplicate codes) are reported
+    per row. Only a few batches are held in memory at a time, regardless of the size of the input.
+
+    Batches are inserted in parallel if there are multiple workers, so if the same code appears in
+    different batches, any one of the rows may be imported.
+
+    Arguments:
+        session: The session to use. With multiple workers, each worker uses its own session
+            bound to the same engine.
+        lines: The lines of the input, for example an open text file.
+        format: The format of the input.
+        batch_size: The number of records per validation batch and insert transaction.
+        workers: The number of parallel insert workers, by default 4 for PostgreSQL and 1 otherwise.
+        max_errors: The maximum number of rejections to include in the result. Only these rejections
+            are kept in memory, the others are only counted.
+        eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+            Imported coupons are public, so its public entry is invalidated.
+
+    Returns:
+        The result of the import.
+    """
+    start = time.perf_counter()
+    validator = CouponBatchValidator()
+    workers = get_default_import_workers(session) if workers is None else workers
+
+    imported = 0
+    rejected = 0
+    # Max-heap (by line number) of the first `max_errors` rejections, insert errors arrive out of order.
+    rejections: list[tuple[int, int, ImportRejection]] = []
+
+    def record_rejections(items: Iterable[ImportRejection]) -> None:
+        nonlocal rejected
+        for item in items:
+            rejected += 1
+            if len(rejections) < max_errors:
+                heapq.heappush(rejections, (-item.line, rejected, item))
+            elif rejections and item.line < -rejections[0][0]:
+                heapq.heapreplace(rejections, (-item.line, rejected, item))
+
+    def record_insert_result(result: BulkResult) -> None:
+        nonlocal imported
+        imported += result.succeeded
+        record_rejections(ImportRejection(line=error.index, detail=error.detail) for error in result.errors)
+
+    def iter_batches() -> Iterator[tuple[list[int], list[dict[str, Any]]]]:
+        batch: list[Record] = []
+        for item in iter_records(lines, format):
+            if isinstance(item, ImportRejection):
+                record_rejections((item,))
+                continue
+
+            batch.append(item)
+            if len(batch) == batch_size:
+                valid_lines, rows, invalid = validator.validate(batch)
+                record_rejections(invalid)
+                yield valid_lines, rows
+                batch = []
+
+        if batch:
+            valid_lines, rows, invalid = validator.validate(batch)
+            record_rejections(invalid)
+            yield valid_lines, rows
+
+    if workers <= 1:
+        service = CouponService(session)
+        for valid_lines, rows in iter_batches():
+            if rows:
+                record_insert_result(service.insert_rows(rows, indices=valid_lines))
+    else:
+        engine = session.get_bind()
+
+        def insert(valid_lines: list[int], rows: list[dict[str, Any]]) -> BulkResult:
+            with Session(engine) as worker_session:
+                return CouponService(worker_session).insert_rows(rows, indices=valid_lines)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending: list[Future[BulkResult]] = []
+            for valid_lines, rows in iter_batches():
+                if rows:
+                    pending.append(executor.submit(insert, valid_lines, rows))
+                # Limit the number of batches in memory.
+                while len(pending) >= 2 * workers:
+                    record_insert_result(pending.pop(0).result())
+
+            for future in pending:
+                record_insert_result(future.result())
+
+    if eligible_coupon_view is not None and imported > 0:
+        eligible_coupon_view.invalidate_public()
+
+    seconds = time.perf_counter() - start
+    return ImportResult(
+        imported=imported,
+        rejected=rejected,
+        errors=sorted((item for _, _, item in rejections), key=lambda rejection: rejection.line),
+        seconds=seconds,
+        rows_per_second=(imported + rejected) / seconds if seconds > 0 else 0.0,
+    )
@@ -3,7 +3,8 @@ from typing import TYPE_CHECKING
 from datetime import datetime
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from app_model.customer_coupon.model import CustomerCouponTable
@@ -31,6 +32,25 @@ class CouponStatus(str, Enum):
     invalid = "invalid"
 
 
+class RedemptionFailureReason(str, Enum):
+    """
+    Coupon redemption failure reasons.
+    """
+
+    invalid = "invalid"  # The coupon is not valid at the time of the redemption.
+    exhausted = "exhausted"  # The coupon reached its maximum number of uses.
+    not_eligible = "not_eligible"  # The customer is not linked to the coupon (or no customer was given).
+    already_redeemed = "already_redeemed"  # The customer has already redeemed the coupon.
+
+
+class CouponRedeemRequest(BaseModel):
+    """
+    Coupon redemption request model.
+    """
+
+    customer_id: int | None = None  # Required for coupons that are linked to customers.
+
+
 class CouponStatusResponse(BaseModel):
     """
     Coupon status response model.
@@ -39,6 +59,26 @@ class CouponStatusResponse(BaseModel):
     status: CouponStatus
 
 
+class CouponStatusBatchRequest(BaseModel):
+    """
+    Batch coupon status request model.
+    """
+
+    ids: list[int] = []
+    codes: list[str] = []
+    customer_id: int | None = None  # If set, coupons the customer is not eligible for are invalid.
+
+
+class CouponStatusBatchItem(BaseModel):
+    """
+    Batch coupon status response item model.
+    """
+
+    id: int | None
+    code: str | None
+    status: CouponStatus | None  # None if the coupon doesn't exist.
+
+
 class BaseCoupon(SQLModel):
     """
     Base coupon model with shared attributes.
@@ -52,6 +92,7 @@ class BaseCoupon(SQLModel):
     discount_type: DiscountType
     valid_from: UTCDatetime  # Inclusive
     valid_until: UTCDatetime  # Exclusive
+    max_uses: int | None = Field(default=None, gt=0)  # Unlimited if not set.
 
 
 class CouponTable(BaseCoupon, table=True):
@@ -60,9 +101,13 @@ class CouponTable(BaseCoupon, table=True):
     """
 
     __tablename__ = "coupon"
+    # Valid coupon queries: valid_until leads because the valid_until > t bound excludes expired coupons.
+    __table_args__ = (Index("ix_coupon_valid_until_valid_from_id", "valid_until", "valid_from", "id"),)
 
     id: int | None = Field(default=None, primary_key=True)
     created_at: UTCDatetime | None = Field(default_factory=datetime.utcnow)
+    uses: int = Field(default=0)
+    version: int = Field(default=1)  # Incremented by every change, see `Service.update()`.
 
     customers: list["CustomerTable"] = Relationship(back_populates="coupons", link_model=CustomerCouponTable)
 
@@ -74,6 +119,15 @@ class Coupon(BaseCoupon):
 
     id: int
     created_at: UTCDatetime
+    uses: int | None  # None for unlimited coupons, their redemptions are counted by the redemption stats.
+    version: int
+
+    @validator("uses", always=True)
+    def _omit_unlimited_uses(cls, value: int | None, values: dict) -> int | None:
+        """
+        Only limited coupons count their uses, the stored counter of unlimited coupons is always zero.
+        """
+        return None if values.get("max_uses") is None else value
 
 
 class CouponCreate(BaseCoupon):
@@ -91,3 +145,12 @@ class CouponUpdate(SQLModel):
 
     description: str | None
     valid_until: UTCDatetime | None
+
+
+class CouponBulkUpdate(SQLModel):
+    """
+    Coupon bulk update item model.
+    """
+
+    id: int
+    data: CouponUpdate
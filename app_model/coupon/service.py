@@ -1,10 +1,70 @@
-from datetime import datetime
+from typing import Any, Iterator, Sequence, cast
 
-from sqlmodel import Session
+from datetime import datetime, timezone
 
-from app_utils.service import Service, NotFound
+from sqlalchemy import DateTime, Integer, and_, case, exists, insert, literal, null, or_, tuple_, update
+from sqlalchemy import select as sa_select
+from sqlalchemy.engine import CursorResult, Row
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .model import CouponTable, CouponCreate, CouponStatus, CouponUpdate
+from app_model.coupon_redemption.model import CouponRedemptionTable
+from app_model.customer_coupon.eligibility import EligibleCouponView
+from app_model.customer_coupon.model import CustomerCouponTable
+from app_utils.async_service import AsyncService
+from app_utils.cache import TTLCache
+from app_utils.pagination import decode_cursor, encode_cursor
+from app_utils.replicas import is_replica_session
+from app_utils.service import BulkResult, CommitFailed, InvalidCursor, NotFound, Service, ServiceException
+
+from .model import (
+    Coupon,
+    CouponTable,
+    CouponCreate,
+    CouponStatus,
+    CouponStatusBatchItem,
+    CouponUpdate,
+    RedemptionFailureReason,
+)
+
+CouponValidityCache = TTLCache[int, tuple[datetime, datetime]]
+"""
+Cache that maps coupon IDs to their `(valid_from, valid_until)` validity window.
+"""
+
+
+class RedemptionFailed(ServiceException):
+    """Raised by the coupon service when a coupon can not be redeemed."""
+
+    def __init__(self, reason: RedemptionFailureReason) -> None:
+        super().__init__(reason.value)
+        self.reason = reason
+
+
+_REPORTED_USES: Any = case((col(CouponTable.max_uses).is_(None), null()), else_=CouponTable.uses).label("uses")
+"""
+The `uses` of `Coupon` in row queries, `NULL` for unlimited coupons (see `Coupon.uses`).
+"""
+
+
+def _status_of(valid_from: datetime, valid_until: datetime) -> CouponStatus:
+    """
+    Returns the status of a coupon with the given validity window at the current time.
+
+    Arguments:
+        valid_from: The start of the validity window (inclusive).
+        valid_until: The end of the validity window (exclusive).
+    """
+    return CouponStatus.valid if valid_from <= datetime.utcnow() < valid_until else CouponStatus.invalid
+
+
+def _to_naive_utc(value: datetime) -> datetime:
+    """
+    Converts the given datetime to naive UTC, the format datetimes are stored in.
+
+    Naive datetimes are assumed to be in UTC already.
+    """
+    return value if value.tzinfo is None else value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 class CouponService(Service[CouponTable, CouponCreate, CouponUpdate, int]):
@@ -12,32 +72,481 @@ class CouponService(Service[CouponTable, CouponCreate, CouponUpdate, int]):
     Coupon-related services.
     """
 
-    __slots__ = ()
+    __slots__ = ("_validity_cache", "_eligible_coupon_view")
+
+    column_expressions = {"uses": _REPORTED_USES}
 
-    def __init__(self, session: Session) -> None:
+    def __init__(
+        self,
+        session: Session,
+        *,
+        validity_cache: CouponValidityCache | None = None,
+        eligible_coupon_view: EligibleCouponView | None = None,
+    ) -> None:
         """
         Initialization.
 
         Arguments:
             session: The session instance the service will use.
+            validity_cache: Optional, application-wide cache for the validity window of coupons.
+            eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
         """
         super().__init__(session, model=CouponTable)
+        self._validity_cache = validity_cache
+        self._eligible_coupon_view = eligible_coupon_view
+
+    def create(self, data: CouponCreate) -> CouponTable:
+        item = super().create(data)
+        if self._eligible_coupon_view is not None:
+            # New coupons have no customer links, so they are public.
+            self._eligible_coupon_view.add_public(Coupon.from_orm(item))
+
+        return item
+
+    def create_many(self, items: Sequence[CouponCreate], *, batch_size: int = 1000) -> BulkResult:
+        result = super().create_many(items, batch_size=batch_size)
+        if self._eligible_coupon_view is not None and result.succeeded > 0:
+            self._eligible_coupon_view.invalidate_public()
+
+        return result
+
+    def get_by_code(self, code: str) -> CouponTable | None:
+        """
+        Returns the coupon with the given code if it exists.
+
+        Arguments:
+            code: The coupon code.
+        """
+        return self._session.exec(select(CouponTable).where(CouponTable.code == code)).first()
+
+    def iter_export(
+        self,
+        columns: Sequence[str],
+        *,
+        valid_from_min: datetime | None = None,
+        valid_from_max: datetime | None = None,
+        valid_until_min: datetime | None = None,
+        valid_until_max: datetime | None = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Row]:
+        """
+        Streams the rows with the given columns of the coupons whose validity window matches the filters.
+
+        The filters (all inclusive) are evaluated by the database, see `Service.iter_all()` for details.
+        Timezone-aware filter values are converted to UTC, naive ones are assumed to be in UTC.
+
+        Arguments:
+            columns: The names of the columns to select.
+            valid_from_min: The earliest `valid_from` value.
+            valid_from_max: The latest `valid_from` value.
+            valid_until_min: The earliest `valid_until` value.
+            valid_until_max: The latest `valid_until` value.
+            batch_size: The number of rows to fetch at once.
+        """
+        where = []
+        if valid_from_min is not None:
+            where.append(col(CouponTable.valid_from) >= _to_naive_utc(valid_from_min))
+        if valid_from_max is not None:
+            where.append(col(CouponTable.valid_from) <= _to_naive_utc(valid_from_max))
+        if valid_until_min is not None:
+            where.append(col(CouponTable.valid_until) >= _to_naive_utc(valid_until_min))
+        if valid_until_max is not None:
+            where.append(col(CouponTable.valid_until) <= _to_naive_utc(valid_until_max))
+
+        return self.iter_all(columns, where=where, batch_size=batch_size)
+
+    def get_valid_page(
+        self, at: datetime, *, customer_id: int | None = None, limit: int, cursor: str | None = None
+    ) -> tuple[list[CouponTable], str | None]:
+        """
+        Returns a page of the coupons that are valid at the given time, and the cursor of the next page.
+
+        Coupons are ordered by `(valid_until, valid_from, id)`, so the ones that expire first come first,
+        and pages are read from the matching index. The cost of a page doesn't depend on the number of
+        expired coupons. Pagination is keyset-based, see `get_page()` for details.
+
+        Arguments:
+            at: The time the coupons must be valid at.
+            customer_id: If set, only the coupons the customer is eligible for are returned.
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        at = _to_naive_utc(at)
+        key_columns = (col(CouponTable.valid_until), col(CouponTable.valid_from), col(CouponTable.id))
+        query = select(CouponTable).where(col(CouponTable.valid_from) <= at).order_by(*key_columns).limit(limit + 1)
+
+        key = None if cursor is None else self._decode_valid_page_cursor(cursor)
+        # Only the stronger lower bound of valid_until is used, so the database can start the index range at it.
+        if key is not None and key[0] > at:
+            query = query.where(tuple_(*key_columns) > tuple_(*key))
+        else:
+            query = query.where(col(CouponTable.valid_until) > at)
+
+        if customer_id is not None:
+            query = query.where(self._make_eligibility_clause(customer_id))
+
+        items = self._session.exec(query).all()
+        if len(items) <= limit:
+            return items, None
+
+        items = items[:limit]
+        last = items[-1]
+        return items, encode_cursor([last.valid_until.isoformat(), last.valid_from.isoformat(), last.id])
+
+    def redeem(self, code: str, *, customer_id: int | None = None) -> CouponTable:
+        """
+        Redeems the coupon with the given code.
+
+        The redemption is a single transaction of conditional statements, there is no read-modify-write
+        in Python, so concurrent redemptions of the same coupon can not exceed its limits:
+
+        - If a customer is given, their link to the coupon is claimed by setting its `redeemed_at` column
+          if it is not set yet. Each customer can redeem a linked coupon once.
+        - The coupon can be redeemed if it is valid, has uses left, and either the customer's link
+          was claimed or the coupon is public (it has no customer links).
+        - The `uses` counter of limited coupons (with `max_uses`) is incremented. Unlimited coupons
+          don't write the coupon row, so their redemptions don't contend on it.
+        - The redemption is appended to the `coupon_redemption` ledger.
+
+        If any condition fails, the transaction is rolled back and the reason is looked up.
+
+        Arguments:
+            code: The coupon code.
+            customer_id: The ID of the redeeming customer. Required for coupons that are linked to customers.
+
+        Returns:
+            The redeemed coupon.
+
+        Raises:
+            NotFound: If the coupon doesn't exist.
+            RedemptionFailed: If the coupon can not be redeemed.
+            CommitFailed: If the database operation fails.
+        """
+        session = self._session
+        now = datetime.utcnow()
+        try:
+            claimed = False
+            if customer_id is not None:
+                claim_link = (
+                    update(CustomerCouponTable)
+                    .where(
+                        CustomerCouponTable.customer_id == customer_id,
+                        CustomerCouponTable.coupon_id
+                        == sa_select(CouponTable.id).where(CouponTable.code == code).scalar_subquery(),
+                        col(CustomerCouponTable.redeemed_at).is_(None),
+                    )
+                    .values(redeemed_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                claimed = cast(CursorResult, session.execute(claim_link)).rowcount == 1
+
+            conditions: list[Any] = [
+                CouponTable.code == code,
+                CouponTable.valid_from <= now,
+                CouponTable.valid_until > now,
+            ]
+            if not claimed:
+                conditions.append(~exists().where(CustomerCouponTable.coupon_id == CouponTable.id))
+
+            use_limited_coupon = (
+                update(CouponTable)
+                .where(
+                    *conditions,
+                    col(CouponTable.max_uses).is_not(None),
+                    col(CouponTable.uses) < col(CouponTable.max_uses),
+                )
+                .values(uses=CouponTable.uses + 1, version=CouponTable.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+            used_limited = cast(CursorResult, session.execute(use_limited_coupon)).rowcount == 1
+
+            # If the limited coupon was used, it only needs to be looked up, otherwise
+            # the ledger row is only inserted if the coupon is unlimited and redeemable.
+            record_redemption = insert(CouponRedemptionTable).from_select(
+                ["coupon_id", "customer_id", "redeemed_at"],
+                sa_select(CouponTable.id, literal(customer_id, Integer), literal(now, DateTime)).where(
+                    *(
+                        [CouponTable.code == code]
+                        if used_limited
+                        else [*conditions, col(CouponTable.max_uses).is_(None)]
+                    )
+                ),
+            )
+            redeemed = cast(CursorResult, session.execute(record_redemption)).rowcount == 1
+            if not redeemed:
+                session.rollback()
+                raise self._get_redemption_failure(code, customer_id=customer_id, at=now)
+
+            session.commit()
+        except ServiceException:
+            raise
+        except Exception as e:
+            session.rollback()
+            raise CommitFailed("Failed to redeem coupon.") from e
+
+        coupon = self.get_by_code(code)
+        if coupon is None:  # Deleted since the redemption.
+            raise NotFound(code)
+
+        if (view := self._eligible_coupon_view) is not None:
+            if claimed:
+                view.remove_redeemed(cast(int, customer_id), cast(int, coupon.id))
+            if used_limited:
+                # Public coupons were redeemed without a claimed link.
+                view.update_coupon(Coupon.from_orm(coupon), public=not claimed)
+
+        return coupon
+
+    def status_batch(
+        self,
+        *,
+        ids: Sequence[int] = (),
+        codes: Sequence[str] = (),
+        customer_id: int | None = None,
+        chunk_size: int = 500,
+    ) -> list[CouponStatusBatchItem]:
+        """
+        Returns the current status of the coupons with the given IDs and codes.
+
+        Coupons are loaded with one `IN` query per chunk, and if a customer is given,
+        eligibility is checked in the same query.
+
+        Arguments:
+            ids: Coupon database IDs.
+            codes: Coupon codes.
+            customer_id: If set, coupons the customer is not eligible for are reported as invalid.
+            chunk_size: The maximum number of IDs and codes per query.
+
+        Returns:
+            The status of the requested coupons, IDs first, then codes, in request order.
+        """
+        eligible = literal(True) if customer_id is None else self._make_eligibility_clause(customer_id)
+        columns = (CouponTable.id, CouponTable.code, CouponTable.valid_from, CouponTable.valid_until, eligible)
+
+        by_id: dict[int, CouponStatus] = {}
+        by_code: dict[str, CouponStatus] = {}
+        keys: list[tuple[str, Any]] = [("id", id) for id in ids] + [("code", code) for code in codes]
+        for offset in range(0, len(keys), chunk_size):
+            chunk = keys[offset : offset + chunk_size]
+            chunk_ids = [value for kind, value in chunk if kind == "id"]
+            chunk_codes = [value for kind, value in chunk if kind == "code"]
+            query = sa_select(*columns).where(
+                or_(col(CouponTable.id).in_(chunk_ids), col(CouponTable.code).in_(chunk_codes))
+            )
+            for id, code, valid_from, valid_until, is_eligible in self._session.execute(query):
+                by_id[id] = by_code[code] = (
+                    _status_of(valid_from, valid_until) if is_eligible else CouponStatus.invalid
+                )
+
+        return [CouponStatusBatchItem(id=id, code=None, status=by_id.get(id)) for id in ids] + [
+            CouponStatusBatchItem(id=None, code=code, status=by_code.get(code)) for code in codes
+        ]
+
+    def status_by_code(self, code: str) -> CouponStatus:
+        """
+        Returns the current status of the coupon with the given code.
+
+        Only the validity window of the coupon is loaded, using the unique index on `code`.
+
+        Arguments:
+            code: The coupon code.
+
+        Raises:
+            NotFound: If the coupon doesn't exist.
+        """
+        window = self._session.exec(
+            select(CouponTable.valid_from, CouponTable.valid_until).where(CouponTable.code == code)
+        ).first()
+        if window is None:
+            raise NotFound(code)
+        return _status_of(*window)
 
     def status_by_id(self, id: int) -> CouponStatus:
         """
         Returns the current status of the coupon with the given ID.
 
+        Only the validity window of the coupon is stored in the cache (if there is one),
+        so the result stays correct as time passes. Windows read from a replica are not cached.
+
         Arguments:
             id: Coupon database ID.
 
         Raises:
             NotFound: If the coupon doesn't exist.
         """
-        coupon = self.get_by_pk(id)
-        if coupon is None:
-            raise NotFound(self._format_primary_key(id))
-        return (
-            CouponStatus.valid
-            if coupon.valid_from <= datetime.utcnow() < coupon.valid_until
-            else CouponStatus.invalid
+        cache = self._validity_cache
+        window = None if cache is None else cache.get(id)
+        if window is None:
+            row = self._session.exec(
+                select(CouponTable.valid_from, CouponTable.valid_until).where(CouponTable.id == id)
+            ).first()
+            if row is None:
+                raise NotFound(self._format_primary_key(id))
+
+            valid_from, valid_until = row
+            window = (valid_from, valid_until)
+            # Windows loaded from a lagging replica could outlive the invalidation of a newer update.
+            if cache is not None and not is_replica_session(self._session):
+                cache.set(id, window)
+
+        return _status_of(*window)
+
+    def _get_redemption_failure(self, code: str, *, customer_id: int | None, at: datetime) -> ServiceException:
+        """
+        Returns the exception that describes why the coupon with the given code could not be redeemed.
+
+        Arguments:
+            code: The coupon code.
+            customer_id: The ID of the redeeming customer.
+            at: The time of the redemption.
+        """
+        row = self._session.execute(
+            sa_select(
+                CouponTable.id,
+                CouponTable.valid_from,
+                CouponTable.valid_until,
+                CouponTable.max_uses,
+                CouponTable.uses,
+            ).where(CouponTable.code == code)
+        ).first()
+        if row is None:
+            return NotFound(code)
+
+        id, valid_from, valid_until, max_uses, uses = row
+        if not (valid_from <= at < valid_until):
+            return RedemptionFailed(RedemptionFailureReason.invalid)
+        if max_uses is not None and uses >= max_uses:
+            return RedemptionFailed(RedemptionFailureReason.exhausted)
+
+        if customer_id is not None:
+            link = self._session.get(CustomerCouponTable, (customer_id, id))
+            if link is not None and link.redeemed_at is not None:
+                return RedemptionFailed(RedemptionFailureReason.already_redeemed)
+
+        return RedemptionFailed(RedemptionFailureReason.not_eligible)
+
+    def _decode_valid_page_cursor(self, cursor: str) -> list[Any]:
+        """
+        Decodes a `get_valid_page()` cursor into `(valid_until, valid_from, id)` key values.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        try:
+            valid_until, valid_from, id = decode_cursor(cursor, size=3)
+            return [
+                _to_naive_utc(datetime.fromisoformat(valid_until)),
+                _to_naive_utc(datetime.fromisoformat(valid_from)),
+                int(id),
+            ]
+        except (TypeError, ValueError):
+            raise InvalidCursor(cursor)
+
+    def _make_eligibility_clause(self, customer_id: int) -> Any:
+        """
+        Returns a clause that is true for the coupons the given customer can use.
+
+        A coupon without customer links is public, otherwise only linked customers can use it.
+
+        Arguments:
+            customer_id: The ID of the customer.
+        """
+        return or_(
+            ~exists().where(CustomerCouponTable.coupon_id == CouponTable.id),
+            exists().where(
+                and_(CustomerCouponTable.coupon_id == CouponTable.id, CustomerCouponTable.customer_id == customer_id)
+            ),
         )
+
+    def _on_changed(self, pk: int) -> None:
+        if self._validity_cache is not None:
+            self._validity_cache.invalidate(pk)
+
+        if (view := self._eligible_coupon_view) is not None:
+            coupon = self._session.get(CouponTable, pk)
+            if coupon is None:
+                view.remove_coupon(pk)
+            else:
+                is_public = self._session.execute(
+                    sa_select(~exists().where(CustomerCouponTable.coupon_id == pk))
+                ).scalar_one()
+                view.update_coupon(Coupon.from_orm(coupon), public=is_public)
+
+
+class AsyncCouponService(AsyncService[CouponTable, CouponCreate, CouponUpdate, int]):
+    """
+    Asynchronous coupon-related services.
+    """
+
+    __slots__ = ("_validity_cache", "_eligible_coupon_view")
+
+    column_expressions = {"uses": _REPORTED_USES}
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        *,
+        validity_cache: CouponValidityCache | None = None,
+        eligible_coupon_view: EligibleCouponView | None = None,
+    ) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            session: The session instance the service will use.
+            validity_cache: Optional, application-wide cache for the validity window of coupons.
+            eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+        """
+        super().__init__(session, model=CouponTable)
+        self._validity_cache = validity_cache
+        self._eligible_coupon_view = eligible_coupon_view
+
+    async def create(self, data: CouponCreate) -> CouponTable:
+        item = await super().create(data)
+        if self._eligible_coupon_view is not None:
+            # New coupons have no customer links, so they are public.
+            self._eligible_coupon_view.add_public(Coupon.from_orm(item))
+
+        return item
+
+    async def status_by_id(self, id: int) -> CouponStatus:
+        """
+        Returns the current status of the coupon with the given ID.
+
+        See `CouponService.status_by_id()` for details.
+
+        Arguments:
+            id: Coupon database ID.
+
+        Raises:
+            NotFound: If the coupon doesn't exist.
+        """
+        cache = self._validity_cache
+        window = None if cache is None else cache.get(id)
+        if window is None:
+            row = (
+                await self._session.exec(
+                    select(CouponTable.valid_from, CouponTable.valid_until).where(CouponTable.id == id)
+                )
+            ).first()
+            if row is None:
+                raise NotFound(self._format_primary_key(id))
+
+            valid_from, valid_until = row
+            window = (valid_from, valid_until)
+            # Windows loaded from a lagging replica could outlive the invalidation of a newer update.
+            if cache is not None and not is_replica_session(self._session):
+                cache.set(id, window)
+
+        return _status_of(*window)
+
+    def _on_changed(self, pk: int) -> None:
+        if self._validity_cache is not None:
+            self._validity_cache.invalidate(pk)
+
+        if self._eligible_coupon_view is not None:
+            # The hook can't load the new state of the coupon, drop the entries that may contain it.
+            self._eligible_coupon_view.invalidate_coupon(pk)
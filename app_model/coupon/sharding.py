@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from sqlmodel import Session
+
+from app_utils.pagination import encode_cursor
+from app_utils.sharding import ShardedService, ShardSet, get_shard
+
+from .model import CouponCreate, CouponTable, CouponUpdate
+from .service import CouponService
+
+
+class ShardedCouponService(ShardedService[CouponService, CouponTable, CouponCreate, CouponUpdate]):
+    """
+    Coupon service that partitions the coupons across the databases of a `ShardSet` by the hash of their code.
+
+    Every shard has the full schema of the application, so coupons can be redeemed in their shard. Customer
+    links are not sharded, so only public coupons are supported. The validity cache and the eligible coupon
+    view use IDs that are only unique within a shard, so they are not used.
+
+    The service is library-only: the application does not use it, it has no settings, and the API
+    routes always use the regular `CouponService` on the application database.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, shards: ShardSet, sessions: list[Session]) -> None:
+        super().__init__(shards, sessions, model=CouponTable)
+
+    def get_by_code(self, code: str) -> CouponTable | None:
+        """
+        Returns the coupon with the given code if it exists, only its shard is queried.
+
+        Arguments:
+            code: The coupon code.
+        """
+        shard = get_shard(code, len(self._services))
+        item = self._services[shard].get_by_code(code)
+        return None if item is None else self._to_sharded(shard, item)
+
+    def get_valid_page(
+        self, at: datetime, *, limit: int, cursor: str | None = None
+    ) -> tuple[list[CouponTable], str | None]:
+        """
+        Returns a page of the coupons that are valid at the given time, and the cursor of the next page.
+
+        The page is queried from every shard in parallel, see `CouponService.get_valid_page()`, and
+        the results are merged in `(valid_until, valid_from, id)` order.
+
+        Arguments:
+            at: The time the coupons must be valid at.
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        key = None if cursor is None else self._services[0]._decode_valid_page_cursor(cursor)
+
+        def get_valid_page(shard: int) -> tuple[list[CouponTable], str | None]:
+            local_cursor = (
+                None
+                if key is None
+                else self._make_local_key_cursor(shard, [key[0].isoformat(), key[1].isoformat()], key[2])
+            )
+            items, next_cursor = self._services[shard].get_valid_page(at, limit=limit, cursor=local_cursor)
+            return [self._to_sharded(shard, item) for item in items], next_cursor
+
+        return self._merge_pages(
+            self._shards.map(get_valid_page),
+            limit=limit,
+            key=lambda item: (item.valid_until, item.valid_from, item.id),
+            make_cursor=lambda item: encode_cursor(
+                [item.valid_until.isoformat(), item.valid_from.isoformat(), item.id]
+            ),
+        )
+
+    def redeem(self, code: str) -> CouponTable:
+        """
+        Redeems the public coupon with the given code in its shard, see `CouponService.redeem()`.
+
+        Arguments:
+            code: The coupon code.
+
+        Raises:
+            CommitFailed: If the service fails to commit the operation.
+            NotFound: If the coupon doesn't exist.
+            RedemptionFailed: If the coupon can not be redeemed.
+        """
+        shard = get_shard(code, len(self._services))
+        return self._to_sharded(shard, self._services[shard].redeem(code))
+
+    def _get_shard_key(self, data: CouponCreate) -> str:
+        return data.code
+
+    def _make_service(self, session: Session) -> CouponService:
+        return CouponService(session)
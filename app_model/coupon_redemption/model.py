@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+from app_utils.typing import UTCDatetime
+
+
+class BaseCouponRedemption(SQLModel):
+    """
+    Base coupon redemption model with shared attributes.
+    """
+
+    coupon_id: int = Field(foreign_key="coupon.id")
+    customer_id: int | None = Field(default=None, foreign_key="customer.id")
+    redeemed_at: UTCDatetime = Field(default_factory=datetime.utcnow)
+
+
+class CouponRedemptionTable(BaseCouponRedemption, table=True):
+    """
+    Append-only coupon redemption ledger. Rows are only updated by the compaction, which sets their
+    `compacted` flag when it adds them to the counters.
+    """
+
+    __tablename__ = "coupon_redemption"
+    __table_args__ = (
+        Index("ix_coupon_redemption_coupon_id_id", "coupon_id", "id"),
+        # Compaction and pending redemption count queries.
+        Index("ix_coupon_redemption_compacted_coupon_id", "compacted", "coupon_id"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    compacted: bool = Field(default=False)  # Whether the redemption was added to the counter of the coupon.
+
+
+class CouponRedemption(BaseCouponRedemption):
+    """
+    Coupon redemption model.
+    """
+
+    id: int
+
+
+class CouponRedemptionCreate(BaseCouponRedemption):
+    """
+    Coupon redemption creation model.
+    """
+
+    ...
+
+
+class CouponRedemptionUpdate(SQLModel):
+    """
+    Coupon redemption update model. Redemptions are immutable.
+    """
+
+    ...
+
+
+class CouponRedemptionCounterTable(SQLModel, table=True):
+    """
+    Compacted per-coupon redemption counter.
+
+    Counters are only written by the compaction, never by redemptions.
+    """
+
+    __tablename__ = "coupon_redemption_counter"
+
+    coupon_id: int = Field(foreign_key="coupon.id", primary_key=True)
+    count: int = 0
+    last_redemption_id: int = Field(default=0, index=True)  # The largest compacted redemption ID of the coupon.
+    compacted_at: UTCDatetime = Field(default_factory=datetime.utcnow)
+
+
+class CouponRedemptionStats(BaseModel):
+    """
+    Coupon redemption statistics model.
+    """
+
+    coupon_id: int
+    count: int  # Compacted redemptions.
+    pending: int  # Redemptions since the last compaction.
+    compacted_at: UTCDatetime | None  # None if the coupon's redemptions have not been compacted yet.
+
+
+class CompactionResult(BaseModel):
+    """
+    Redemption counter compaction result model.
+    """
+
+    coupons: int  # The number of updated counters.
+    redemptions: int  # The number of compacted redemptions.
+    watermark: int  # The largest compacted redemption ID.
@@ -0,0 +1,219 @@
+from typing import cast
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, case, false, func, insert, update
+from sqlalchemy import select as sa_select
+from sqlalchemy.engine import CursorResult
+from sqlmodel import Session, col
+
+from app_model.coupon.model import CouponTable
+from app_utils.service import CommitFailed, NotFound, Service
+
+from .model import (
+    CompactionResult,
+    CouponRedemptionCounterTable,
+    CouponRedemptionCreate,
+    CouponRedemptionStats,
+    CouponRedemptionTable,
+    CouponRedemptionUpdate,
+)
+
+
+class CouponRedemptionService(Service[CouponRedemptionTable, CouponRedemptionCreate, CouponRedemptionUpdate, int]):
+    """
+    Coupon redemption ledger service.
+
+    Redemptions are appended to the ledger by `CouponService.redeem()`. Per-coupon redemption
+    counts are maintained by `compact()`, which folds uncompacted ledger rows into the counter table,
+    so redemptions never write a shared counter row.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, session: Session) -> None:
+        super().__init__(session, model=CouponRedemptionTable)
+
+    def get_page_by_coupon(
+        self, coupon_id: int, *, limit: int, cursor: str | None = None
+    ) -> tuple[list[CouponRedemptionTable], str | None]:
+        """
+        Returns a page of the redemptions of the given coupon ordered by ID, and the cursor of the next page.
+
+        Arguments:
+            coupon_id: The ID of the coupon.
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+            NotFound: If the coupon doesn't exist.
+        """
+        query = self._make_page_query(limit=limit, cursor=cursor).where(CouponRedemptionTable.coupon_id == coupon_id)
+        items = self._session.exec(query).all()
+        if len(items) == 0 and self._session.get(CouponTable, coupon_id) is None:
+            raise NotFound(self._format_primary_key(coupon_id))
+
+        return self._make_page(items, limit=limit)
+
+    def stats(self, coupon_id: int) -> CouponRedemptionStats:
+        """
+        Returns the redemption statistics of the given coupon.
+
+        The compacted count is a single primary key lookup, redemptions that were not compacted yet
+        are counted with a range scan of the `(compacted, coupon_id)` index.
+
+        Arguments:
+            coupon_id: The ID of the coupon.
+
+        Raises:
+            NotFound: If the coupon doesn't exist.
+        """
+        counter = self._session.get(CouponRedemptionCounterTable, coupon_id)
+        pending = self._session.execute(
+            sa_select(func.count()).where(
+                CouponRedemptionTable.compacted == false(), CouponRedemptionTable.coupon_id == coupon_id
+            )
+        ).scalar_one()
+        if counter is None and pending == 0 and self._session.get(CouponTable, coupon_id) is None:
+            raise NotFound(self._format_primary_key(coupon_id))
+
+        return CouponRedemptionStats(
+            coupon_id=coupon_id,
+            count=0 if counter is None else counter.count,
+            pending=pending,
+            compacted_at=None if counter is None else counter.compacted_at,
+        )
+
+    def compact(self, *, settle_seconds: float = 5, batch_size: int = 10_000) -> CompactionResult:
+        """
+        Folds the redemptions that were not compacted yet into the counter table.
+
+        Every batch of uncompacted ledger rows is added to the counters and flagged as compacted in the
+        same transaction, exactly the rows that were counted are flagged. Rows of transactions that commit
+        late or out of ID order are compacted by a later run, they are never skipped. Only redemptions that
+        are older than `settle_seconds` are compacted, so runs don't touch the rows that are being inserted.
+
+        If runs overlap (for example one per worker), flagging fails for the rows the other run
+        compacted, and the run is rolled back.
+
+        Arguments:
+            settle_seconds: The minimum age of the redemptions to compact.
+            batch_size: The maximum number of redemptions per transaction.
+
+        Raises:
+            CommitFailed: If the compaction fails, for example because another run compacted the same rows.
+                The batches committed before the failure stay compacted.
+        """
+        session = self._session
+        now = datetime.utcnow()
+        coupons: set[int] = set()
+        redemptions = 0
+
+        while True:
+            rows = session.execute(
+                sa_select(CouponRedemptionTable.id, CouponRedemptionTable.coupon_id)
+                .where(
+                    CouponRedemptionTable.compacted == false(),
+                    CouponRedemptionTable.redeemed_at <= now - timedelta(seconds=settle_seconds),
+                )
+                .limit(batch_size)
+            ).all()
+            if len(rows) == 0:
+                break
+
+            counts: dict[int, tuple[int, int]] = {}
+            for id, coupon_id in rows:
+                count, last = counts.get(coupon_id, (0, 0))
+                counts[coupon_id] = (count + 1, max(last, id))
+
+            try:
+                self._mark_compacted([id for id, _ in rows])
+                self._add_to_counters(counts, now=now)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                raise CommitFailed("Failed to compact redemptions.") from e
+
+            coupons.update(counts)
+            redemptions += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        watermark = session.execute(
+            sa_select(func.coalesce(func.max(CouponRedemptionCounterTable.last_redemption_id), 0))
+        ).scalar_one()
+        session.rollback()
+        return CompactionResult(coupons=len(coupons), redemptions=redemptions, watermark=watermark)
+
+    def _add_to_counters(self, counts: dict[int, tuple[int, int]], *, now: datetime) -> None:
+        """
+        Adds the given redemption counts to the counters of the coupons, creating the missing counters.
+
+        Arguments:
+            counts: Coupon ID - (redemption count, largest redemption ID) pairs.
+            now: The time of the compaction.
+        """
+        session = self._session
+        existing: set[int] = set()
+        coupon_ids = list(counts)
+        for offset in range(0, len(coupon_ids), 500):
+            existing.update(
+                session.execute(
+                    sa_select(CouponRedemptionCounterTable.coupon_id).where(
+                        col(CouponRedemptionCounterTable.coupon_id).in_(coupon_ids[offset : offset + 500])
+                    )
+                ).scalars()
+            )
+
+        updates = [
+            {"_coupon_id": coupon_id, "_count": count, "_last": last}
+            for coupon_id, (count, last) in counts.items()
+            if coupon_id in existing
+        ]
+        inserts = [
+            {"coupon_id": coupon_id, "count": count, "last_redemption_id": last, "compacted_at": now}
+            for coupon_id, (count, last) in counts.items()
+            if coupon_id not in existing
+        ]
+
+        if updates:
+            last_redemption_id = col(CouponRedemptionCounterTable.last_redemption_id)
+            session.execute(
+                update(CouponRedemptionCounterTable)
+                .where(CouponRedemptionCounterTable.coupon_id == bindparam("_coupon_id"))
+                .values(
+                    count=CouponRedemptionCounterTable.count + bindparam("_count"),
+                    last_redemption_id=case(
+                        (last_redemption_id < bindparam("_last"), bindparam("_last")), else_=last_redemption_id
+                    ),
+                    compacted_at=now,
+                ),
+                updates,
+            )
+        if inserts:
+            session.execute(insert(CouponRedemptionCounterTable), inserts)
+
+    def _mark_compacted(self, ids: list[int]) -> None:
+        """
+        Flags the redemptions with the given IDs as compacted.
+
+        Arguments:
+            ids: The IDs of uncompacted redemptions.
+
+        Raises:
+            ValueError: If some of the redemptions were compacted by another run.
+        """
+        updated = 0
+        for offset in range(0, len(ids), 500):
+            statement = (
+                update(CouponRedemptionTable)
+                .where(col(CouponRedemptionTable.id).in_(ids[offset : offset + 500]))
+                .where(CouponRedemptionTable.compacted == false())
+                .values(compacted=True)
+                .execution_options(synchronize_session=False)
+            )
+            updated += cast(CursorResult, self._session.execute(statement)).rowcount
+
+        if updated != len(ids):
+            raise ValueError("Redemptions were compacted by another run.")
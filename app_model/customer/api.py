@@ -1,37 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app_model.coupon.model import Coupon
-from app_utils.service import CommitFailed, NotFound
-from app_utils.typing import SessionContextProvider
+from app_model.customer_coupon.eligibility import EligibleCouponView
+from app_utils.api import add_async_create_route, add_async_get_all_route, add_async_versioned_item_routes
+from app_utils.etag import get_expected_version, is_not_modified, make_etag, make_version_conflict_error
+from app_utils.pagination import set_next_page_link
+from app_utils.serialization import (
+    FileFormat,
+    ORJSONBytesResponse,
+    get_response_columns,
+    make_export_response,
+    serialize_rows,
+)
+from app_utils.service import BulkResult, CommitFailed, InvalidCursor, NotFound, RelationLoading, VersionConflict
+from app_utils.typing import AsyncSessionContextProvider, SessionContextProvider
 
-from .model import Customer, CustomerCreate, CustomerUpdate
-from .service import CustomerService
+from .model import Customer, CustomerBulkUpdate, CustomerCreate, CustomerUpdate
+from .service import AsyncCustomerService, CustomerService
 
 
 def make_api(
     *,
     session_provider: SessionContextProvider,
+    async_session_provider: AsyncSessionContextProvider | None = None,
     prefix="/customer",
+    add_bulk=True,
     add_create=True,
     add_delete=True,
+    add_export=True,
     add_get_coupons=True,
+    add_get_eligible_coupons=True,
     add_get_all=True,
     add_get_by_id=True,
     add_update=True,
+    page_size=100,
+    max_page_size=1000,
+    fast_serialization=False,
+    bulk_batch_size=1000,
+    export_batch_size=1000,
+    coupons_loading: RelationLoading = RelationLoading.joined,
+    eligible_coupon_view: EligibleCouponView | None = None,
 ) -> APIRouter:
     """
     Customer `APIRouter` factory.
 
     Arguments:
         session_provider: Session context provider dependency.
+        async_session_provider: Optional async session context provider dependency. If set, the get all,
+            create, get by ID, update and delete routes are `async` and use this provider.
         prefix: The prefix for the created `APIRouter`.
+        add_bulk: Whether to add the `/bulk` POST, PUT and DELETE routes.
         add_create: Whether to add the create route.
         add_delete: Whether to add the delete route.
+        add_export: Whether to add the `/export` GET route.
         add_get_coupons: Whether to add the `/{id}/coupons` GET route.
+        add_get_eligible_coupons: Whether to add the `/{id}/coupons/eligible` GET route.
         add_get_all: Whether to add the get all route.
         add_get_by_id: Whether to add the get by ID route.
         add_update: Whether to add the update route.
+        page_size: The default number of items per page in list routes.
+        max_page_size: The maximum number of items per page clients can request in list routes.
+        fast_serialization: Whether the get all route should serialize database rows directly to JSON,
+            skipping the creation and validation of model instances. The output is the same.
+        bulk_batch_size: The maximum number of items per transaction in bulk routes.
+        export_batch_size: The number of rows the export route fetches from the database at once.
+        coupons_loading: The loading strategy of the `/{id}/coupons` route.
+        eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+            The services of the API keep it up to date.
     """
 
     api = APIRouter(prefix=prefix)
@@ -40,15 +78,35 @@ def make_api(
         """
         FastAPI dependency that creates a service instance for the API.
         """
-        return CustomerService(session)
+        return CustomerService(session, eligible_coupon_view=eligible_coupon_view)
 
-    if add_get_all:
+    if add_get_all and async_session_provider is None:
 
         @api.get("/", response_model=list[Customer])
-        def get_all(service: CustomerService = Depends(get_service)):
-            return service.get_all()
+        def get_all(
+            request: Request,
+            response: Response,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CustomerService = Depends(get_service),
+        ):
+            try:
+                if fast_serialization:
+                    # Serialize the rows directly, the returned response skips response model validation.
+                    columns = get_response_columns(Customer)
+                    rows, next_cursor = service.get_row_page(columns, limit=limit, cursor=cursor)
+                    fast_response = ORJSONBytesResponse(serialize_rows(columns, rows))
+                    set_next_page_link(request, fast_response, next_cursor)
+                    return fast_response
 
-    if add_create:
+                items, next_cursor = service.get_page(limit=limit, cursor=cursor)
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
+
+    if add_create and async_session_provider is None:
 
         @api.post("/", response_model=Customer)
         def create(customer: CustomerCreate, service: CustomerService = Depends(get_service)):
@@ -60,34 +118,96 @@ def make_api(
                     detail="Failed to created customer. Username is probably already in use.",
                 )
 
-    if add_get_by_id:
+    if add_bulk:
+
+        @api.post("/bulk", response_model=BulkResult)
+        def create_many(items: list[CustomerCreate], service: CustomerService = Depends(get_service)):
+            """
+            Creates customers in batched transactions and reports the failed items.
+            """
+            return service.create_many(items, batch_size=bulk_batch_size)
+
+        @api.put("/bulk", response_model=BulkResult)
+        def update_many(items: list[CustomerBulkUpdate], service: CustomerService = Depends(get_service)):
+            """
+            Updates customers in batched transactions and reports the failed items.
+            """
+            return service.update_many([(item.id, item.data) for item in items], batch_size=bulk_batch_size)
+
+        @api.delete("/bulk", response_model=BulkResult)
+        def delete_many(ids: list[int], service: CustomerService = Depends(get_service)):
+            """
+            Deletes customers in batched transactions and reports the failed items.
+            """
+            return service.delete_many(ids, batch_size=bulk_batch_size)
+
+    if add_export:
+
+        @api.get("/export", response_class=StreamingResponse)
+        def export(format: FileFormat = FileFormat.ndjson, service: CustomerService = Depends(get_service)):
+            """
+            Streams all customers as NDJSON or CSV.
+            """
+            columns = get_response_columns(Customer)
+            rows = service.iter_all(columns, batch_size=export_batch_size)
+            return make_export_response(columns, rows, format=format, filename="customers")
+
+    if add_get_by_id and async_session_provider is None:
 
         @api.get("/{id}", response_model=Customer)
-        def get_by_id(id: int, service: CustomerService = Depends(get_service)):
+        def get_by_id(
+            id: int,
+            response: Response,
+            if_none_match: str | None = Header(None),
+            service: CustomerService = Depends(get_service),
+        ):
             customer = service.get_by_pk(id)
             if customer is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found.")
+
+            etag = make_etag(customer.version)
+            if is_not_modified(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+            response.headers["ETag"] = etag
             return customer
 
-    if add_update:
+    if add_update and async_session_provider is None:
 
         @api.put("/{id}", response_model=Customer)
-        def update_by_id(id: int, data: CustomerUpdate, service: CustomerService = Depends(get_service)):
+        def update_by_id(
+            id: int,
+            data: CustomerUpdate,
+            response: Response,
+            if_match: str | None = Header(None),
+            service: CustomerService = Depends(get_service),
+        ):
+            expected_version = get_expected_version(if_match)
             try:
-                return service.update(id, data)
+                customer = service.update(id, data, expected_version=expected_version)
             except NotFound:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found.")
+            except VersionConflict:
+                raise make_version_conflict_error(if_match)
             except Exception:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Customer update failed.")
 
-    if add_delete:
+            response.headers["ETag"] = make_etag(customer.version)
+            return customer
+
+    if add_delete and async_session_provider is None:
 
         @api.delete("/{id}")
-        def delete_by_id(id: int, service: CustomerService = Depends(get_service)):
+        def delete_by_id(
+            id: int, if_match: str | None = Header(None), service: CustomerService = Depends(get_service)
+        ):
+            expected_version = get_expected_version(if_match)
             try:
-                service.delete_by_pk(id)
+                service.delete_by_pk(id, expected_version=expected_version)
             except NotFound:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found.")
+            except VersionConflict:
+                raise make_version_conflict_error(if_match)
             except CommitFailed:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to delete customer.")
 
@@ -96,10 +216,122 @@ def make_api(
     if add_get_coupons:
 
         @api.get("/{id}/coupons", response_model=list[Coupon])
-        def get_customer_coupons(id: int, service: CustomerService = Depends(get_service)):
-            customer = service.get_by_pk(id)
-            if customer is None:
+        def get_customer_coupons(
+            id: int,
+            request: Request,
+            response: Response,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CustomerService = Depends(get_service),
+        ):
+            try:
+                items, next_cursor = service.get_related_page(
+                    id, "coupons", limit=limit, cursor=cursor, loading=coupons_loading
+                )
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found.")
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
+
+    if add_get_eligible_coupons:
+
+        @api.get("/{id}/coupons/eligible", response_model=list[Coupon])
+        def get_eligible_coupons(
+            id: int,
+            request: Request,
+            response: Response,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CustomerService = Depends(get_service),
+        ):
+            """
+            Returns a page of the coupons the customer can use right now: the valid coupons that are linked
+            to the customer and the valid public coupons, in the order they expire.
+            """
+            try:
+                items, next_cursor = service.get_eligible_coupons(id, limit=limit, cursor=cursor)
+            except NotFound:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found.")
-            return customer.coupons
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
+
+    if async_session_provider is not None:
+        _add_async_routes(
+            api,
+            async_session_provider=async_session_provider,
+            add_create=add_create,
+            add_delete=add_delete,
+            add_get_all=add_get_all,
+            add_get_by_id=add_get_by_id,
+            add_update=add_update,
+            page_size=page_size,
+            max_page_size=max_page_size,
+            fast_serialization=fast_serialization,
+            eligible_coupon_view=eligible_coupon_view,
+        )
 
     return api
+
+
+def _add_async_routes(
+    api: APIRouter,
+    *,
+    async_session_provider: AsyncSessionContextProvider,
+    add_create: bool,
+    add_delete: bool,
+    add_get_all: bool,
+    add_get_by_id: bool,
+    add_update: bool,
+    page_size: int,
+    max_page_size: int,
+    fast_serialization: bool,
+    eligible_coupon_view: EligibleCouponView | None,
+) -> None:
+    """
+    Adds the `async` variant of the CRUD routes to the given `APIRouter`.
+
+    The routes are added last, so they can not shadow the static routes of `make_api()`.
+    See `make_api()` for the description of the arguments.
+    """
+
+    def get_service(session: AsyncSession = Depends(async_session_provider)) -> AsyncCustomerService:
+        """
+        FastAPI dependency that creates an async service instance for the API.
+        """
+        return AsyncCustomerService(session, eligible_coupon_view=eligible_coupon_view)
+
+    if add_get_all:
+        add_async_get_all_route(
+            api,
+            get_service=get_service,
+            model=Customer,
+            page_size=page_size,
+            max_page_size=max_page_size,
+            fast_serialization=fast_serialization,
+        )
+
+    if add_create:
+        add_async_create_route(
+            api,
+            get_service=get_service,
+            model=Customer,
+            create_model=CustomerCreate,
+            error_detail="Failed to created customer. Username is probably already in use.",
+        )
+
+    add_async_versioned_item_routes(
+        api,
+        get_service=get_service,
+        model=Customer,
+        update_model=CustomerUpdate,
+        name="Customer",
+        add_delete=add_delete,
+        add_get_by_id=add_get_by_id,
+        add_update=add_update,
+    )
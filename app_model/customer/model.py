@@ -32,6 +32,7 @@ class CustomerTable(BaseCustomer, table=True):
 
     id: int | None = Field(default=None, primary_key=True)
     created_at: UTCDatetime | None = Field(default_factory=datetime.utcnow)
+    version: int = Field(default=1)  # Incremented by every change, see `Service.update()`.
 
     coupons: list["CouponTable"] = Relationship(back_populates="customers", link_model=CustomerCouponTable)
 
@@ -43,6 +44,7 @@ class Customer(BaseCustomer):
 
     id: int
     created_at: UTCDatetime
+    version: int
 
 
 class CustomerCreate(BaseCustomer):
@@ -59,3 +61,12 @@ class CustomerUpdate(SQLModel):
     """
 
     name: str | None
+
+
+class CustomerBulkUpdate(SQLModel):
+    """
+    Customer bulk update item model.
+    """
+
+    id: int
+    data: CustomerUpdate
@@ -1,22 +1,188 @@
-from sqlmodel import Session
+from typing import Any
 
-from app_utils.service import Service
+from datetime import datetime, timezone
+
+from sqlalchemy import exists, or_, tuple_
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app_model.coupon.model import Coupon, CouponTable
+from app_model.customer_coupon.eligibility import EligibleCouponView, filter_usable
+from app_model.customer_coupon.model import CustomerCouponTable
+from app_utils.async_service import AsyncService
+from app_utils.pagination import decode_cursor, encode_cursor
+from app_utils.replicas import is_replica_session
+from app_utils.service import InvalidCursor, NotFound, Service
 
 from .model import CustomerTable, CustomerCreate, CustomerUpdate
 
 
+def _get_eligible_key(coupon: Coupon) -> tuple[datetime, datetime, int]:
+    """
+    Returns the `(valid_until, valid_from, id)` key eligible coupons are ordered by.
+    """
+    return coupon.valid_until, coupon.valid_from, coupon.id
+
+
 class CustomerService(Service[CustomerTable, CustomerCreate, CustomerUpdate, int]):
     """
     Customer-related services.
     """
 
-    __slots__ = ()
+    __slots__ = ("_eligible_coupon_view",)
 
-    def __init__(self, session: Session) -> None:
+    def __init__(self, session: Session, *, eligible_coupon_view: EligibleCouponView | None = None) -> None:
         """
         Initialization.
 
         Arguments:
             session: The session instance the service will use.
+            eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
         """
         super().__init__(session, model=CustomerTable)
+        self._eligible_coupon_view = eligible_coupon_view
+
+    def get_eligible_coupons(
+        self, id: int, *, limit: int, cursor: str | None = None
+    ) -> tuple[list[Coupon], str | None]:
+        """
+        Returns a page of the coupons the customer with the given ID can use right now, and the cursor
+        of the next page. Coupons are ordered by `(valid_until, valid_from, id)`: the valid coupons that
+        are linked to the customer and not redeemed by them yet, and the valid public coupons. Exhausted
+        coupons are excluded.
+
+        The coupons are served from the eligible coupon view if the service has one, so the cost of
+        the call only depends on the number of eligible coupons. Missing view entries are loaded from the
+        database, they are only stored in the view if the session is not a read replica's. Without a
+        writable view, only the requested page is read from the database.
+
+        Arguments:
+            id: The ID of the customer.
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            NotFound: If the customer doesn't exist.
+            InvalidCursor: If the cursor is malformed.
+        """
+        after = None if cursor is None else self._decode_eligible_cursor(cursor)
+        now = datetime.now(timezone.utc)
+        view = self._eligible_coupon_view
+        linked, public = (None, None) if view is None else view.get(id, at=now)
+        version = 0 if view is None else view.version
+        # Entries loaded from a lagging replica could outlive the invalidation of a newer write.
+        writable_view = None if is_replica_session(self._session) else view
+
+        if linked is None:
+            query = (
+                select(CouponTable)
+                .join(CustomerCouponTable, col(CustomerCouponTable.coupon_id) == CouponTable.id)
+                .where(CustomerCouponTable.customer_id == id, col(CustomerCouponTable.redeemed_at).is_(None))
+            )
+            if writable_view is None:
+                linked = self._get_usable_page(query, at=now, after=after, limit=limit + 1)
+                if len(linked) == 0 and self.get_by_pk(id) is None:
+                    raise NotFound(self._format_primary_key(id))
+            else:
+                all_linked = [Coupon.from_orm(c) for c in self._session.exec(query)]
+                if len(all_linked) == 0 and self.get_by_pk(id) is None:
+                    raise NotFound(self._format_primary_key(id))
+
+                writable_view.set_linked(id, all_linked, version=version)
+                linked = filter_usable(all_linked, now)
+
+        if public is None:
+            query = select(CouponTable).where(~exists().where(CustomerCouponTable.coupon_id == CouponTable.id))
+            if writable_view is None:
+                public = self._get_usable_page(query, at=now, after=after, limit=limit + 1)
+            else:
+                query = query.where(col(CouponTable.valid_until) > now.replace(tzinfo=None))
+                all_public = [Coupon.from_orm(c) for c in self._session.exec(query)]
+                writable_view.set_public(all_public, version=version)
+                public = filter_usable(all_public, now)
+
+        # Entries of the view may briefly overlap after changes made by other workers.
+        coupons = {c.id: c for c in (*public, *linked)}.values()
+        items = sorted(
+            (c for c in coupons if after is None or _get_eligible_key(c) > after),
+            key=_get_eligible_key,
+        )
+        if len(items) <= limit:
+            return items, None
+
+        items = items[:limit]
+        last = items[-1]
+        return items, encode_cursor([last.valid_until.isoformat(), last.valid_from.isoformat(), last.id])
+
+    def _get_usable_page(
+        self, query: Any, *, at: datetime, after: tuple[datetime, datetime, int] | None, limit: int
+    ) -> list[Coupon]:
+        """
+        Returns the first `limit` coupons of the given query that are usable at the given time and
+        come after the given `(valid_until, valid_from, id)` key, in key order.
+
+        The conditions are the same as the ones of `filter_usable()`.
+        """
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+        key_columns = (col(CouponTable.valid_until), col(CouponTable.valid_from), col(CouponTable.id))
+        query = query.where(
+            col(CouponTable.valid_from) <= at,
+            col(CouponTable.valid_until) > at,
+            or_(col(CouponTable.max_uses).is_(None), col(CouponTable.uses) < col(CouponTable.max_uses)),
+        )
+        if after is not None:
+            valid_until, valid_from, id = after
+            key: list[Any] = [
+                valid_until.astimezone(timezone.utc).replace(tzinfo=None),
+                valid_from.astimezone(timezone.utc).replace(tzinfo=None),
+                id,
+            ]
+            query = query.where(tuple_(*key_columns) > tuple_(*key))
+
+        return [Coupon.from_orm(c) for c in self._session.exec(query.order_by(*key_columns).limit(limit))]
+
+    def _decode_eligible_cursor(self, cursor: str) -> tuple[datetime, datetime, int]:
+        """
+        Decodes a `get_eligible_coupons()` cursor into aware `(valid_until, valid_from, id)` key values.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        try:
+            valid_until, valid_from, id = decode_cursor(cursor, size=3, types=[datetime, datetime, int])
+        except ValueError:
+            raise InvalidCursor(cursor)
+
+        # Naive datetimes are in UTC, like the stored ones.
+        return (
+            valid_until if valid_until.tzinfo is not None else valid_until.replace(tzinfo=timezone.utc),
+            valid_from if valid_from.tzinfo is not None else valid_from.replace(tzinfo=timezone.utc),
+            id,
+        )
+
+    def _on_changed(self, pk: int) -> None:
+        if self._eligible_coupon_view is not None:
+            self._eligible_coupon_view.invalidate_customer(pk)
+
+
+class AsyncCustomerService(AsyncService[CustomerTable, CustomerCreate, CustomerUpdate, int]):
+    """
+    Asynchronous customer-related services.
+    """
+
+    __slots__ = ("_eligible_coupon_view",)
+
+    def __init__(self, session: AsyncSession, *, eligible_coupon_view: EligibleCouponView | None = None) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            session: The session instance the service will use.
+            eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+        """
+        super().__init__(session, model=CustomerTable)
+        self._eligible_coupon_view = eligible_coupon_view
+
+    def _on_changed(self, pk: int) -> None:
+        if self._eligible_coupon_view is not None:
+            self._eligible_coupon_view.invalidate_customer(pk)
@@ -1,32 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app_utils.service import CommitFailed, NotFound
-from app_utils.typing import SessionContextProvider
+from app_utils.api import add_async_create_route, add_async_get_all_route
+from app_utils.pagination import set_next_page_link
+from app_utils.serialization import ORJSONBytesResponse, get_response_columns, serialize_rows
+from app_utils.service import BulkResult, CommitFailed, InvalidCursor, NotFound
+from app_utils.typing import AsyncSessionContextProvider, SessionContextProvider
 
+from .eligibility import EligibleCouponView
 from .model import CustomerCoupon, CustomerCouponCreate
-from .service import CustomerCouponService
+from .service import AsyncCustomerCouponService, CustomerCouponService
 
 
 def make_api(
     *,
     session_provider: SessionContextProvider,
+    async_session_provider: AsyncSessionContextProvider | None = None,
     prefix="/customer-coupon",
+    add_bulk=True,
     add_create=True,
     add_delete=True,
     add_get_all=True,
     add_get_by_id=True,
+    page_size=100,
+    max_page_size=1000,
+    fast_serialization=False,
+    bulk_batch_size=1000,
+    eligible_coupon_view: EligibleCouponView | None = None,
 ) -> APIRouter:
     """
     Customer coupon `APIRouter` factory.
 
     Arguments:
         session_provider: Session context provider dependency.
+        async_session_provider: Optional async session context provider dependency. If set, the get all,
+            create, get by ID and delete routes are `async` and use this provider.
         prefix: The prefix for the created `APIRouter`.
+        add_bulk: Whether to add the `/bulk` POST and DELETE routes.
         add_create: Whether to add the create route.
         add_delete: Whether to add the delete route.
         add_get_all: Whether to add the get all route.
         add_get_by_id: Whether to add the get by ID route.
+        page_size: The default number of items per page in list routes.
+        max_page_size: The maximum number of items per page clients can request in list routes.
+        fast_serialization: Whether the get all route should serialize database rows directly to JSON,
+            skipping the creation and validation of model instances. The output is the same.
+        bulk_batch_size: The maximum number of items per transaction in bulk routes.
+        eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+            The services of the API keep it up to date.
     """
 
     api = APIRouter(prefix=prefix)
@@ -35,15 +57,35 @@ def make_api(
         """
         FastAPI dependency that creates a service instance for the API.
         """
-        return CustomerCouponService(session)
+        return CustomerCouponService(session, eligible_coupon_view=eligible_coupon_view)
 
-    if add_get_all:
+    if add_get_all and async_session_provider is None:
 
         @api.get("/", response_model=list[CustomerCoupon])
-        def get_all(service: CustomerCouponService = Depends(get_service)):
-            return service.get_all()
+        def get_all(
+            request: Request,
+            response: Response,
+            limit: int = Query(page_size, ge=1, le=max_page_size),
+            cursor: str | None = None,
+            service: CustomerCouponService = Depends(get_service),
+        ):
+            try:
+                if fast_serialization:
+                    # Serialize the rows directly, the returned response skips response model validation.
+                    columns = get_response_columns(CustomerCoupon)
+                    rows, next_cursor = service.get_row_page(columns, limit=limit, cursor=cursor)
+                    fast_response = ORJSONBytesResponse(serialize_rows(columns, rows))
+                    set_next_page_link(request, fast_response, next_cursor)
+                    return fast_response
 
-    if add_create:
+                items, next_cursor = service.get_page(limit=limit, cursor=cursor)
+            except InvalidCursor:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+            set_next_page_link(request, response, next_cursor)
+            return items
+
+    if add_create and async_session_provider is None:
 
         @api.post("/", response_model=CustomerCoupon)
         def create(customer: CustomerCouponCreate, service: CustomerCouponService = Depends(get_service)):
@@ -55,7 +97,23 @@ def make_api(
                     detail="Failed to create customer-coupon link.",
                 )
 
-    if add_get_by_id:
+    if add_bulk:
+
+        @api.post("/bulk", response_model=BulkResult)
+        def create_many(items: list[CustomerCouponCreate], service: CustomerCouponService = Depends(get_service)):
+            """
+            Creates customer-coupon links in batched transactions and reports the failed items.
+            """
+            return service.create_many(items, batch_size=bulk_batch_size)
+
+        @api.delete("/bulk", response_model=BulkResult)
+        def delete_many(keys: list[CustomerCoupon], service: CustomerCouponService = Depends(get_service)):
+            """
+            Deletes customer-coupon links in batched transactions and reports the failed items.
+            """
+            return service.delete_many([key.dict() for key in keys], batch_size=bulk_batch_size)
+
+    if add_get_by_id and async_session_provider is None:
 
         @api.get("/{customer_id}/{coupon_id}", response_model=CustomerCoupon)
         def get_by_id(coupon_id: int, customer_id: int, service: CustomerCouponService = Depends(get_service)):
@@ -64,7 +122,7 @@ def make_api(
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer coupon link not found.")
             return customer_coupon
 
-    if add_delete:
+    if add_delete and async_session_provider is None:
 
         @api.delete("/{customer_id}/{coupon_id}")
         def delete_by_id(coupon_id: int, customer_id: int, service: CustomerCouponService = Depends(get_service)):
@@ -79,4 +137,92 @@ def make_api(
 
             return Response(status_code=status.HTTP_200_OK)
 
+    if async_session_provider is not None:
+        _add_async_routes(
+            api,
+            async_session_provider=async_session_provider,
+            add_create=add_create,
+            add_delete=add_delete,
+            add_get_all=add_get_all,
+            add_get_by_id=add_get_by_id,
+            page_size=page_size,
+            max_page_size=max_page_size,
+            fast_serialization=fast_serialization,
+            eligible_coupon_view=eligible_coupon_view,
+        )
+
     return api
+
+
+def _add_async_routes(
+    api: APIRouter,
+    *,
+    async_session_provider: AsyncSessionContextProvider,
+    add_create: bool,
+    add_delete: bool,
+    add_get_all: bool,
+    add_get_by_id: bool,
+    page_size: int,
+    max_page_size: int,
+    fast_serialization: bool,
+    eligible_coupon_view: EligibleCouponView | None,
+) -> None:
+    """
+    Adds the `async` variant of the CRUD routes to the given `APIRouter`.
+
+    The routes are added last, so they can not shadow the static routes of `make_api()`.
+    See `make_api()` for the description of the arguments.
+    """
+
+    def get_service(session: AsyncSession = Depends(async_session_provider)) -> AsyncCustomerCouponService:
+        """
+        FastAPI dependency that creates an async service instance for the API.
+        """
+        return AsyncCustomerCouponService(session, eligible_coupon_view=eligible_coupon_view)
+
+    if add_get_all:
+        add_async_get_all_route(
+            api,
+            get_service=get_service,
+            model=CustomerCoupon,
+            page_size=page_size,
+            max_page_size=max_page_size,
+            fast_serialization=fast_serialization,
+        )
+
+    if add_create:
+        add_async_create_route(
+            api,
+            get_service=get_service,
+            model=CustomerCoupon,
+            create_model=CustomerCouponCreate,
+            error_detail="Failed to create customer-coupon link.",
+        )
+
+    if add_get_by_id:
+
+        @api.get("/{customer_id}/{coupon_id}", response_model=CustomerCoupon)
+        async def get_by_id(
+            coupon_id: int, customer_id: int, service: AsyncCustomerCouponService = Depends(get_service)
+        ):
+            customer_coupon = await service.get_by_pk({"customer_id": customer_id, "coupon_id": coupon_id})
+            if customer_coupon is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer coupon link not found.")
+            return customer_coupon
+
+    if add_delete:
+
+        @api.delete("/{customer_id}/{coupon_id}")
+        async def delete_by_id(
+            coupon_id: int, customer_id: int, service: AsyncCustomerCouponService = Depends(get_service)
+        ):
+            try:
+                await service.delete_by_pk({"customer_id": customer_id, "coupon_id": coupon_id})
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer coupon not found.")
+            except CommitFailed:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to delete customer coupon."
+                )
+
+            return Response(status_code=status.HTTP_200_OK)
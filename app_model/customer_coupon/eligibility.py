@@ -0,0 +1,278 @@
+from typing import Iterable
+
+from collections import OrderedDict
+from datetime import datetime
+from threading import Lock
+import time
+
+from app_model.coupon.model import Coupon
+from app_utils.cache import CacheStats
+
+
+class EligibleCouponView:
+    """
+    Thread-safe, in-process view of the coupons customers are eligible for.
+
+    The view stores the linked coupons of the recently used customers (bounded LRU) and a single,
+    shared entry with the public (unlinked) coupons that haven't expired yet. Services keep the
+    view up to date incrementally after their changes are committed, and entries expire after a
+    fixed time to pick up changes made by other workers.
+
+    Entries are loaded by the caller. To avoid storing data that was loaded before a concurrent
+    change, loaded data must be stored with the `version` of the view read before loading it.
+    """
+
+    __slots__ = (
+        "_customers",
+        "_public",
+        "_lock",
+        "_max_size",
+        "_ttl",
+        "_version",
+        "_hits",
+        "_misses",
+    )
+
+    def __init__(self, *, max_size: int, ttl: float) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            max_size: The maximum number of customer entries, the least recently used entry is evicted
+                when it's exceeded.
+            ttl: The number of seconds after which an entry expires.
+        """
+        self._customers: OrderedDict[int, tuple[float, dict[int, Coupon]]] = OrderedDict()
+        self._public: tuple[float, dict[int, Coupon]] | None = None
+        self._lock = Lock()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._version = 0
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def version(self) -> int:
+        """
+        The version of the view, it changes with every update.
+        """
+        return self._version
+
+    def get(self, customer_id: int, *, at: datetime) -> tuple[list[Coupon] | None, list[Coupon] | None]:
+        """
+        Returns the linked and the public coupons of the given customer that are valid at the given time
+        and have uses left.
+
+        Either list is `None` if the corresponding entry is not in the view (or has expired).
+
+        Arguments:
+            customer_id: The ID of the customer.
+            at: The time the coupons must be valid at, with UTC timezone info like the dates of coupons.
+        """
+        now = time.monotonic()
+        with self._lock:
+            customer = self._customers.get(customer_id)
+            if customer is not None and customer[0] <= now:
+                del self._customers[customer_id]
+                customer = None
+
+            if self._public is not None and self._public[0] <= now:
+                self._public = None
+
+            if customer is None:
+                self._misses += 1
+            else:
+                self._customers.move_to_end(customer_id)
+                self._hits += 1
+
+            linked = None if customer is None else filter_usable(customer[1].values(), at)
+            public = None if self._public is None else filter_usable(self._public[1].values(), at)
+            return linked, public
+
+    def set_linked(self, customer_id: int, coupons: list[Coupon], *, version: int) -> None:
+        """
+        Stores the linked coupons of the given customer if the view hasn't changed since `version`.
+
+        Arguments:
+            customer_id: The ID of the customer.
+            coupons: All the coupons that are linked to the customer and not redeemed by them yet.
+            version: The version of the view before the coupons were loaded.
+        """
+        with self._lock:
+            if version != self._version:
+                return
+
+            self._customers[customer_id] = (time.monotonic() + self._ttl, {c.id: c for c in coupons})
+            self._customers.move_to_end(customer_id)
+            if len(self._customers) > self._max_size:
+                self._customers.popitem(last=False)
+
+    def set_public(self, coupons: list[Coupon], *, version: int) -> None:
+        """
+        Stores the public coupons if the view hasn't changed since `version`.
+
+        Arguments:
+            coupons: The public coupons that haven't expired yet.
+            version: The version of the view before the coupons were loaded.
+        """
+        with self._lock:
+            if version == self._version:
+                self._public = (time.monotonic() + self._ttl, {c.id: c for c in coupons})
+
+    def add_public(self, coupon: Coupon) -> None:
+        """
+        Adds the given public coupon to the view.
+
+        Arguments:
+            coupon: The coupon to add.
+        """
+        with self._lock:
+            self._version += 1
+            if self._public is not None:
+                self._public[1][coupon.id] = coupon
+
+    def update_coupon(self, coupon: Coupon, *, public: bool) -> None:
+        """
+        Replaces the given coupon in every entry it is in.
+
+        Arguments:
+            coupon: The new version of the coupon.
+            public: Whether the coupon is public, public coupons are also added to the public entry.
+        """
+        with self._lock:
+            self._version += 1
+            if self._public is not None and (public or coupon.id in self._public[1]):
+                self._public[1][coupon.id] = coupon
+
+            for _, coupons in self._customers.values():
+                if coupon.id in coupons:
+                    coupons[coupon.id] = coupon
+
+    def remove_coupon(self, coupon_id: int) -> None:
+        """
+        Removes the coupon with the given ID from every entry.
+
+        Arguments:
+            coupon_id: The ID of the removed coupon.
+        """
+        with self._lock:
+            self._version += 1
+            if self._public is not None:
+                self._public[1].pop(coupon_id, None)
+
+            for _, coupons in self._customers.values():
+                coupons.pop(coupon_id, None)
+
+    def add_link(self, customer_id: int, coupon: Coupon) -> None:
+        """
+        Links the given coupon to the given customer, the coupon is not public anymore.
+
+        Arguments:
+            customer_id: The ID of the customer.
+            coupon: The linked coupon.
+        """
+        with self._lock:
+            self._version += 1
+            if self._public is not None:
+                self._public[1].pop(coupon.id, None)
+
+            customer = self._customers.get(customer_id)
+            if customer is not None:
+                customer[1][coupon.id] = coupon
+
+    def remove_redeemed(self, customer_id: int, coupon_id: int) -> None:
+        """
+        Removes the given coupon from the entry of the given customer, who has redeemed it.
+
+        Arguments:
+            customer_id: The ID of the customer.
+            coupon_id: The ID of the redeemed coupon.
+        """
+        with self._lock:
+            self._version += 1
+            customer = self._customers.get(customer_id)
+            if customer is not None:
+                customer[1].pop(coupon_id, None)
+
+    def remove_link(self, customer_id: int, coupon_id: int, *, public_coupon: Coupon | None = None) -> None:
+        """
+        Removes the link between the given customer and coupon.
+
+        Arguments:
+            customer_id: The ID of the customer.
+            coupon_id: The ID of the coupon.
+            public_coupon: The coupon if it became public because this was its last link.
+        """
+        with self._lock:
+            self._version += 1
+            customer = self._customers.get(customer_id)
+            if customer is not None:
+                customer[1].pop(coupon_id, None)
+
+            if public_coupon is not None and self._public is not None:
+                self._public[1][public_coupon.id] = public_coupon
+
+    def invalidate_coupon(self, coupon_id: int) -> None:
+        """
+        Removes the public entry and the entries of the customers the given coupon is linked to.
+
+        Use it if the new state of the coupon is not known.
+
+        Arguments:
+            coupon_id: The ID of the coupon.
+        """
+        with self._lock:
+            self._version += 1
+            self._public = None
+            for customer_id in [k for k, (_, coupons) in self._customers.items() if coupon_id in coupons]:
+                del self._customers[customer_id]
+
+    def invalidate_customer(self, customer_id: int) -> None:
+        """
+        Removes the entry of the given customer from the view.
+
+        Arguments:
+            customer_id: The ID of the customer.
+        """
+        with self._lock:
+            self._version += 1
+            self._customers.pop(customer_id, None)
+
+    def invalidate_public(self) -> None:
+        """
+        Removes the public entry from the view.
+        """
+        with self._lock:
+            self._version += 1
+            self._public = None
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the view and resets the statistics.
+        """
+        with self._lock:
+            self._version += 1
+            self._customers.clear()
+            self._public = None
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> CacheStats:
+        """
+        Returns the statistics of the customer entries of the view.
+        """
+        with self._lock:
+            return CacheStats(
+                hits=self._hits, misses=self._misses, size=len(self._customers), max_size=self._max_size
+            )
+
+
+def filter_usable(coupons: Iterable[Coupon], at: datetime) -> list[Coupon]:
+    """
+    Returns the given coupons that are valid at the given time and have uses left.
+    """
+    return [
+        c
+        for c in coupons
+        if c.valid_from <= at < c.valid_until and (c.max_uses is None or c.uses is None or c.uses < c.max_uses)
+    ]
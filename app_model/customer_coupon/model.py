@@ -1,5 +1,8 @@
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
+from app_utils.typing import UTCDatetime
+
 
 class BaseCustomerCoupon(SQLModel):
     """
@@ -16,6 +19,9 @@ class CustomerCouponTable(BaseCustomerCoupon, table=True):
     """
 
     __tablename__ = "customer_coupon"
+    __table_args__ = (Index("ix_customer_coupon_coupon_id", "coupon_id"),)  # The primary key starts with customer_id.
+
+    redeemed_at: UTCDatetime | None = Field(default=None)  # Set when the customer redeems the coupon.
 
 
 class CustomerCoupon(BaseCustomerCoupon):
@@ -23,7 +29,7 @@ class CustomerCoupon(BaseCustomerCoupon):
     Customer coupon model.
     """
 
-    ...
+    redeemed_at: UTCDatetime | None = None
 
 
 class CustomerCouponCreate(BaseCustomerCoupon):
@@ -1,9 +1,15 @@
-from typing import Mapping, TypedDict
+from typing import Mapping, Sequence, TypedDict
 
-from sqlmodel import Session
+from sqlalchemy import exists
+from sqlalchemy import select as sa_select
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app_utils.service import Service
+from app_model.coupon.model import Coupon, CouponTable
+from app_utils.async_service import AsyncService
+from app_utils.service import BulkResult, Service
 
+from .eligibility import EligibleCouponView
 from .model import CustomerCouponTable, CustomerCouponCreate, CustomerCouponUpdate
 
 
@@ -12,14 +18,102 @@ class CustomerCouponKey(TypedDict):
     coupon_id: int
 
 
+CustomerCouponPK = tuple[int, int] | Mapping[str, int]
+
+
 class CustomerCouponService(
-    Service[CustomerCouponTable, CustomerCouponCreate, CustomerCouponUpdate, tuple[int, int] | Mapping[str, int]]
+    Service[CustomerCouponTable, CustomerCouponCreate, CustomerCouponUpdate, CustomerCouponPK]
 ):
     """
     Customer coupon service.
     """
 
-    __slots__ = ()
+    __slots__ = ("_eligible_coupon_view",)
+
+    def __init__(self, session: Session, *, eligible_coupon_view: EligibleCouponView | None = None) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            session: The session instance the service will use.
+            eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+        """
+        super().__init__(session, model=CustomerCouponTable)
+        self._eligible_coupon_view = eligible_coupon_view
+
+    def create(self, data: CustomerCouponCreate) -> CustomerCouponTable:
+        item = super().create(data)
+        self._on_linked([(item.customer_id, item.coupon_id)])
+        return item
+
+    def create_many(self, items: Sequence[CustomerCouponCreate], *, batch_size: int = 1000) -> BulkResult:
+        result = super().create_many(items, batch_size=batch_size)
+        failed = {error.index for error in result.errors}
+        self._on_linked([(item.customer_id, item.coupon_id) for i, item in enumerate(items) if i not in failed])
+        return result
+
+    def _on_linked(self, links: list[tuple[int, int]]) -> None:
+        """
+        Adds the given, newly created `(customer_id, coupon_id)` links to the eligible coupon view.
+        """
+        if (view := self._eligible_coupon_view) is None or len(links) == 0:
+            return
+
+        coupon_ids = {coupon_id for _, coupon_id in links}
+        coupons = {
+            c.id: Coupon.from_orm(c)
+            for c in self._session.exec(select(CouponTable).where(col(CouponTable.id).in_(coupon_ids)))
+        }
+        for customer_id, coupon_id in links:
+            if (coupon := coupons.get(coupon_id)) is not None:
+                view.add_link(customer_id, coupon)
+
+    def _on_changed(self, pk: CustomerCouponPK) -> None:
+        if (view := self._eligible_coupon_view) is None:
+            return
+
+        customer_id, coupon_id = self._make_pk_tuple(pk)
+        public_coupon = None
+        if not self._session.execute(sa_select(exists().where(CustomerCouponTable.coupon_id == coupon_id))).scalar():
+            # The deleted link was the last one, the coupon is public now.
+            coupon = self._session.get(CouponTable, coupon_id)
+            public_coupon = None if coupon is None else Coupon.from_orm(coupon)
+
+        view.remove_link(int(customer_id), int(coupon_id), public_coupon=public_coupon)
+
+
+class AsyncCustomerCouponService(
+    AsyncService[CustomerCouponTable, CustomerCouponCreate, CustomerCouponUpdate, CustomerCouponPK]
+):
+    """
+    Asynchronous customer coupon service.
+    """
+
+    __slots__ = ("_eligible_coupon_view",)
+
+    def __init__(self, session: AsyncSession, *, eligible_coupon_view: EligibleCouponView | None = None) -> None:
+        """
+        Initialization.
 
-    def __init__(self, session: Session) -> None:
+        Arguments:
+            session: The session instance the service will use.
+            eligible_coupon_view: Optional, application-wide view of the coupons customers are eligible for.
+        """
         super().__init__(session, model=CustomerCouponTable)
+        self._eligible_coupon_view = eligible_coupon_view
+
+    async def create(self, data: CustomerCouponCreate) -> CustomerCouponTable:
+        item = await super().create(data)
+        if self._eligible_coupon_view is not None:
+            coupon = await self._session.get(CouponTable, item.coupon_id)
+            if coupon is not None:
+                self._eligible_coupon_view.add_link(item.customer_id, Coupon.from_orm(coupon))
+
+        return item
+
+    def _on_changed(self, pk: CustomerCouponPK) -> None:
+        if self._eligible_coupon_view is not None:
+            # The hook can't find out whether the coupon became public, drop the entries that may contain it.
+            customer_id, coupon_id = self._make_pk_tuple(pk)
+            self._eligible_coupon_view.invalidate_customer(int(customer_id))
+            self._eligible_coupon_view.invalidate_coupon(int(coupon_id))
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+from app_utils.idempotency import MAX_KEY_LENGTH, MAX_PATH_LENGTH
+
+
+class IdempotencyKeyTable(SQLModel, table=True):
+    """
+    Idempotency keys of requests and their responses, see `app_utils.idempotency.IdempotencyMiddleware`.
+
+    Rows without a status code are the reservations of requests that are being processed.
+    """
+
+    __tablename__ = "idempotency_key"
+
+    method: str = Field(primary_key=True, max_length=16)
+    path: str = Field(primary_key=True, max_length=MAX_PATH_LENGTH)
+    key: str = Field(primary_key=True, max_length=MAX_KEY_LENGTH)
+    fingerprint: str = Field(max_length=64)  # SHA-256 of the query string and body of the request.
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    status_code: int | None = None
+    headers: str | None = None  # JSON list of the response headers.
+    body: bytes | None = None
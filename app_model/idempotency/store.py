@@ -0,0 +1,178 @@
+from typing import TYPE_CHECKING, Any, cast
+
+from datetime import datetime, timedelta
+import json
+
+from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import col
+
+from app_utils.cache import TTLCache
+from app_utils.idempotency import IdempotencyKey, IdempotencyRecord, StoredResponse
+
+from .model import IdempotencyKeyTable
+
+if TYPE_CHECKING:
+    from sqlalchemy.future import Engine
+
+
+class DatabaseIdempotencyStore:
+    """
+    Idempotency store that keeps the keys in the `idempotency_key` table, so they are shared by all
+    workers, and caches the saved responses in a local LRU cache, so replays don't query the database.
+
+    Keys expire after `ttl` seconds. Reservations that are older than `lock_timeout` seconds belong to
+    requests whose worker failed before saving the response, they can be taken over by retries.
+    """
+
+    __slots__ = ("_cache", "_engine", "_lock_timeout", "_ttl")
+
+    def __init__(self, engine: "Engine", *, ttl: float, lock_timeout: float, cache_size: int) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            engine: The database engine.
+            ttl: The number of seconds after which keys expire.
+            lock_timeout: The number of seconds after which reservations expire.
+            cache_size: The maximum number of responses in the local cache, 0 disables the cache.
+        """
+        self._cache: TTLCache[IdempotencyKey, IdempotencyRecord] | None = (
+            TTLCache(max_size=cache_size, ttl=ttl) if cache_size > 0 else None
+        )
+        self._engine = engine
+        self._lock_timeout = lock_timeout
+        self._ttl = ttl
+
+    def get_cached(self, key: IdempotencyKey) -> IdempotencyRecord | None:
+        """
+        Returns the record of the given key if its response is in the local cache.
+
+        Arguments:
+            key: The idempotency key.
+        """
+        return None if self._cache is None else self._cache.get(key)
+
+    def reserve(self, key: IdempotencyKey, fingerprint: str) -> IdempotencyRecord | None:
+        """
+        Reserves the given key for a new request. Expired keys and reservations are replaced.
+
+        Arguments:
+            key: The idempotency key.
+            fingerprint: The fingerprint of the request.
+
+        Returns:
+            `None` if the key was reserved, the existing record of the key otherwise.
+        """
+        method, path, value = key
+        for _ in range(2):
+            now = datetime.utcnow()
+            try:
+                # The common case of a new key costs a single statement.
+                with self._engine.begin() as connection:
+                    connection.execute(
+                        insert(IdempotencyKeyTable).values(
+                            method=method, path=path, key=value, fingerprint=fingerprint, created_at=now
+                        )
+                    )
+                return None
+            except IntegrityError:
+                pass
+
+            with self._engine.begin() as connection:
+                row = connection.execute(select(IdempotencyKeyTable).where(self._make_key_clause(key))).one_or_none()
+                if row is None:
+                    # The expired key was deleted by a concurrent request.
+                    continue
+
+                if not self._is_expired(row, now):
+                    record = self._make_record(row)
+                    if self._cache is not None and record.response is not None:
+                        self._cache.set(key, record)
+                    return record
+
+                connection.execute(
+                    delete(IdempotencyKeyTable).where(
+                        self._make_key_clause(key), col(IdempotencyKeyTable.created_at) == row.created_at
+                    )
+                )
+
+        # Concurrent requests keep replacing the expired key, report it as being processed.
+        return IdempotencyRecord(fingerprint, None)
+
+    def save(self, key: IdempotencyKey, record: IdempotencyRecord) -> None:
+        """
+        Stores the response of the request that reserved the given key.
+
+        Arguments:
+            key: The idempotency key.
+            record: The record with the response to store.
+        """
+        response = record.response
+        if response is None:
+            raise ValueError("The record has no response.")
+
+        with self._engine.begin() as connection:
+            connection.execute(
+                update(IdempotencyKeyTable)
+                .where(self._make_key_clause(key))
+                .values(status_code=response.status_code, headers=json.dumps(response.headers), body=response.body)
+            )
+
+        if self._cache is not None:
+            self._cache.set(key, record)
+
+    def release(self, key: IdempotencyKey) -> None:
+        """
+        Removes the reservation of the given key. Saved responses are not removed.
+
+        Arguments:
+            key: The idempotency key.
+        """
+        with self._engine.begin() as connection:
+            connection.execute(
+                delete(IdempotencyKeyTable).where(
+                    self._make_key_clause(key), col(IdempotencyKeyTable.status_code).is_(None)
+                )
+            )
+
+    def delete_expired(self) -> int:
+        """
+        Deletes the expired keys from the database and returns their number.
+        """
+        with self._engine.begin() as connection:
+            result = connection.execute(
+                delete(IdempotencyKeyTable).where(
+                    col(IdempotencyKeyTable.created_at) < datetime.utcnow() - timedelta(seconds=self._ttl)
+                )
+            )
+            return cast(CursorResult, result).rowcount
+
+    def _is_expired(self, row: Any, now: datetime) -> bool:
+        """
+        Returns whether the given key or reservation row has expired.
+        """
+        timeout = self._lock_timeout if row.status_code is None else self._ttl
+        return row.created_at < now - timedelta(seconds=timeout)
+
+    def _make_key_clause(self, key: IdempotencyKey) -> Any:
+        """
+        Returns the where clause that selects the row of the given key.
+        """
+        method, path, value = key
+        return and_(
+            col(IdempotencyKeyTable.method) == method,
+            col(IdempotencyKeyTable.path) == path,
+            col(IdempotencyKeyTable.key) == value,
+        )
+
+    def _make_record(self, row: Any) -> IdempotencyRecord:
+        """
+        Creates the record of the given row.
+        """
+        if row.status_code is None:
+            return IdempotencyRecord(row.fingerprint, None)
+
+        headers = [(name, value) for name, value in json.loads(row.headers)]
+        return IdempotencyRecord(row.fingerprint, StoredResponse(row.status_code, headers, row.body))
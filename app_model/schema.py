@@ -0,0 +1,122 @@
+from typing import TYPE_CHECKING
+
+from datetime import datetime
+import hashlib
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, insert, inspect, select
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Dialect
+    from sqlalchemy.future import Engine
+
+schema_version_table = Table(
+    "schema_version",
+    # The table has its own metadata, so it is not part of the fingerprint of the application's schema.
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+"""
+Single-row table that stores the fingerprint of the schema the database was last initialized with.
+"""
+
+
+class SchemaMismatch(Exception):
+    """Raised if existing tables of the database don't have every column of their models."""
+
+
+def get_schema_fingerprint(metadata: MetaData, dialect: "Dialect") -> str:
+    """
+    Returns the SHA-256 hash of the DDL of the tables and indexes of the given metadata.
+
+    Arguments:
+        metadata: The metadata of the schema.
+        dialect: The dialect to compile the DDL with.
+    """
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: str(i.name)):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+
+    return digest.hexdigest()
+
+
+def get_missing_columns(engine: "Engine", metadata: MetaData) -> list[str]:
+    """
+    Returns the `table.column` names of the columns of the given metadata that are missing from the
+    existing tables of the database. Missing tables are ignored.
+
+    Arguments:
+        engine: The database engine.
+        metadata: The metadata of the schema.
+    """
+    inspector = inspect(engine)
+    table_names = set(inspector.get_table_names())
+    missing: list[str] = []
+    for table in metadata.sorted_tables:
+        if table.name in table_names:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in existing)
+
+    return missing
+
+
+def create_missing_indexes(engine: "Engine", metadata: MetaData) -> None:
+    """
+    Creates the named indexes of the given metadata that are missing from the existing tables of the database.
+
+    `MetaData.create_all()` only creates the indexes of the tables it creates.
+
+    Arguments:
+        engine: The database engine.
+        metadata: The metadata of the schema.
+    """
+    inspector = inspect(engine)
+    table_names = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name in table_names:
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name is not None and index.name not in existing:
+                    index.create(engine)
+
+
+def read_schema_fingerprint(engine: "Engine") -> str | None:
+    """
+    Returns the stored schema fingerprint of the database, `None` if the database has no fingerprint.
+
+    Arguments:
+        engine: The database engine.
+    """
+    with engine.connect() as connection:
+        try:
+            return connection.execute(
+                select(schema_version_table.c.fingerprint).where(schema_version_table.c.id == 1)
+            ).scalar_one_or_none()
+        except DBAPIError:
+            # The table doesn't exist yet. The connection is closed, so the failed transaction is rolled back.
+            return None
+
+
+def write_schema_fingerprint(engine: "Engine", fingerprint: str) -> None:
+    """
+    Stores the given schema fingerprint in the database, creating the schema version table if needed.
+
+    Arguments:
+        engine: The database engine.
+        fingerprint: The fingerprint to store.
+    """
+    schema_version_table.create(engine, checkfirst=True)
+    try:
+        with engine.begin() as connection:
+            connection.execute(delete(schema_version_table))
+            connection.execute(
+                insert(schema_version_table).values(id=1, fingerprint=fingerprint, updated_at=datetime.utcnow())
+            )
+    except IntegrityError:
+        # Another worker that initialized the database at the same time stored its fingerprint first.
+        pass
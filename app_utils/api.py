@@ -0,0 +1,179 @@
+from typing import Any, Callable, Type
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlmodel import SQLModel
+
+from .etag import get_expected_version, is_not_modified, make_etag, make_version_conflict_error
+from .pagination import set_next_page_link
+from .serialization import ORJSONBytesResponse, get_response_columns, serialize_rows
+from .service import CommitFailed, InvalidCursor, NotFound, VersionConflict
+
+AsyncServiceDependency = Callable[..., Any]
+"""
+FastAPI dependency that creates an `AsyncService` instance.
+"""
+
+
+def add_async_get_all_route(
+    api: APIRouter,
+    *,
+    get_service: AsyncServiceDependency,
+    model: Type[SQLModel],
+    page_size: int,
+    max_page_size: int,
+    fast_serialization: bool,
+) -> None:
+    """
+    Adds the `async` get all route (`/` GET) to the given `APIRouter`.
+
+    Arguments:
+        api: The `APIRouter` to add the route to.
+        get_service: The dependency that creates the async service of the route.
+        model: The response model of the items.
+        page_size: The default number of items per page.
+        max_page_size: The maximum number of items per page clients can request.
+        fast_serialization: Whether to serialize database rows directly to JSON, skipping the creation
+            and validation of model instances. The output is the same.
+    """
+
+    @api.get("/", response_model=list[model])  # type: ignore[valid-type]
+    async def get_all(
+        request: Request,
+        response: Response,
+        limit: int = Query(page_size, ge=1, le=max_page_size),
+        cursor: str | None = None,
+        service=Depends(get_service),
+    ):
+        try:
+            if fast_serialization:
+                # Serialize the rows directly, the returned response skips response model validation.
+                columns = get_response_columns(model)
+                rows, next_cursor = await service.get_row_page(columns, limit=limit, cursor=cursor)
+                fast_response = ORJSONBytesResponse(serialize_rows(columns, rows))
+                set_next_page_link(request, fast_response, next_cursor)
+                return fast_response
+
+            items, next_cursor = await service.get_page(limit=limit, cursor=cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor.")
+
+        set_next_page_link(request, response, next_cursor)
+        return items
+
+
+def add_async_create_route(
+    api: APIRouter,
+    *,
+    get_service: AsyncServiceDependency,
+    model: Type[SQLModel],
+    create_model: Type[SQLModel],
+    error_detail: str,
+) -> None:
+    """
+    Adds the `async` create route (`/` POST) to the given `APIRouter`.
+
+    Arguments:
+        api: The `APIRouter` to add the route to.
+        get_service: The dependency that creates the async service of the route.
+        model: The response model.
+        create_model: The request body model.
+        error_detail: The detail of the error response if the item can not be created.
+    """
+
+    @api.post("/", response_model=model)
+    async def create(data: create_model, service=Depends(get_service)):  # type: ignore[valid-type]
+        try:
+            return await service.create(data)
+        except CommitFailed:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_detail)
+
+
+def add_async_versioned_item_routes(
+    api: APIRouter,
+    *,
+    get_service: AsyncServiceDependency,
+    model: Type[SQLModel],
+    update_model: Type[SQLModel],
+    name: str,
+    add_delete: bool,
+    add_get_by_id: bool,
+    add_update: bool,
+) -> None:
+    """
+    Adds the `async` get by ID, update and delete routes (`/{id}` GET, PUT and DELETE) of a model with
+    an integer `id` primary key and a `version` column to the given `APIRouter`.
+
+    The routes support conditional requests with the `ETag`, `If-None-Match` and `If-Match` headers.
+
+    Arguments:
+        api: The `APIRouter` to add the routes to.
+        get_service: The dependency that creates the async service of the routes.
+        model: The response model.
+        update_model: The request body model of the update route.
+        name: The name of the model in error messages, for example `"Coupon"`.
+        add_delete: Whether to add the delete route.
+        add_get_by_id: Whether to add the get by ID route.
+        add_update: Whether to add the update route.
+    """
+    not_found = f"{name} not found."
+
+    if add_get_by_id:
+
+        @api.get("/{id}", response_model=model)
+        async def get_by_id(
+            id: int,
+            response: Response,
+            if_none_match: str | None = Header(None),
+            service=Depends(get_service),
+        ):
+            item = await service.get_by_pk(id)
+            if item is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
+
+            etag = make_etag(item.version)
+            if is_not_modified(if_none_match, etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+            response.headers["ETag"] = etag
+            return item
+
+    if add_update:
+
+        @api.put("/{id}", response_model=model)
+        async def update_by_id(
+            id: int,
+            data: update_model,  # type: ignore[valid-type]
+            response: Response,
+            if_match: str | None = Header(None),
+            service=Depends(get_service),
+        ):
+            expected_version = get_expected_version(if_match)
+            try:
+                item = await service.update(id, data, expected_version=expected_version)
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
+            except VersionConflict:
+                raise make_version_conflict_error(if_match)
+            except CommitFailed:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{name} update failed.")
+
+            response.headers["ETag"] = make_etag(item.version)
+            return item
+
+    if add_delete:
+
+        @api.delete("/{id}")
+        async def delete_by_id(id: int, if_match: str | None = Header(None), service=Depends(get_service)):
+            expected_version = get_expected_version(if_match)
+            try:
+                await service.delete_by_pk(id, expected_version=expected_version)
+            except NotFound:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found)
+            except VersionConflict:
+                raise make_version_conflict_error(if_match)
+            except CommitFailed:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail=f"Failed to delete {name.lower()}."
+                )
+
+            return Response(status_code=status.HTTP_200_OK)
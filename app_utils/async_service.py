@@ -0,0 +1,252 @@
+from typing import NoReturn, Sequence, Type, cast
+
+from sqlalchemy.engine import CursorResult, Row
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .service import (
+    CommitFailed,
+    NotFound,
+    PrimaryKey,
+    ServiceBase,
+    TCreate,
+    TModel,
+    TPK,
+    TUpdate,
+    VersionConflict,
+)
+
+
+class AsyncService(ServiceBase[TModel, TCreate, TUpdate, TPK]):
+    """
+    Asynchronous base service implementation.
+
+    It mirrors the CRUD and pagination methods of `Service`, but wraps an `AsyncSession`,
+    so it can be used in `async` route handlers without blocking the event loop or
+    occupying FastAPI's threadpool. Just like `Service`, don't reuse the same service
+    instance across multiple requests.
+    """
+
+    __slots__ = ("_session",)
+
+    def __init__(self, session: AsyncSession, *, model: Type[TModel]) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            session: The session instance the service will use.
+            model: The database *table* model.
+        """
+        super().__init__(model=model)
+        self._session = session
+
+    async def create(self, data: TCreate) -> TModel:
+        """
+        Creates a new database entry from the given data.
+
+        Arguments:
+            data: Creation data.
+
+        Raises:
+            CommitFailed: If the service fails to commit the operation.
+        """
+        session = self._session
+        db_item = self._model.from_orm(data)
+        session.add(db_item)
+        try:
+            await session.commit()
+        except Exception:
+            raise CommitFailed("Commit failed.")
+        await session.refresh(db_item)
+        return db_item
+
+    async def delete_by_pk(self, pk: TPK, *, expected_version: int | None = None) -> None:
+        """
+        Deletes the item with the given primary key from the database.
+
+        Arguments:
+            pk: The primary key.
+            expected_version: If set, the item is only deleted if its version matches it.
+                Requires a version column.
+
+        Raises:
+            CommitFailed: If the service fails to commit the operation.
+            NotFound: If the document with the given primary key does not exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
+        """
+        session = self._session
+
+        if self.single_statement_writes:
+            *link_statements, statement = self._make_delete_statements(pk, expected_version=expected_version)
+            try:
+                for link_statement in link_statements:
+                    await session.execute(link_statement)
+
+                deleted = cast(CursorResult, await session.execute(statement)).rowcount > 0
+                if deleted:
+                    await session.commit()
+            except Exception:
+                await session.rollback()
+                raise CommitFailed("Failed to delete item.")
+
+            if not deleted:
+                await session.rollback()
+                await self._raise_write_failed(pk, expected_version)
+
+            self._on_changed(pk)
+            return
+
+        item = await self.get_by_pk(pk)
+        if item is None:
+            raise NotFound(self._format_primary_key(pk))
+
+        self._check_version(pk, self._get_version(item, expected_version), expected_version)
+
+        await session.delete(item)
+        try:
+            await session.commit()
+        except Exception:
+            raise CommitFailed("Failed to delete item.")
+
+        self._on_changed(pk)
+
+    async def get_all(self) -> list[TModel]:
+        """
+        Returns all items from the database.
+        """
+        return (await self._session.exec(select(self._model))).all()  # type: ignore[arg-type]
+
+    async def get_page(self, *, limit: int, cursor: str | None = None) -> tuple[list[TModel], str | None]:
+        """
+        Returns a page of items ordered by primary key and the cursor of the next page.
+
+        See `Service.get_page()` for details.
+
+        Arguments:
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        items = (await self._session.exec(self._make_page_query(limit=limit, cursor=cursor))).all()
+        return self._make_page(items, limit=limit)
+
+    async def get_row_page(
+        self, columns: Sequence[str], *, limit: int, cursor: str | None = None
+    ) -> tuple[list[Row], str | None]:
+        """
+        Returns a page of rows with the given columns ordered by primary key and the cursor of the next page.
+
+        See `Service.get_row_page()` for details.
+
+        Arguments:
+            columns: The names of the columns to select, the primary key columns must be included.
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        query = self._make_page_query(limit=limit, cursor=cursor, columns=columns)
+        rows = (await self._session.execute(query)).all()
+        return self._make_page(list(rows), limit=limit)
+
+    async def get_by_pk(self, pk: PrimaryKey) -> TModel | None:
+        """
+        Returns the item with the given primary key if it exists.
+
+        Arguments:
+            pk: The primary key.
+        """
+        return await self._session.get(self._model, pk)
+
+    async def update(self, pk: TPK, data: TUpdate, *, expected_version: int | None = None) -> TModel:
+        """
+        Updates the item with the given primary key.
+
+        Single-statement updates and versioning work like in `Service.update()`.
+
+        Arguments:
+            pk: The primary key.
+            data: Update data.
+            expected_version: If set, the item is only updated if its version matches it.
+                Requires a version column.
+
+        Raises:
+            CommitFailed: If the service fails to commit the operation.
+            NotFound: If the document with the given primary key does not exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
+        """
+        session = self._session
+
+        changes = self._prepare_for_update(data)
+        if self._is_single_statement_update(changes):
+            returning = self._supports_returning(session.sync_session.get_bind().dialect)
+            statement = self._make_update_statement(
+                pk, changes, returning=returning, expected_version=expected_version
+            )
+            try:
+                result = cast(CursorResult, await session.execute(statement))
+                row = result.one_or_none() if returning else None
+                updated = row is not None if returning else result.rowcount > 0
+                if updated:
+                    await session.commit()
+            except Exception:
+                await session.rollback()
+                raise CommitFailed(f"Failed to update {self._format_primary_key(pk)}.")
+
+            if not updated:
+                await session.rollback()
+                await self._raise_write_failed(pk, expected_version)
+
+            self._on_changed(pk)
+            if row is not None:
+                return self._model(**row._mapping)
+
+            updated_item = await self.get_by_pk(pk)
+            if updated_item is None:
+                raise NotFound(self._format_primary_key(pk))
+
+            return updated_item
+
+        item = await self.get_by_pk(pk)
+        if item is None:
+            raise NotFound(self._format_primary_key(pk))
+
+        self._check_version(pk, self._get_version(item, expected_version), expected_version)
+        for key, value in changes.items():
+            setattr(item, key, value)
+
+        if len(changes) > 0 and (version_column := self._version_column()) is not None:
+            setattr(item, version_column.name, getattr(item, version_column.name) + 1)
+
+        session.add(item)
+        try:
+            await session.commit()
+        except Exception:
+            raise CommitFailed(f"Failed to update {self._format_primary_key(pk)}.")
+
+        self._on_changed(pk)
+
+        await session.refresh(item)
+        return item
+
+    async def _raise_write_failed(self, pk: TPK, expected_version: int | None) -> NoReturn:
+        """
+        Raises the exception of a conditional update or delete that didn't affect any rows.
+
+        Arguments:
+            pk: The primary key of the item.
+            expected_version: The expected version of the write.
+
+        Raises:
+            NotFound: If the item doesn't exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
+        """
+        if expected_version is None:
+            raise NotFound(self._format_primary_key(pk))
+
+        version = (await self._session.execute(self._make_version_query(pk))).scalar()
+        self._check_version(pk, version, expected_version)
+        raise VersionConflict(self._format_primary_key(pk))
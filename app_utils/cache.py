@@ -0,0 +1,113 @@
+from typing import Generic, Hashable, TypeVar
+
+from collections import OrderedDict
+from threading import Lock
+import time
+
+from pydantic import BaseModel
+
+TKey = TypeVar("TKey", bound=Hashable)
+TValue = TypeVar("TValue")
+
+
+class CacheStats(BaseModel):
+    """
+    Cache statistics model.
+    """
+
+    hits: int
+    misses: int
+    size: int
+    max_size: int
+
+
+class TTLCache(Generic[TKey, TValue]):
+    """
+    Thread-safe, bounded LRU cache whose entries expire after a fixed time.
+
+    The cache is meant to be shared by all requests of the application, so it is
+    safe to use from FastAPI's threadpool.
+    """
+
+    __slots__ = (
+        "_data",
+        "_lock",
+        "_max_size",
+        "_ttl",
+        "_hits",
+        "_misses",
+    )
+
+    def __init__(self, *, max_size: int, ttl: float) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            max_size: The maximum number of entries, the least recently used entry is evicted when it's exceeded.
+            ttl: The number of seconds after which an entry expires.
+        """
+        self._data: OrderedDict[TKey, tuple[float, TValue]] = OrderedDict()
+        self._lock = Lock()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: TKey) -> TValue | None:
+        """
+        Returns the cached value for the given key if it exists and hasn't expired.
+
+        Arguments:
+            key: The key to look up.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self._misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key: TKey, value: TValue) -> None:
+        """
+        Stores the given value in the cache.
+
+        Arguments:
+            key: The key of the value.
+            value: The value to store.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self._ttl, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: TKey) -> None:
+        """
+        Removes the entry with the given key from the cache if it exists.
+
+        Arguments:
+            key: The key to remove.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache and resets the statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> CacheStats:
+        """
+        Returns the statistics of the cache.
+        """
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses, size=len(self._data), max_size=self._max_size)
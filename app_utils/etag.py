@@ -0,0 +1,65 @@
+from fastapi import HTTPException, status
+
+
+def make_etag(version: int) -> str:
+    """
+    Returns the (strong) ETag of the given item version.
+
+    Arguments:
+        version: The version of the item.
+    """
+    return f'"{version}"'
+
+
+def get_expected_version(if_match: str | None) -> int | None:
+    """
+    Returns the item version that is required by the given `If-Match` header value, `None`
+    if the header is not set or accepts any version (`*`).
+
+    Only a single strong ETag (created by `make_etag()`) is supported.
+
+    Arguments:
+        if_match: The value of the `If-Match` header.
+
+    Raises:
+        HTTPException: 412 if the header is not a single strong ETag of this application, because it
+            can't match the current version of any item.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    value = if_match.strip()
+    if len(value) > 2 and value[0] == value[-1] == '"' and value[1:-1].isdigit():
+        return int(value[1:-1])
+
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Precondition failed.")
+
+
+def is_not_modified(if_none_match: str | None, etag: str) -> bool:
+    """
+    Returns whether the given `If-None-Match` header value matches the given ETag, using
+    weak comparison like the HTTP specification requires for conditional `GET` requests.
+
+    Arguments:
+        if_none_match: The value of the `If-None-Match` header.
+        etag: The current ETag of the item.
+    """
+    if if_none_match is None:
+        return False
+
+    values = [value.strip() for value in if_none_match.split(",")]
+    return "*" in values or etag.removeprefix("W/") in (value.removeprefix("W/") for value in values)
+
+
+def make_version_conflict_error(if_match: str | None) -> HTTPException:
+    """
+    Returns the HTTP error of a `VersionConflict`: 412 if the expected version was set by an
+    `If-Match` precondition, 409 otherwise.
+
+    Arguments:
+        if_match: The value of the `If-Match` header.
+    """
+    if if_match is not None:
+        return HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Precondition failed.")
+
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The item has been modified concurrently.")
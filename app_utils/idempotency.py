@@ -0,0 +1,281 @@
+from typing import NamedTuple, Protocol
+
+import hashlib
+import json
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+IdempotencyKey = tuple[str, str, str]
+"""
+The method, path and `Idempotency-Key` header value of a request.
+"""
+
+MAX_KEY_LENGTH = 255
+"""
+The maximum length of idempotency keys.
+"""
+
+MAX_PATH_LENGTH = 255
+"""
+The maximum length of the paths of requests with an idempotency key.
+"""
+
+NOT_REPLAYED_HEADERS = frozenset((b"server-timing",))
+"""
+Response headers (lowercase, like in ASGI messages) that describe the execution of the request, they are not stored.
+"""
+
+
+class StoredResponse(NamedTuple):
+    """
+    Response of a request with an idempotency key, replayed for the retries of the request.
+    """
+
+    status_code: int
+    headers: list[tuple[str, str]]
+    body: bytes
+
+
+class IdempotencyRecord(NamedTuple):
+    """
+    The state of an idempotency key.
+    """
+
+    fingerprint: str  # The fingerprint of the request that used the key first.
+    response: StoredResponse | None  # None while the first request is being processed.
+
+
+class IdempotencyStore(Protocol):
+    """
+    Storage of idempotency keys and the responses of their requests.
+
+    Only `get_cached()` is called from the event loop, the other methods are executed in the threadpool.
+    """
+
+    def get_cached(self, key: IdempotencyKey) -> IdempotencyRecord | None:
+        """
+        Returns the record of the given key if it's in the local cache, without blocking.
+        """
+        ...
+
+    def reserve(self, key: IdempotencyKey, fingerprint: str) -> IdempotencyRecord | None:
+        """
+        Reserves the given key for a new request with the given fingerprint. Returns `None` if the key
+        was reserved, the existing record of the key otherwise.
+        """
+        ...
+
+    def save(self, key: IdempotencyKey, record: IdempotencyRecord) -> None:
+        """
+        Stores the response of the request that reserved the given key.
+        """
+        ...
+
+    def release(self, key: IdempotencyKey) -> None:
+        """
+        Removes the reservation of the given key, so the request can be retried.
+        """
+        ...
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware that executes requests with an `Idempotency-Key` header at most once.
+
+    The first request with a key reserves it in the store and its response is saved before it's sent.
+    Retries of the request get the saved response with an `Idempotent-Replayed` header without executing
+    the request again. Requests that reuse a key with a different query or body are rejected (422), as
+    well as retries while the first request is being processed (409). Failed requests (5xx responses or
+    exceptions) release the key, so they can be retried.
+
+    Request and response bodies are buffered, so their size is limited: requests with a key and a larger
+    body than `max_body_size` are rejected (413), and responses larger than `max_response_size` are sent
+    without being saved (the key is released). Requests with a key and a path longer than `MAX_PATH_LENGTH`
+    are rejected (414), the path is part of the stored key. Requests without the header are not affected.
+    """
+
+    __slots__ = ("_app", "_header", "_max_body_size", "_max_response_size", "_methods", "_store")
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        store: IdempotencyStore,
+        header: str = "Idempotency-Key",
+        methods: tuple[str, ...] = ("POST",),
+        max_body_size: int = 1024 * 1024,
+        max_response_size: int = 1024 * 1024,
+    ) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            app: The wrapped ASGI application.
+            store: The store of the idempotency keys.
+            header: The name of the idempotency key header.
+            methods: The HTTP methods that support idempotency keys.
+            max_body_size: The maximum size of the body of requests with an idempotency key in bytes.
+            max_response_size: The maximum size of saved response bodies in bytes.
+        """
+        self._app = app
+        self._header = header
+        self._max_body_size = max_body_size
+        self._max_response_size = max_response_size
+        self._methods = frozenset(methods)
+        self._store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in self._methods:
+            await self._app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        value = headers.get(self._header)
+        if value is None:
+            await self._app(scope, receive, send)
+            return
+
+        if not (0 < len(value) <= MAX_KEY_LENGTH):
+            await _send_error(send, 400, "Invalid idempotency key.")
+            return
+
+        if len(scope["path"]) > MAX_PATH_LENGTH:
+            await _send_error(send, 414, "The request path is too long for an idempotency key.")
+            return
+
+        content_length = headers.get("content-length", "")
+        body = (
+            None
+            if content_length.isdigit() and int(content_length) > self._max_body_size
+            else await _read_body(receive, max_size=self._max_body_size)
+        )
+        if body is None:
+            await _send_error(send, 413, "The request body is too large for an idempotency key.")
+            return
+
+        fingerprint = hashlib.sha256(scope["query_string"] + b"?" + body).hexdigest()
+        key: IdempotencyKey = (scope["method"], scope["path"], value)
+
+        record = self._store.get_cached(key)
+        if record is None:
+            record = await run_in_threadpool(self._store.reserve, key, fingerprint)
+
+        if record is None:
+            await self._execute(scope, receive, send, key=key, body=body, fingerprint=fingerprint)
+        elif record.fingerprint != fingerprint:
+            await _send_error(send, 422, "The idempotency key was used with a different request.")
+        elif record.response is None:
+            await _send_error(send, 409, "A request with the same idempotency key is being processed.")
+        else:
+            response = record.response
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": [
+                        *((name.encode("latin-1"), value.encode("latin-1")) for name, value in response.headers),
+                        (b"idempotent-replayed", b"true"),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": response.body})
+
+    async def _execute(
+        self, scope: Scope, receive: Receive, send: Send, *, key: IdempotencyKey, body: bytes, fingerprint: str
+    ) -> None:
+        """
+        Executes the request that reserved the given key and saves its response before sending its end.
+        """
+        body_sent = False
+
+        async def receive_wrapper() -> Message:
+            # The body was consumed for the fingerprint, the application gets it in a single message.
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        saved = False
+        status = 500
+        headers: list[tuple[str, str]] = []
+        chunks: list[bytes] | None = []  # None if the response is too large to save.
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal chunks, saved, size, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers.extend(
+                    (name.decode("latin-1"), value.decode("latin-1"))
+                    for name, value in message.get("headers", ())
+                    if name.lower() not in NOT_REPLAYED_HEADERS
+                )
+            elif message["type"] == "http.response.body" and chunks is not None:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self._max_response_size:
+                    # Too large to save, the key is released after the response.
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+                    if not message.get("more_body", False) and status < 500:
+                        # Saved before the response ends, so retries after the response never see a reservation.
+                        record = IdempotencyRecord(fingerprint, StoredResponse(status, headers, b"".join(chunks)))
+                        try:
+                            await run_in_threadpool(self._store.save, key, record)
+                            saved = True
+                        except Exception:
+                            logger.exception("Failed to save the response of idempotency key %r.", key)
+
+            await send(message)
+
+        try:
+            await self._app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if not saved:
+                await run_in_threadpool(self._store.release, key)
+
+
+async def _read_body(receive: Receive, *, max_size: int) -> bytes | None:
+    """
+    Reads the whole body of the request, `None` if it's larger than `max_size` bytes.
+    """
+    chunks: list[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > max_size:
+            return None
+
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+
+    return b"".join(chunks)
+
+
+async def _send_error(send: Send, status: int, detail: str) -> None:
+    """
+    Sends an error response in the same format as FastAPI's `HTTPException` responses.
+    """
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,346 @@
+from typing import Any, Iterable, Iterator, Sequence
+
+from contextvars import ContextVar
+from threading import Lock
+import bisect
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+"""
+Content type of the Prometheus text exposition format, responses add the charset.
+"""
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""
+Default buckets of duration histograms, in seconds.
+"""
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+"""
+Default buckets of the SQL statement count histogram.
+"""
+
+
+class RequestStats:
+    """
+    Database statistics of a single request, collected by the listeners of `instrument_engine()`.
+    """
+
+    __slots__ = ("queries", "db_seconds", "pool_wait_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def get_request_stats() -> RequestStats | None:
+    """
+    Returns the statistics of the current request, `None` outside of requests.
+    """
+    return _request_stats.get()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Adds event listeners to the given engine that record the number and total duration of the
+    SQL statements, and the time spent waiting for pooled connections in the statistics of the
+    current request. Statements executed outside of requests are not recorded.
+
+    For async engines, instrument their `sync_engine`.
+
+    Arguments:
+        engine: The engine to instrument.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if _request_stats.get() is not None:
+            conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        stats = _request_stats.get()
+        starts = conn.info.get("metrics_query_start")
+        if stats is not None and starts:
+            stats.queries += 1
+            stats.db_seconds += time.perf_counter() - starts.pop()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context) -> None:
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    # The pool has no event before checkout, so the checkout method of the pool instance is wrapped.
+    # The engine looks up the method on every checkout. A new pool (for example after `dispose()`)
+    # is not instrumented.
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect() -> Any:
+        stats = _request_stats.get()
+        if stats is None:
+            return connect()
+
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            stats.pool_wait_seconds += time.perf_counter() - start
+
+    setattr(pool, "connect", timed_connect)
+
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    """
+    Formats the given labels in Prometheus text format.
+    """
+    items = (*labels, *extra)
+    if len(items) == 0:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """
+    Thread-safe Prometheus counter with labels.
+    """
+
+    __slots__ = ("_name", "_help", "_lock", "_values")
+
+    def __init__(self, name: str, help: str) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            name: The name of the metric.
+            help: The description of the metric.
+        """
+        self._name = name
+        self._help = help
+        self._lock = Lock()
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, value: float = 1) -> None:
+        """
+        Increments the counter of the given labels.
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> Iterator[str]:
+        """
+        Yields the lines of the metric in Prometheus text format.
+        """
+        yield f"# HELP {self._name} {self._help}"
+        yield f"# TYPE {self._name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+
+        for labels, value in values:
+            yield f"{self._name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus histogram with labels.
+    """
+
+    __slots__ = ("_name", "_help", "_buckets", "_lock", "_series")
+
+    def __init__(self, name: str, help: str, *, buckets: Sequence[float]) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            name: The name of the metric.
+            help: The description of the metric.
+            buckets: The upper bounds of the buckets in increasing order, `+Inf` is added automatically.
+        """
+        self._name = name
+        self._help = help
+        self._buckets = tuple(buckets)
+        self._lock = Lock()
+        # Labels -> (non-cumulative bucket counts including +Inf, sum of the observed values)
+        self._series: dict[Labels, tuple[list[int], list[float]]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        """
+        Records the given value.
+        """
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self._buckets) + 1), [0.0])
+
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> Iterator[str]:
+        """
+        Yields the lines of the metric in Prometheus text format.
+        """
+        yield f"# HELP {self._name} {self._help}"
+        yield f"# TYPE {self._name} histogram"
+        with self._lock:
+            series = sorted((labels, (list(counts), total[0])) for labels, (counts, total) in self._series.items())
+
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip((*self._buckets, float("inf")), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                yield f"{self._name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}"
+
+            yield f"{self._name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self._name}_count{_format_labels(labels)} {cumulative}"
+
+
+class RequestMetrics:
+    """
+    Per-route request metrics of the application.
+    """
+
+    __slots__ = ("requests", "duration", "db_queries", "db_duration", "pool_wait")
+
+    def __init__(self) -> None:
+        self.requests = Counter("http_requests_total", "Number of HTTP requests.")
+        self.duration = Histogram(
+            "http_request_duration_seconds", "HTTP request latency in seconds.", buckets=LATENCY_BUCKETS
+        )
+        self.db_queries = Histogram(
+            "http_request_db_queries", "Number of SQL statements per HTTP request.", buckets=QUERY_COUNT_BUCKETS
+        )
+        self.db_duration = Histogram(
+            "http_request_db_duration_seconds",
+            "Total SQL statement execution time per HTTP request in seconds.",
+            buckets=LATENCY_BUCKETS,
+        )
+        self.pool_wait = Histogram(
+            "http_request_pool_wait_seconds",
+            "Total database connection pool checkout time per HTTP request in seconds.",
+            buckets=LATENCY_BUCKETS,
+        )
+
+    def record(self, *, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        """
+        Records the metrics of a finished request.
+
+        Arguments:
+            method: The HTTP method of the request.
+            route: The path template of the matched route.
+            status: The status code of the response.
+            seconds: The duration of the request.
+            stats: The database statistics of the request.
+        """
+        labels = (("method", method), ("route", route))
+        self.requests.inc((*labels, ("status", str(status))))
+        self.duration.observe(labels, seconds)
+        self.db_queries.observe(labels, stats.queries)
+        self.db_duration.observe(labels, stats.db_seconds)
+        self.pool_wait.observe(labels, stats.pool_wait_seconds)
+
+    def render(self) -> str:
+        """
+        Returns all the metrics in Prometheus text format.
+        """
+        metrics: Iterable[Counter | Histogram] = (
+            self.requests,
+            self.duration,
+            self.db_queries,
+            self.db_duration,
+            self.pool_wait,
+        )
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the metrics of every HTTP request per route, and optionally
+    reports the database statistics of the request in a `Server-Timing` response header.
+
+    Database statistics are only collected from engines that were instrumented with `instrument_engine()`.
+    """
+
+    __slots__ = ("_app", "_metrics", "_server_timing")
+
+    def __init__(self, app: ASGIApp, *, metrics: RequestMetrics, server_timing: bool = True) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            app: The wrapped ASGI application.
+            metrics: The metrics to record the requests in.
+            server_timing: Whether to add a `Server-Timing` header to responses.
+        """
+        self._app = app
+        self._metrics = metrics
+        self._server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self._server_timing:
+                    # Streamed responses may execute statements after the headers are sent.
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", _format_server_timing(stats, time.perf_counter() - start))
+
+            await send(message)
+
+        try:
+            await self._app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            # The router stores the matched route in the scope. Unmatched paths share a single label to
+            # keep the number of series bounded.
+            route = scope.get("route")
+            self._metrics.record(
+                method=scope["method"],
+                route=getattr(route, "path", "<unmatched>"),
+                status=status,
+                seconds=time.perf_counter() - start,
+                stats=stats,
+            )
+
+
+def _format_server_timing(stats: RequestStats, seconds: float) -> str:
+    """
+    Returns the `Server-Timing` header value of the given request statistics.
+    """
+    return (
+        f'db;dur={stats.db_seconds * 1000:.3f};desc="{stats.queries} queries", '
+        f"pool;dur={stats.pool_wait_seconds * 1000:.3f}, "
+        f"app;dur={seconds * 1000:.3f}"
+    )
@@ -0,0 +1,83 @@
+from typing import Any, Sequence
+
+from datetime import datetime
+import base64
+import json
+
+from fastapi import Request, Response
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encodes the given key values into an opaque, URL-safe cursor.
+
+    Arguments:
+        values: The key values of the last item of a page.
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(values), separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str, *, size: int, types: Sequence[type | None] | None = None) -> list[Any]:
+    """
+    Decodes the given cursor into key values.
+
+    Arguments:
+        cursor: The cursor to decode.
+        size: The expected number of key values.
+        types: If set, the expected Python type of every key value, `None` for values of any type.
+            Values are checked against (or converted to) their type, `null` and JSON arrays and
+            objects are rejected. Datetimes are decoded from ISO format.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Malformed cursor.")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Malformed cursor.")
+
+    if types is not None:
+        values = [_check_cursor_value(value, expected) for value, expected in zip(values, types)]
+
+    return values
+
+
+def _check_cursor_value(value: Any, expected: type | None) -> Any:
+    """
+    Returns the given decoded cursor value as the given type.
+
+    Raises:
+        ValueError: If the value doesn't match the type.
+    """
+    if value is None or isinstance(value, (dict, list)):
+        raise ValueError("Malformed cursor.")
+
+    if expected is None:
+        return value
+    if expected is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if expected is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+        raise ValueError("Malformed cursor.")
+
+    return value
+
+
+def set_next_page_link(request: Request, response: Response, cursor: str | None) -> None:
+    """
+    Adds a `Link` header with `rel="next"` to the response if there is a next page.
+
+    Arguments:
+        request: The current request.
+        response: The response to set the header on.
+        cursor: The cursor of the next page, `None` if there is no next page.
+    """
+    if cursor is None:
+        return
+
+    url = request.url.include_query_params(cursor=cursor)
+    response.headers["Link"] = f'<{url}>; rel="next"'
@@ -0,0 +1,328 @@
+from typing import Any, Callable, Iterable
+
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from threading import local
+from uuid import uuid4
+import asyncio
+import cProfile
+import hmac
+import pstats
+import random
+import re
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .service import ServiceBase
+
+
+class ProfileInfo(BaseModel):
+    """
+    Tags of a stored request profile.
+    """
+
+    method: str
+    route: str
+    status: int
+    seconds: float
+    services: list[str]  # The service methods the endpoint called, named after the class that defines them.
+
+
+class _ProfileRequest:
+    """
+    Profiler of a request that was selected for profiling.
+    """
+
+    __slots__ = ("profile",)
+
+    def __init__(self) -> None:
+        self.profile: cProfile.Profile | None = None
+
+
+_profile_request: ContextVar[_ProfileRequest | None] = ContextVar("profile_request", default=None)
+
+# Only one profiler can be active in a thread.
+_thread_state = local()
+
+
+def instrument_routes(routes: Iterable[BaseRoute]) -> None:
+    """
+    Wraps the endpoints of the given routes, so they are profiled in requests that were selected
+    by `ProfilingMiddleware`.
+
+    Synchronous endpoints are profiled in the worker thread that executes them. The profile of
+    asynchronous endpoints may include other tasks that run while the endpoint is suspended.
+
+    Call it after all routes are registered, routes are not wrapped otherwise and have no overhead.
+
+    Arguments:
+        routes: The routes to instrument, for example `app.routes`.
+    """
+    for route in routes:
+        # The request handler of the route looks up the endpoint on the dependant in every request.
+        if isinstance(route, APIRoute) and route.dependant.call is not None:
+            route.dependant.call = _make_profiled_call(route.dependant.call)
+
+
+def _make_profiled_call(call: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Returns a wrapper of the given endpoint that profiles it if the current request was selected.
+    """
+    if asyncio.iscoroutinefunction(call):
+
+        @wraps(call)
+        async def profiled_async_call(**values: Any) -> Any:
+            profile = _start_profile()
+            if profile is None:
+                return await call(**values)
+
+            try:
+                return await call(**values)
+            finally:
+                _stop_profile(profile)
+
+        return profiled_async_call
+
+    @wraps(call)
+    def profiled_call(**values: Any) -> Any:
+        profile = _start_profile()
+        if profile is None:
+            return call(**values)
+
+        try:
+            return call(**values)
+        finally:
+            _stop_profile(profile)
+
+    return profiled_call
+
+
+def _start_profile() -> cProfile.Profile | None:
+    """
+    Starts and returns the profiler of the current request in the current thread if the request
+    was selected for profiling and no other profiler is active in the thread.
+    """
+    request = _profile_request.get()
+    if request is None or request.profile is not None or getattr(_thread_state, "active", False):
+        return None
+
+    _thread_state.active = True
+    request.profile = cProfile.Profile()
+    request.profile.enable()
+    return request.profile
+
+
+def _stop_profile(profile: cProfile.Profile) -> None:
+    profile.disable()
+    _thread_state.active = False
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that selects requests for profiling and writes the profiles of the endpoints
+    that were instrumented with `instrument_routes()` to a directory.
+
+    Requests are selected if their profiling header has the configured secret value, or randomly
+    with the given sample rate. No more profiles are written once the directory has `max_profiles`
+    profiles, remove the old ones to continue profiling. The profiles in the directory are counted
+    every `recount_interval` seconds, profiling resumes after the next count.
+    """
+
+    __slots__ = (
+        "_app",
+        "_directory",
+        "_full",
+        "_header",
+        "_max_profiles",
+        "_profiles",
+        "_recount_at",
+        "_recount_interval",
+        "_sample_rate",
+        "_secret",
+    )
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        directory: Path,
+        header: str | None = "x-profile",
+        secret: str | None = None,
+        sample_rate: float = 0,
+        max_profiles: int = 1000,
+        recount_interval: float = 10,
+    ) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            app: The wrapped ASGI application.
+            directory: The directory to write the profiles to, it is created if it doesn't exist.
+            header: The name of the header that selects a request for profiling, `None` to disable it.
+            secret: The value the profiling header must have, requests are not selected by the header
+                if it's not set.
+            sample_rate: The fraction of requests to profile, between 0 and 1.
+            max_profiles: The maximum number of profiles in the directory.
+            recount_interval: The number of seconds after which the profiles in the directory are counted again.
+        """
+        self._app = app
+        self._directory = directory
+        self._full = False
+        self._header = None if header is None or secret is None else header.lower().encode("latin-1")
+        self._max_profiles = max_profiles
+        self._profiles = 0
+        self._recount_at = 0.0
+        self._recount_interval = recount_interval
+        self._sample_rate = sample_rate
+        self._secret = b"" if secret is None else secret.encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._is_selected(scope):
+            await self._app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request = _ProfileRequest()
+        token = _profile_request.set(request)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+        try:
+            await self._app(scope, receive, send_wrapper)
+        finally:
+            _profile_request.reset(token)
+            if request.profile is not None:
+                route = scope.get("route")
+                await run_in_threadpool(
+                    self._write_profile,
+                    request.profile,
+                    method=scope["method"],
+                    route=getattr(route, "path", "<unmatched>"),
+                    status=status,
+                    seconds=time.perf_counter() - start,
+                )
+
+    def _is_selected(self, scope: Scope) -> bool:
+        if self._full and time.monotonic() < self._recount_at:
+            return False
+
+        if self._header is not None and any(
+            name == self._header and hmac.compare_digest(value, self._secret) for name, value in scope["headers"]
+        ):
+            return True
+
+        return self._sample_rate > 0 and random.random() < self._sample_rate
+
+    def _write_profile(self, profile: cProfile.Profile, **tags: Any) -> None:
+        """
+        Writes the given profile with `write_profile()` unless the directory is full.
+
+        The profiles are counted on disk every `recount_interval` seconds, so the limit also applies
+        (approximately) if multiple workers share the directory, and removed profiles free up room.
+        """
+        now = time.monotonic()
+        if now >= self._recount_at:
+            self._profiles = sum(1 for _ in self._directory.glob("*.prof")) if self._directory.is_dir() else 0
+            self._recount_at = now + self._recount_interval
+
+        self._full = self._profiles >= self._max_profiles
+        if self._full:
+            return
+
+        write_profile(self._directory, profile, **tags)
+        self._profiles += 1
+
+
+def write_profile(
+    directory: Path, profile: cProfile.Profile, *, method: str, route: str, status: int, seconds: float
+) -> Path:
+    """
+    Writes the given profile and its tags (a JSON file with the same name) to the given directory.
+
+    Arguments:
+        directory: The directory to write the profile to, it is created if it doesn't exist.
+        profile: The profile to write.
+        method: The HTTP method of the request.
+        route: The path template of the route.
+        status: The status code of the response.
+        seconds: The duration of the request.
+
+    Returns:
+        The path of the written profile.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    path = directory / f"{int(time.time() * 1000)}-{method}-{slug}-{uuid4().hex[:8]}.prof"
+
+    stats = pstats.Stats(profile)
+    info = ProfileInfo(method=method, route=route, status=status, seconds=seconds, services=find_service_calls(stats))
+
+    stats.dump_stats(path)
+    path.with_suffix(".json").write_text(info.json())
+    return path
+
+
+def find_service_calls(stats: pstats.Stats) -> list[str]:
+    """
+    Returns the name of the service methods in the given profile that were called by code outside of services.
+
+    Arguments:
+        stats: The profile statistics.
+    """
+    methods = _get_service_methods()
+    entries = getattr(stats, "stats")  # Function key -> (cc, nc, tt, ct, callers)
+    return sorted(
+        methods[key]
+        for key, (*_, callers) in entries.items()
+        if key in methods and any(caller not in methods for caller in callers)
+    )
+
+
+def _get_service_methods() -> dict[tuple[str, int, str], str]:
+    """
+    Returns the profile function keys of the methods of all the (imported) service classes.
+    """
+    result: dict[tuple[str, int, str], str] = {}
+    classes: list[type] = [ServiceBase]
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        for name, value in vars(cls).items():
+            code = getattr(value, "__code__", None)
+            if code is not None and not name.startswith("__"):
+                result[(code.co_filename, code.co_firstlineno, code.co_name)] = f"{cls.__name__}.{name}"
+
+    return result
+
+
+def load_profiles(directory: Path, *, route: str | None = None) -> list[tuple[Path, ProfileInfo]]:
+    """
+    Returns the profiles in the given directory with their tags, optionally only the ones of the given route.
+
+    Arguments:
+        directory: The directory of the profiles.
+        route: Optional path template of the route to return the profiles of.
+    """
+    result: list[tuple[Path, ProfileInfo]] = []
+    for path in sorted(directory.glob("*.prof")):
+        info_path = path.with_suffix(".json")
+        if not info_path.exists():
+            continue
+
+        info = ProfileInfo.parse_file(info_path)
+        if route is None or info.route == route:
+            result.append((path, info))
+
+    return result
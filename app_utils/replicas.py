@@ -0,0 +1,152 @@
+from typing import Generic, Sequence, TypeVar
+
+from http.cookies import SimpleCookie
+import itertools
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+TEngine = TypeVar("TEngine")
+
+READ_METHODS = frozenset(("GET", "HEAD"))
+"""
+The HTTP methods of read-only requests, which can be served by read replicas.
+"""
+
+REPLICA_SESSION_INFO_KEY = "replica"
+"""
+The `Session.info` key that marks the sessions of read replicas, see `is_replica_session()`.
+"""
+
+
+class ReplicaPool(Generic[TEngine]):
+    """
+    Round-robin selector of the read replica engines of the application.
+    """
+
+    __slots__ = ("_counter", "_engines")
+
+    def __init__(self, engines: Sequence[TEngine]) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            engines: The engines of the replicas, at least one.
+        """
+        if len(engines) == 0:
+            raise ValueError("At least one replica engine is required.")
+
+        self._counter = itertools.count()
+        self._engines = tuple(engines)
+
+    @property
+    def engines(self) -> tuple[TEngine, ...]:
+        """
+        The engines of the replicas.
+        """
+        return self._engines
+
+    def get(self) -> TEngine:
+        """
+        Returns the engine of the next replica.
+        """
+        return self._engines[next(self._counter) % len(self._engines)]
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware that decides whether requests can be served by read replicas, see `use_replica()`.
+
+    Read requests (`READ_METHODS`) can use replicas. Responses of successful write requests set a cookie
+    that keeps the reads of the client on the primary for `window` seconds, so clients see their own
+    writes while the replicas catch up.
+    """
+
+    __slots__ = ("_app", "_cookie", "_window")
+
+    def __init__(self, app: ASGIApp, *, window: float, cookie: str = "db_primary_until") -> None:
+        """
+        Initialization.
+
+        Arguments:
+            app: The wrapped ASGI application.
+            window: The number of seconds after a write while the reads of the client use the primary.
+            cookie: The name of the cookie that stores the end of the window (Unix timestamp).
+        """
+        self._app = app
+        self._cookie = cookie
+        self._window = window
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self._app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        if scope["method"] in READ_METHODS:
+            state["use_replica"] = self._get_primary_until(scope) <= time.time()
+            await self._app(scope, receive, send)
+            return
+
+        state["use_replica"] = False
+        if self._window <= 0:
+            await self._app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Set-Cookie",
+                    f"{self._cookie}={time.time() + self._window:.3f}; Max-Age={self._window:g}; Path=/; "
+                    "HttpOnly; SameSite=Lax",
+                )
+
+            await send(message)
+
+        await self._app(scope, receive, send_wrapper)
+
+    def _get_primary_until(self, scope: Scope) -> float:
+        """
+        Returns the end of the primary window of the request from its cookie, 0 if it has none.
+        """
+        header = Headers(scope=scope).get("cookie")
+        if header is None:
+            return 0
+
+        try:
+            morsel = SimpleCookie(header).get(self._cookie)
+            return 0 if morsel is None else float(morsel.value)
+        except Exception:
+            # Malformed cookies are ignored.
+            return 0
+
+
+def use_replica(connection: HTTPConnection) -> bool:
+    """
+    Returns whether the given request can be served by a read replica. Requests that were not
+    processed by `ReadYourWritesMiddleware` use the primary.
+
+    Arguments:
+        connection: The request.
+    """
+    return connection.scope.get("state", {}).get("use_replica", False)
+
+
+def is_replica_session(session: Session | AsyncSession) -> bool:
+    """
+    Returns whether the given session reads from a read replica, that is whether its `info` has
+    a true `REPLICA_SESSION_INFO_KEY` entry.
+
+    Replicas may lag behind the primary, so data loaded from them must not be stored in caches that
+    are shared by the requests of every client: such entries could outlive the invalidation of a
+    more recent write.
+
+    Arguments:
+        session: The session to check.
+    """
+    return bool(session.info.get(REPLICA_SESSION_INFO_KEY, False))
@@ -0,0 +1,153 @@
+from typing import Any, Iterable, Iterator, Sequence, Type
+
+from datetime import datetime, timezone
+from enum import Enum
+import codecs
+import csv
+import io
+
+import orjson
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+class FileFormat(str, Enum):
+    """
+    Export and import file formats.
+    """
+
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class ORJSONBytesResponse(Response):
+    """
+    JSON response whose content is already serialized to bytes.
+    """
+
+    media_type = "application/json"
+
+
+def get_response_columns(response_model: Type[BaseModel]) -> list[str]:
+    """
+    Returns the names of the fields of the given response model, in serialization order.
+
+    Arguments:
+        response_model: The response model whose fields should be selected from the database.
+    """
+    return list(response_model.__fields__)
+
+
+def serialize_rows(columns: Sequence[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    """
+    Serializes the given database rows into a JSON array of objects.
+
+    Rows are not validated, so this must only be used for data that was validated when it was
+    written to the database. The output is identical to what FastAPI produces from the validated
+    response model: naive datetimes (stored in UTC) are serialized with a `+00:00` offset just
+    like `UTCDatetime`, and enums are serialized by value.
+
+    Arguments:
+        columns: The keys of the objects, in the order of the row values.
+        rows: The rows to serialize.
+    """
+    return orjson.dumps([dict(zip(columns, row)) for row in rows], option=orjson.OPT_NAIVE_UTC)
+
+
+def iter_ndjson(columns: Sequence[str], rows: Iterable[Sequence[Any]], *, chunk_size: int = 1000) -> Iterator[bytes]:
+    """
+    Yields the given rows as newline-delimited JSON objects, in chunks of `chunk_size` rows.
+
+    Objects are serialized the same way as by `serialize_rows()`.
+
+    Arguments:
+        columns: The keys of the objects, in the order of the row values.
+        rows: The rows to serialize.
+        chunk_size: The number of rows per yielded chunk.
+    """
+    chunk: list[bytes] = []
+    for row in rows:
+        chunk.append(orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_NAIVE_UTC | orjson.OPT_APPEND_NEWLINE))
+        if len(chunk) == chunk_size:
+            yield b"".join(chunk)
+            chunk = []
+
+    if chunk:
+        yield b"".join(chunk)
+
+
+def _to_csv_value(value: Any) -> Any:
+    """
+    Converts the given value to its CSV representation, consistently with the JSON one.
+    """
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def iter_csv(columns: Sequence[str], rows: Iterable[Sequence[Any]], *, chunk_size: int = 1000) -> Iterator[str]:
+    """
+    Yields the header and the given rows in CSV format, in chunks of `chunk_size` rows.
+
+    Datetimes are serialized in ISO 8601 format with UTC offset, enums by value, `None` as empty string.
+
+    Arguments:
+        columns: The names of the columns, in the order of the row values.
+        rows: The rows to serialize.
+        chunk_size: The number of rows per yielded chunk.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    count = 0
+    for row in rows:
+        writer.writerow([_to_csv_value(value) for value in row])
+        count += 1
+        if count == chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+
+    yield buffer.getvalue()
+
+
+def make_export_response(
+    columns: Sequence[str], rows: Iterable[Sequence[Any]], *, format: FileFormat, filename: str
+) -> StreamingResponse:
+    """
+    Returns a streaming response that exports the given rows in the given format as an attachment.
+
+    Arguments:
+        columns: The names of the columns, in the order of the row values.
+        rows: The rows to export. It should be a generator, so the rows are not held in memory.
+        format: The export format.
+        filename: The name of the exported file without extension.
+    """
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{format.value}"'}
+    if format == FileFormat.csv:
+        return StreamingResponse(iter_csv(columns, rows), media_type="text/csv", headers=headers)
+
+    return StreamingResponse(iter_ndjson(columns, rows), media_type="application/x-ndjson", headers=headers)
+
+
+def iter_text_lines(file: Iterable[bytes], *, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Yields the decoded lines of the given binary file, with their line endings.
+
+    Unlike `io.TextIOWrapper`, it only iterates over the file, so it works with file-like objects that
+    don't implement the full `io` interface, for example the `SpooledTemporaryFile` of uploaded files
+    before Python 3.11.
+
+    Arguments:
+        file: The binary file (or any iterable of `\\n`-terminated byte lines).
+        encoding: The encoding of the file.
+
+    Raises:
+        UnicodeDecodeError: If the file is not valid in the given encoding.
+    """
+    return codecs.iterdecode(file, encoding)
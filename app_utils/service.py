@@ -1,7 +1,16 @@
-from typing import Generic, Mapping, Type, TypeVar
+from typing import Any, ClassVar, Generic, Iterator, Mapping, NoReturn, Sequence, Type, TypeVar, cast
 
+from enum import Enum
+
+from pydantic import BaseModel
+from sqlalchemy import Column, and_, bindparam, delete, insert, inspect, tuple_, update
+from sqlalchemy import select as sa_select
+from sqlalchemy.engine import CursorResult, Dialect, Row
+from sqlalchemy.orm import selectinload
 from sqlmodel import SQLModel, Session, select
 
+from .pagination import decode_cursor, encode_cursor
+
 AtomicPrimaryKey = int | str
 PrimaryKey = AtomicPrimaryKey | tuple[AtomicPrimaryKey, ...] | list[AtomicPrimaryKey] | Mapping[str, AtomicPrimaryKey]
 
@@ -23,13 +32,460 @@ class CommitFailed(ServiceException):
     ...
 
 
+class InvalidCursor(ServiceException):
+    """Raised by services when a pagination cursor is invalid."""
+
+    ...
+
+
 class NotFound(ServiceException):
     """Raise by services when an item is not found."""
 
     ...
 
 
-class Service(Generic[TModel, TCreate, TUpdate, TPK]):
+class VersionConflict(ServiceException):
+    """Raised by services when the version of an item doesn't match the expected version."""
+
+    ...
+
+
+class RelationLoading(str, Enum):
+    """
+    Relationship loading strategies of `Service.get_related_page()`.
+    """
+
+    joined = "joined"
+    """One query that joins the items through the link table, paged in the database."""
+
+    selectin = "selectin"
+    """The parent is loaded with `selectinload()` (two queries), the relationship is paged in memory."""
+
+    lazy = "lazy"
+    """The relationship is lazy loaded from the parent (two queries) and paged in memory."""
+
+
+class BulkItemError(BaseModel):
+    """
+    Describes why an item of a bulk operation failed.
+    """
+
+    index: int
+    detail: str
+
+
+class BulkResult(BaseModel):
+    """
+    Bulk operation result model.
+    """
+
+    succeeded: int
+    errors: list[BulkItemError]
+
+
+def _get_python_type(column: Column) -> type | None:
+    """
+    Returns the Python type of the values of the given column, `None` if it is unknown.
+    """
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+class ServiceBase(Generic[TModel, TCreate, TUpdate, TPK]):
+    """
+    Session-independent base of the synchronous and asynchronous service implementations.
+    """
+
+    __slots__ = ("_model",)
+
+    single_statement_writes: ClassVar[bool] = True
+    """
+    Whether `update()` and `delete_by_pk()` should execute a single `UPDATE` / `DELETE` statement
+    instead of loading the item and writing it through the ORM. Set it to `False` in subclasses whose
+    models rely on ORM behavior, for example cascades other than the deletion of many-to-many links.
+    """
+
+    column_expressions: ClassVar[Mapping[str, Any]] = {}
+    """
+    SQL expressions that replace the table columns of the same name in the row queries of `get_row_page()`
+    and `iter_all()`. Use it for response fields that are computed from the stored values.
+    """
+
+    def __init__(self, *, model: Type[TModel]) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            model: The database *table* model.
+        """
+        self._model = model
+
+    def _check_version(self, pk: TPK, version: int | None, expected_version: int | None) -> None:
+        """
+        Raises the exception of a failed conditional write from the current version of the item.
+
+        Arguments:
+            pk: The primary key of the item.
+            version: The current version of the item, `None` if it doesn't exist.
+            expected_version: The expected version of the item, `None` if any version is accepted.
+
+        Raises:
+            NotFound: If the item doesn't exist.
+            VersionConflict: If the version of the item doesn't match the expected one.
+        """
+        if version is None:
+            raise NotFound(self._format_primary_key(pk))
+
+        if expected_version is not None and version != expected_version:
+            raise VersionConflict(self._format_primary_key(pk))
+
+    def _decode_cursor(self, columns: Sequence[Column], cursor: str) -> list[Any]:
+        """
+        Decodes the given cursor into the values of the given key columns.
+
+        Every value must match the Python type of its column, so crafted cursors can not
+        put arbitrary JSON values into keyset comparisons.
+
+        Arguments:
+            columns: The key columns the cursor was created from.
+            cursor: The cursor to decode.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        try:
+            return decode_cursor(cursor, size=len(columns), types=[_get_python_type(column) for column in columns])
+        except ValueError:
+            raise InvalidCursor(cursor)
+
+    def _format_primary_key(self, pk: TPK) -> str:
+        """
+        Returns the string-formatted version of the primary key.
+
+        Arguments:
+            pk: The primary key to format.
+
+        Raises:
+            ValueError: If formatting fails.
+        """
+        if isinstance(pk, (str, int)):
+            return str(pk)
+        elif isinstance(pk, (tuple, list)):
+            return "|".join(str(v) for v in pk)
+        elif isinstance(pk, dict):
+            return "|".join(f"{k}:{v}" for k, v in pk.items())
+
+        raise ValueError("Unrecognized primary key type.")
+
+    def _get_version(self, item: TModel, expected_version: int | None) -> int:
+        """
+        Returns the version of the given item for `_check_version()`.
+
+        Arguments:
+            item: The item.
+            expected_version: The expected version of the item.
+
+        Raises:
+            ValueError: If a version is expected but the model has no version column.
+        """
+        version_column = self._version_column()
+        if version_column is None:
+            if expected_version is not None:
+                raise ValueError("The model has no version column.")
+
+            return 0  # Any version is accepted.
+
+        return getattr(item, version_column.name)
+
+    def _is_single_statement_update(self, changes: dict[str, Any]) -> bool:
+        """
+        Returns whether the given changes can be applied with a single `UPDATE` statement.
+
+        Arguments:
+            changes: Attribute name - new value pairs, see `_prepare_for_update()`.
+        """
+        columns = self._model.__table__.columns  # type: ignore[attr-defined]
+        return self.single_statement_writes and len(changes) > 0 and all(key in columns for key in changes)
+
+    def _make_keyset_clause(self, columns: Sequence[Column], cursor: str) -> Any:
+        """
+        Returns the where clause that selects the items after the given cursor.
+
+        Arguments:
+            columns: The key columns the cursor was created from.
+            cursor: The cursor to decode.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        values = self._decode_cursor(columns, cursor)
+        if len(columns) == 1:
+            return columns[0] > values[0]
+
+        return tuple_(*columns) > tuple_(*values)
+
+    def _make_delete_statements(self, pk: TPK, *, expected_version: int | None = None) -> list[Any]:
+        """
+        Returns the statements that delete the item with the given primary key, the `DELETE` of the item
+        is the last one.
+
+        Rows that link the item to other items through many-to-many relationships are deleted first,
+        like the ORM does when an item is deleted.
+
+        Arguments:
+            pk: The primary key.
+            expected_version: If set, the item is only deleted if its version matches it.
+        """
+        pk_values = dict(zip(self._primary_key_columns(), self._make_pk_tuple(pk)))
+        statements = self._make_link_delete_statements(pk_values)
+        statements.append(
+            delete(self._model.__table__).where(  # type: ignore[attr-defined]
+                *(column == value for column, value in pk_values.items()),
+                *self._make_version_clause(expected_version),
+            )
+        )
+        return statements
+
+    def _make_link_delete_statements(self, pk_values: Mapping[Column, Any]) -> list[Any]:
+        """
+        Returns the statements that delete the rows that link the item with the given primary key
+        to other items through many-to-many relationships.
+
+        Arguments:
+            pk_values: Primary key column - value pairs, the values may be bind parameters.
+        """
+        return [
+            delete(relationship.secondary).where(
+                *(link_column == pk_values[column] for column, link_column in relationship.synchronize_pairs)
+            )
+            for relationship in inspect(self._model).relationships
+            if relationship.secondary is not None
+        ]
+
+    def _make_insert_row(self, data: TCreate) -> dict[str, Any]:
+        """
+        Converts the given creation data into the column values of a Core insert statement.
+
+        Primary key columns whose value is generated by the database are omitted.
+
+        Arguments:
+            data: Creation data.
+        """
+        db_item = self._model.from_orm(data)
+        return {
+            column.name: value
+            for column in self._model.__table__.columns  # type: ignore[attr-defined]
+            if not ((value := getattr(db_item, column.name)) is None and column.primary_key)
+        }
+
+    def _make_page(
+        self, items: list[Any], *, limit: int, key_columns: Sequence[Column] | None = None
+    ) -> tuple[list[Any], str | None]:
+        """
+        Returns the page and next page cursor from the result of a `_make_page_query()` query.
+
+        Arguments:
+            items: The result of the page query.
+            limit: The page size the query was created with.
+            key_columns: The columns the items are ordered by, the primary key of the model by default.
+        """
+        if len(items) <= limit:
+            return items, None
+
+        items = items[:limit]
+        last = items[-1]
+        columns = self._primary_key_columns() if key_columns is None else key_columns
+        return items, encode_cursor([getattr(last, column.name) for column in columns])
+
+    def _make_page_query(self, *, limit: int, cursor: str | None, columns: Sequence[str] | None = None) -> Any:
+        """
+        Returns the query of the page after the given cursor.
+
+        The query selects one more item than the page size to find out whether there
+        is a next page, use `_make_page()` to process its result.
+
+        Arguments:
+            limit: The page size.
+            cursor: The cursor of the requested page, `None` for the first page.
+            columns: If set, the query selects these columns instead of model instances.
+                The primary key columns must be included.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        pk_columns = self._primary_key_columns()
+        query = select(self._model) if columns is None else sa_select(*self._get_columns(columns))
+        query = query.order_by(*pk_columns).limit(limit + 1)
+        if cursor is not None:
+            query = query.where(self._make_keyset_clause(pk_columns, cursor))
+
+        return query
+
+    def _make_pk_params(self, pk: TPK) -> dict[str, Any]:
+        """
+        Returns the bind parameters of the `_pk_<column name>` primary key placeholders
+        that are used by bulk statements.
+
+        Arguments:
+            pk: The primary key.
+        """
+        return {
+            f"_pk_{column.name}": value for column, value in zip(self._primary_key_columns(), self._make_pk_tuple(pk))
+        }
+
+    def _make_pk_tuple(self, pk: TPK) -> tuple[AtomicPrimaryKey, ...]:
+        """
+        Returns the primary key as a tuple of values in primary key column order.
+
+        Arguments:
+            pk: The primary key.
+
+        Raises:
+            ValueError: If the primary key type is not recognized.
+        """
+        if isinstance(pk, (str, int)):
+            return (pk,)
+        elif isinstance(pk, (tuple, list)):
+            return tuple(pk)
+        elif isinstance(pk, Mapping):
+            return tuple(pk[column.name] for column in self._primary_key_columns())
+
+        raise ValueError("Unrecognized primary key type.")
+
+    def _make_update_statement(
+        self, pk: TPK, changes: dict[str, Any], *, returning: bool, expected_version: int | None = None
+    ) -> Any:
+        """
+        Returns the `UPDATE` statement that applies the given changes to the item with the given primary key.
+
+        The version of versioned items is incremented.
+
+        Arguments:
+            pk: The primary key.
+            changes: Column name - new value pairs, see `_prepare_for_update()`.
+            returning: Whether the statement should return the updated row.
+            expected_version: If set, the item is only updated if its version matches it.
+        """
+        table = self._model.__table__  # type: ignore[attr-defined]
+        statement = (
+            update(table)
+            .where(
+                *(column == value for column, value in zip(self._primary_key_columns(), self._make_pk_tuple(pk))),
+                *self._make_version_clause(expected_version),
+            )
+            .values({**changes, **self._make_version_increment()})
+        )
+        return statement.returning(*table.columns) if returning else statement
+
+    def _make_version_clause(self, expected_version: int | None) -> list[Any]:
+        """
+        Returns the where clauses that select the item only if its version matches the expected one.
+
+        Arguments:
+            expected_version: The expected version, no clauses are returned if it's `None`.
+
+        Raises:
+            ValueError: If a version is expected but the model has no version column.
+        """
+        if expected_version is None:
+            return []
+
+        version_column = self._version_column()
+        if version_column is None:
+            raise ValueError("The model has no version column.")
+
+        return [version_column == expected_version]
+
+    def _make_version_increment(self) -> dict[str, Any]:
+        """
+        Returns the update values that increment the version of versioned items.
+        """
+        version_column = self._version_column()
+        return {} if version_column is None else {version_column.name: version_column + 1}
+
+    def _make_version_query(self, pk: TPK) -> Any:
+        """
+        Returns the query that selects the version of the item with the given primary key.
+
+        Arguments:
+            pk: The primary key.
+
+        Raises:
+            ValueError: If the model has no version column.
+        """
+        version_column = self._version_column()
+        if version_column is None:
+            raise ValueError("The model has no version column.")
+
+        return sa_select(version_column).where(
+            *(column == value for column, value in zip(self._primary_key_columns(), self._make_pk_tuple(pk)))
+        )
+
+    def _get_columns(self, names: Sequence[str]) -> list[Any]:
+        """
+        Returns the columns (or `column_expressions`) with the given names for row queries.
+
+        Arguments:
+            names: The names of the columns.
+        """
+        table = self._model.__table__  # type: ignore[attr-defined]
+        return [self.column_expressions.get(name, table.columns[name]) for name in names]
+
+    def _primary_key_columns(self) -> tuple[Column, ...]:
+        """
+        Returns the primary key columns of the table model.
+        """
+        return inspect(self._model).primary_key
+
+    def _supports_returning(self, dialect: Dialect) -> bool:
+        """
+        Returns whether the given dialect supports `UPDATE ... RETURNING`.
+
+        Arguments:
+            dialect: The dialect of the database.
+        """
+        return bool(getattr(dialect, "full_returning", False))
+
+    def _version_column(self) -> Column | None:
+        """
+        Returns the `version` column of the table model if it has one.
+
+        Versioned items are updated and deleted with optimistic concurrency control: every change
+        increments the version, and changes can be made conditional on the expected version.
+        """
+        return self._model.__table__.columns.get("version")  # type: ignore[attr-defined]
+
+    def _on_changed(self, pk: TPK) -> None:
+        """
+        Hook that is called after the item with the given primary key has been
+        successfully updated or deleted.
+
+        The default implementation is a no-op, subclasses can use it for example
+        to invalidate cached data.
+
+        Arguments:
+            pk: The primary key of the changed item.
+        """
+        ...
+
+    def _prepare_for_update(self, data: TUpdate) -> dict:
+        """
+        Hook that is called before applying the given update.
+
+        The methods role is to convert the given data into a `dict` of
+        attribute name - new value pairs, omitting unchanged values.
+
+        The default implementation is `data.dict(exclude_unset=True)`.
+
+        Arguments:
+            data: The update data.
+        """
+        return data.dict(exclude_unset=True)
+
+
+class Service(ServiceBase[TModel, TCreate, TUpdate, TPK]):
     """
     Base service implementation.
 
@@ -38,10 +494,7 @@ class Service(Generic[TModel, TCreate, TUpdate, TPK]):
     For example don't reuse the same service instance across multiple requests.
     """
 
-    __slots__ = (
-        "_model",
-        "_session",
-    )
+    __slots__ = ("_session",)
 
     def __init__(self, session: Session, *, model: Type[TModel]) -> None:
         """
@@ -51,7 +504,7 @@ class Service(Generic[TModel, TCreate, TUpdate, TPK]):
             session: The session instance the service will use.
             model: The database *table* model.
         """
-        self._model = model
+        super().__init__(model=model)
         self._session = session
 
     def create(self, data: TCreate) -> TModel:
@@ -74,35 +527,200 @@ class Service(Generic[TModel, TCreate, TUpdate, TPK]):
         session.refresh(db_item)
         return db_item
 
-    def delete_by_pk(self, pk: TPK) -> None:
+    def create_many(self, items: Sequence[TCreate], *, batch_size: int = 1000) -> BulkResult:
+        """
+        Creates new database entries from the given data.
+
+        Items are inserted with a single executemany statement and a single transaction
+        per batch. If a batch fails, its items are retried one by one (each in a savepoint
+        of the batch's transaction) to find the failing ones.
+
+        Arguments:
+            items: Creation data.
+            batch_size: The maximum number of items per transaction.
+        """
+        statement = insert(self._model.__table__)  # type: ignore[attr-defined]
+        result = BulkResult(succeeded=0, errors=[])
+        for offset in range(0, len(items), batch_size):
+            rows = [self._make_insert_row(item) for item in items[offset : offset + batch_size]]
+            self._execute_batch(statement, rows, offset=offset, result=result)
+
+        return result
+
+    def insert_rows(self, rows: list[dict[str, Any]], *, indices: list[int] | None = None) -> BulkResult:
+        """
+        Inserts the given, already validated column values in a single transaction.
+
+        Unlike `create_many()`, no model instances are created. If the transaction fails, the rows
+        are retried one by one to find the failing ones, see `create_many()` for details.
+
+        Arguments:
+            rows: The column values of the rows to insert.
+            indices: The index of each row reported in errors (for example line numbers), by default
+                the position of the row in `rows`.
+        """
+        result = BulkResult(succeeded=0, errors=[])
+        statement = insert(self._model.__table__)  # type: ignore[attr-defined]
+        self._execute_batch(statement, rows, offset=0, result=result, indices=indices)
+        return result
+
+    def delete_by_pk(self, pk: TPK, *, expected_version: int | None = None) -> None:
         """
         Deletes the item with the given primary key from the database.
 
         Arguments:
             pk: The primary key.
+            expected_version: If set, the item is only deleted if its version matches it.
+                Requires a version column, see `_version_column()`.
 
         Raises:
             CommitFailed: If the service fails to commit the operation.
             NotFound: If the document with the given primary key does not exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
         """
         session = self._session
 
+        if self.single_statement_writes:
+            *link_statements, statement = self._make_delete_statements(pk, expected_version=expected_version)
+            try:
+                for link_statement in link_statements:
+                    session.execute(link_statement)
+
+                deleted = cast(CursorResult, session.execute(statement)).rowcount > 0
+                if deleted:
+                    session.commit()
+            except Exception:
+                session.rollback()
+                raise CommitFailed("Failed to delete item.")
+
+            if not deleted:
+                session.rollback()
+                self._raise_write_failed(pk, expected_version)
+
+            self._on_changed(pk)
+            return
+
         item = self.get_by_pk(pk)
         if item is None:
             raise NotFound(self._format_primary_key(pk))
 
+        self._check_version(pk, self._get_version(item, expected_version), expected_version)
+
         session.delete(item)
         try:
             session.commit()
         except Exception:
             raise CommitFailed("Failed to delete item.")
 
+        self._on_changed(pk)
+
+    def delete_many(self, pks: Sequence[TPK], *, batch_size: int = 1000) -> BulkResult:
+        """
+        Deletes the items with the given primary keys from the database.
+
+        Each batch is deleted with a single statement and transaction, after the rows that link
+        its items to other items through many-to-many relationships. Missing items are reported as errors.
+
+        Arguments:
+            pks: The primary keys of the items to delete.
+            batch_size: The maximum number of items per transaction.
+        """
+        pk_columns = self._primary_key_columns()
+        result = BulkResult(succeeded=0, errors=[])
+        for offset in range(0, len(pks), batch_size):
+            batch = pks[offset : offset + batch_size]
+            indices = self._find_existing(batch, offset=offset, result=result)
+            if len(indices) == 0:
+                continue
+
+            rows = [self._make_pk_params(batch[i - offset]) for i in indices]
+            pk_params: dict[Column, Any] = {column: bindparam(f"_pk_{column.name}") for column in pk_columns}
+            statement = delete(self._model.__table__).where(  # type: ignore[attr-defined]
+                *(column == param for column, param in pk_params.items())
+            )
+            for index in self._execute_batch(
+                statement,
+                rows,
+                offset=offset,
+                result=result,
+                indices=indices,
+                preceding_statements=self._make_link_delete_statements(pk_params),
+            ):
+                self._on_changed(pks[index])
+
+        return result
+
     def get_all(self) -> list[TModel]:
         """
         Returns all items from the database.
         """
         return self._session.exec(select(self._model)).all()
 
+    def iter_all(self, columns: Sequence[str], *, where: Sequence[Any] = (), batch_size: int = 1000) -> Iterator[Row]:
+        """
+        Yields the rows with the given columns of all items that match the given filters, ordered by primary key.
+
+        Rows are streamed with a server-side cursor (where the database supports it) and fetched
+        in batches, so memory use doesn't depend on the number of items. No model instances are
+        created and the session's identity map is not used.
+
+        The session must stay open while the generator is consumed.
+
+        Arguments:
+            columns: The names of the columns to select.
+            where: Filter clauses, they are added to the `WHERE` clause of the query.
+            batch_size: The number of rows to fetch at once.
+        """
+        query = (
+            sa_select(*self._get_columns(columns))
+            .where(*where)
+            .order_by(*self._primary_key_columns())
+            .execution_options(stream_results=True)
+        )
+        result = cast(CursorResult, self._session.execute(query)).yield_per(batch_size)
+        try:
+            for partition in result.partitions():
+                yield from partition
+        finally:
+            result.close()
+
+    def get_page(self, *, limit: int, cursor: str | None = None) -> tuple[list[TModel], str | None]:
+        """
+        Returns a page of items ordered by primary key and the cursor of the next page.
+
+        Pagination is keyset-based, so the cost of fetching a page doesn't depend on
+        its position. The returned cursor is `None` if there are no more items.
+
+        Arguments:
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        items = self._session.exec(self._make_page_query(limit=limit, cursor=cursor)).all()
+        return self._make_page(items, limit=limit)
+
+    def get_row_page(
+        self, columns: Sequence[str], *, limit: int, cursor: str | None = None
+    ) -> tuple[list[Row], str | None]:
+        """
+        Returns a page of rows with the given columns ordered by primary key and the cursor of the next page.
+
+        Same as `get_page()`, but no model instances are created, which makes it the cheaper
+        option if the items are only serialized.
+
+        Arguments:
+            columns: The names of the columns to select, the primary key columns must be included.
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        rows = self._session.execute(self._make_page_query(limit=limit, cursor=cursor, columns=columns)).all()
+        return self._make_page(list(rows), limit=limit)
+
     def get_by_pk(self, pk: PrimaryKey) -> TModel | None:
         """
         Returns the item with the given primary key if it exists.
@@ -112,66 +730,326 @@ class Service(Generic[TModel, TCreate, TUpdate, TPK]):
         """
         return self._session.get(self._model, pk)
 
-    def update(self, pk: TPK, data: TUpdate) -> TModel:
+    def get_related_page(
+        self,
+        pk: TPK,
+        relationship: str,
+        *,
+        limit: int,
+        cursor: str | None = None,
+        loading: RelationLoading = RelationLoading.joined,
+    ) -> tuple[list[Any], str | None]:
+        """
+        Returns a page of the items of the given many-to-many relationship of the item
+        with the given primary key, ordered by the primary key of the related model,
+        and the cursor of the next page.
+
+        Arguments:
+            pk: The primary key of the parent item.
+            relationship: The name of the relationship attribute of the model.
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+            loading: The relationship loading strategy. Only `RelationLoading.joined`
+                pages in the database, use the others only for small relationships.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+            NotFound: If the parent item doesn't exist.
+        """
+        relationship_property = inspect(self._model).relationships[relationship]
+        related_model = relationship_property.mapper.class_
+        key_columns = inspect(related_model).primary_key
+
+        if loading == RelationLoading.joined:
+            # Join the related table with the link table and filter on the parent key
+            # in the link table, so the parent table isn't touched at all.
+            parent_key = dict(zip(self._primary_key_columns(), self._make_pk_tuple(pk)))
+            query = (
+                select(related_model)
+                .join(
+                    relationship_property.secondary,
+                    and_(*(a == b for a, b in relationship_property.secondary_synchronize_pairs)),
+                )
+                .where(
+                    *(
+                        link_column == parent_key[column]
+                        for column, link_column in relationship_property.synchronize_pairs
+                    )
+                )
+                .order_by(*key_columns)
+                .limit(limit + 1)
+            )
+            if cursor is not None:
+                query = query.where(self._make_keyset_clause(key_columns, cursor))
+
+            items = self._session.exec(query).all()
+            if len(items) == 0 and self.get_by_pk(pk) is None:
+                raise NotFound(self._format_primary_key(pk))
+
+            return self._make_page(items, limit=limit, key_columns=key_columns)
+
+        if loading == RelationLoading.selectin:
+            pk_clause = (
+                column == value for column, value in zip(self._primary_key_columns(), self._make_pk_tuple(pk))
+            )
+            parent = self._session.exec(
+                select(self._model).where(*pk_clause).options(selectinload(getattr(self._model, relationship)))
+            ).first()
+        else:
+            parent = self.get_by_pk(pk)
+
+        if parent is None:
+            raise NotFound(self._format_primary_key(pk))
+
+        def get_key(item: Any) -> tuple:
+            return tuple(getattr(item, column.name) for column in key_columns)
+
+        items = sorted(getattr(parent, relationship), key=get_key)
+        if cursor is not None:
+            after = tuple(self._decode_cursor(key_columns, cursor))
+            items = [item for item in items if get_key(item) > after]
+
+        return self._make_page(items[: limit + 1], limit=limit, key_columns=key_columns)
+
+    def update(self, pk: TPK, data: TUpdate, *, expected_version: int | None = None) -> TModel:
         """
         Updates the item with the given primary key.
 
+        If `single_statement_writes` is enabled and the changes only contain column values,
+        the item is updated with a single `UPDATE ... RETURNING` statement, or an `UPDATE`
+        and a `SELECT` if the database doesn't support `RETURNING`.
+
+        The version of versioned items (see `_version_column()`) is incremented by the update.
+
         Arguments:
             pk: The primary key.
             data: Update data.
+            expected_version: If set, the item is only updated if its version matches it.
+                Requires a version column.
 
         Raises:
             CommitFailed: If the service fails to commit the operation.
             NotFound: If the document with the given primary key does not exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
         """
         session = self._session
 
+        changes = self._prepare_for_update(data)
+        if self._is_single_statement_update(changes):
+            returning = self._supports_returning(session.get_bind().dialect)
+            statement = self._make_update_statement(
+                pk, changes, returning=returning, expected_version=expected_version
+            )
+            try:
+                result = cast(CursorResult, session.execute(statement))
+                row = result.one_or_none() if returning else None
+                updated = row is not None if returning else result.rowcount > 0
+                if updated:
+                    session.commit()
+            except Exception:
+                session.rollback()
+                raise CommitFailed(f"Failed to update {self._format_primary_key(pk)}.")
+
+            if not updated:
+                session.rollback()
+                self._raise_write_failed(pk, expected_version)
+
+            self._on_changed(pk)
+            return self._load_updated(pk, row)
+
         item = self.get_by_pk(pk)
         if item is None:
             raise NotFound(self._format_primary_key(pk))
 
-        changes = self._prepare_for_update(data)
+        self._check_version(pk, self._get_version(item, expected_version), expected_version)
+
         for key, value in changes.items():
             setattr(item, key, value)
 
+        if len(changes) > 0 and (version_column := self._version_column()) is not None:
+            setattr(item, version_column.name, getattr(item, version_column.name) + 1)
+
         session.add(item)
         try:
             session.commit()
         except Exception:
             raise CommitFailed(f"Failed to update {self._format_primary_key(pk)}.")
 
+        self._on_changed(pk)
+
         session.refresh(item)
         return item
 
-    def _format_primary_key(self, pk: TPK) -> str:
+    def update_many(self, items: Sequence[tuple[TPK, TUpdate]], *, batch_size: int = 1000) -> BulkResult:
         """
-        Returns the string-formatted version of the primary key.
+        Updates the items with the given primary keys.
+
+        Updates that change the same set of attributes are executed with a single
+        executemany statement, and each batch is committed in a single transaction.
+        Missing items are reported as errors.
 
         Arguments:
-            pk: The primary key to format.
+            items: Primary key - update data pairs.
+            batch_size: The maximum number of items per transaction.
+        """
+        table = self._model.__table__  # type: ignore[attr-defined]
+        pk_columns = self._primary_key_columns()
+        result = BulkResult(succeeded=0, errors=[])
+        for offset in range(0, len(items), batch_size):
+            batch = items[offset : offset + batch_size]
+            indices = self._find_existing([pk for pk, _ in batch], offset=offset, result=result)
+
+            # Group the updates by the set of changed attributes, each group is one executemany statement.
+            groups: dict[tuple[str, ...], tuple[list[int], list[dict[str, Any]]]] = {}
+            for index in indices:
+                pk, data = batch[index - offset]
+                changes = self._prepare_for_update(data)
+                group_indices, rows = groups.setdefault(tuple(sorted(changes)), ([], []))
+                group_indices.append(index)
+                rows.append({**self._make_pk_params(pk), **{f"_value_{k}": v for k, v in changes.items()}})
+
+            for keys, (group_indices, rows) in groups.items():
+                if len(keys) == 0:  # Nothing to change.
+                    result.succeeded += len(rows)
+                    continue
+
+                statement = (
+                    update(table)
+                    .where(*(column == bindparam(f"_pk_{column.name}") for column in pk_columns))
+                    .values({**{key: bindparam(f"_value_{key}") for key in keys}, **self._make_version_increment()})
+                )
+                for index in self._execute_batch(
+                    statement, rows, offset=offset, result=result, indices=group_indices
+                ):
+                    self._on_changed(items[index][0])
+
+        return result
+
+    def _raise_write_failed(self, pk: TPK, expected_version: int | None) -> NoReturn:
+        """
+        Raises the exception of a conditional update or delete that didn't affect any rows.
+
+        Arguments:
+            pk: The primary key of the item.
+            expected_version: The expected version of the write.
 
         Raises:
-            ValueError: If formatting fails.
+            NotFound: If the item doesn't exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
         """
-        if isinstance(pk, (str, int)):
-            return str(pk)
-        elif isinstance(pk, (tuple, list)):
-            return "|".join(pk)
-        elif isinstance(pk, dict):
-            return "|".join(f"{k}:{v}" for k, v in pk.items())
+        if expected_version is None:
+            raise NotFound(self._format_primary_key(pk))
 
-        raise ValueError("Unrecognized primary key type.")
+        self._check_version(pk, self._session.execute(self._make_version_query(pk)).scalar(), expected_version)
+        # The item has been changed and changed back, which can't happen with incremented versions.
+        raise VersionConflict(self._format_primary_key(pk))
 
-    def _prepare_for_update(self, data: TUpdate) -> dict:
+    def _load_updated(self, pk: TPK, row: Row | None) -> TModel:
         """
-        Hook that is called before applying the given update.
+        Returns the item that was updated by `update()` from the returned row if available,
+        otherwise from the database.
 
-        The methods role is to convert the given data into a `dict` of
-        attribute name - new value pairs, omitting unchanged values.
+        Arguments:
+            pk: The primary key of the item.
+            row: The row returned by the update statement.
 
-        The default implementation is `data.dict(exclude_unset=True)`.
+        Raises:
+            NotFound: If the item was deleted since the update.
+        """
+        if row is not None:
+            return self._model(**row._mapping)
+
+        item = self.get_by_pk(pk)
+        if item is None:
+            raise NotFound(self._format_primary_key(pk))
+
+        return item
+
+    def _execute_batch(
+        self,
+        statement: Any,
+        rows: list[dict[str, Any]],
+        *,
+        offset: int,
+        result: BulkResult,
+        indices: list[int] | None = None,
+        preceding_statements: Sequence[Any] = (),
+    ) -> list[int]:
+        """
+        Executes the given statement with the given parameter sets in a single transaction,
+        records the outcome in `result`, and returns the bulk request indices of the successful items.
+
+        If the transaction fails, the rows are executed one by one in savepoints to find the
+        failing items, and the successful ones are committed.
 
         Arguments:
-            data: The update data.
+            statement: The statement to execute.
+            rows: The parameter sets of the statement.
+            offset: The index of the first item of the batch in the original bulk request.
+            result: The bulk result to record successes and errors in.
+            indices: The index of each row in the original bulk request if they are not consecutive.
+            preceding_statements: Statements that are executed with the same parameter sets
+                before `statement`, in the same transaction.
         """
-        return data.dict(exclude_unset=True)
+        session = self._session
+        row_indices = list(range(offset, offset + len(rows))) if indices is None else indices
+        statements = (*preceding_statements, statement)
+
+        try:
+            for step in statements:
+                session.execute(step, rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+        else:
+            result.succeeded += len(rows)
+            return row_indices
+
+        succeeded: list[int] = []
+        for index, row in zip(row_indices, rows):
+            try:
+                with session.begin_nested():
+                    for step in statements:
+                        session.execute(step, [row])
+            except Exception as e:
+                result.errors.append(BulkItemError(index=index, detail=str(getattr(e, "orig", e))))
+            else:
+                succeeded.append(index)
+
+        try:
+            session.commit()
+        except Exception:
+            session.rollback()
+            result.errors.extend(BulkItemError(index=i, detail="Commit failed.") for i in succeeded)
+            return []
+
+        result.succeeded += len(succeeded)
+        return succeeded
+
+    def _find_existing(self, pks: Sequence[TPK], *, offset: int, result: BulkResult) -> list[int]:
+        """
+        Returns the bulk request indices of the primary keys that exist in the database,
+        and records the missing ones as errors in `result`.
+
+        Arguments:
+            pks: The primary keys to look up.
+            offset: The index of the first primary key in the original bulk request.
+            result: The bulk result to record missing items in.
+        """
+        pk_columns = self._primary_key_columns()
+        keys = [self._make_pk_tuple(pk) for pk in pks]
+        if len(pk_columns) == 1:
+            query = select(pk_columns[0]).where(pk_columns[0].in_([key[0] for key in keys]))
+            existing = {(value,) for value in self._session.exec(query)}
+        else:
+            query = select(*pk_columns).where(tuple_(*pk_columns).in_(keys))
+            existing = {tuple(row) for row in self._session.exec(query)}
+
+        indices: list[int] = []
+        for index, (pk, key) in enumerate(zip(pks, keys), start=offset):
+            if key in existing:
+                indices.append(index)
+            else:
+                result.errors.append(BulkItemError(index=index, detail=f"Not found: {self._format_primary_key(pk)}"))
+
+        return indices
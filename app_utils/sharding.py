@@ -0,0 +1,370 @@
+from typing import Any, Callable, Generic, Iterator, Sequence, Type, TypeVar
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import heapq
+import zlib
+
+from sqlalchemy.future import Engine
+from sqlmodel import SQLModel, Session
+
+from .pagination import decode_cursor, encode_cursor
+from .service import InvalidCursor, NotFound, Service
+
+TService = TypeVar("TService", bound=Service)
+TModel = TypeVar("TModel", bound=SQLModel)
+TCreate = TypeVar("TCreate", bound=SQLModel)
+TUpdate = TypeVar("TUpdate", bound=SQLModel)
+T = TypeVar("T")
+
+SHARD_ID_BITS = 48
+"""
+The number of low bits of sharded IDs that store the ID of the item in its shard.
+"""
+
+MAX_SHARDS = 32
+"""
+The maximum number of shards. Sharded IDs stay below 2^53, so they are safe in JSON (JavaScript) numbers.
+"""
+
+
+def get_shard(key: str, shard_count: int) -> int:
+    """
+    Returns the shard of the given shard key (CRC32 hash partitioning).
+
+    Arguments:
+        key: The shard key of the item.
+        shard_count: The number of shards.
+    """
+    return zlib.crc32(key.encode()) % shard_count
+
+
+def make_sharded_id(shard: int, local_id: int) -> int:
+    """
+    Returns the application-wide ID of an item from its shard and its ID in the shard.
+
+    Arguments:
+        shard: The shard of the item.
+        local_id: The ID of the item in the shard.
+    """
+    return (shard << SHARD_ID_BITS) | local_id
+
+
+def split_sharded_id(id: int) -> tuple[int, int]:
+    """
+    Returns the shard and the ID in the shard of the given application-wide ID.
+
+    Arguments:
+        id: The application-wide ID created by `make_sharded_id()`.
+    """
+    return id >> SHARD_ID_BITS, id & ((1 << SHARD_ID_BITS) - 1)
+
+
+class ShardSet:
+    """
+    The database engines of the shards and the threadpool that executes fan-out queries.
+
+    Create a single instance in the application, it owns the connection pools and the threads.
+    Every engine must allow the use of connections from multiple threads (for SQLite, create
+    the engine with `check_same_thread=False`).
+    """
+
+    __slots__ = ("_engines", "_executor")
+
+    def __init__(self, engines: Sequence[Engine], *, max_workers: int | None = None) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            engines: The engines of the shards. The order of the engines must never change, and
+                shards can not be added without moving the data of every shard.
+            max_workers: The number of threads that execute fan-out queries, by default one per shard.
+        """
+        if not (0 < len(engines) <= MAX_SHARDS):
+            raise ValueError(f"The number of shards must be between 1 and {MAX_SHARDS}.")
+
+        self._engines = tuple(engines)
+        self._executor = ThreadPoolExecutor(max_workers or len(engines), thread_name_prefix="shard")
+
+    @property
+    def engines(self) -> tuple[Engine, ...]:
+        """
+        The engines of the shards.
+        """
+        return self._engines
+
+    def close(self) -> None:
+        """
+        Stops the threadpool and disposes the engines.
+        """
+        self._executor.shutdown()
+        for engine in self._engines:
+            engine.dispose()
+
+    def map(self, call: Callable[[int], T]) -> list[T]:
+        """
+        Calls the given function with every shard in parallel and returns the results in shard order.
+
+        Arguments:
+            call: The function to call with the index of each shard.
+        """
+        if len(self._engines) == 1:
+            return [call(0)]
+
+        return list(self._executor.map(call, range(len(self._engines))))
+
+    @contextmanager
+    def sessions(self) -> Iterator[list[Session]]:
+        """
+        Context manager that opens a session for every shard and closes them on exit.
+        """
+        sessions = [Session(engine) for engine in self._engines]
+        try:
+            yield sessions
+        finally:
+            for session in sessions:
+                session.close()
+
+
+class ShardedService(ABC, Generic[TService, TModel, TCreate, TUpdate]):
+    """
+    Base of services that partition the items of a model across the databases of a `ShardSet`
+    by the hash of a shard key, see `_get_shard_key()`.
+
+    Subclasses must implement `_get_shard_key()` and `_make_service()`.
+
+    Every shard is accessed through a regular service (`_make_service()`). The items are stored
+    with IDs that are unique in their shard, and the service returns application-wide IDs with the
+    shard in the high bits (`make_sharded_id()`), so lookups by ID only query the item's shard.
+    Fan-out queries are executed on all shards in parallel and their results are merged in order.
+
+    The model must have an integer `id` primary key. Returned items are transient copies with
+    application-wide IDs, they are not attached to the sessions.
+    """
+
+    __slots__ = ("_model", "_services", "_shards")
+
+    def __init__(self, shards: ShardSet, sessions: Sequence[Session], *, model: Type[TModel]) -> None:
+        """
+        Initialization.
+
+        Arguments:
+            shards: The shards of the model.
+            sessions: A session for every shard, see `ShardSet.sessions()`.
+            model: The database *table* model.
+        """
+        if len(sessions) != len(shards.engines):
+            raise ValueError("A session is required for every shard.")
+
+        self._model = model
+        self._services = [self._make_service(session) for session in sessions]
+        self._shards = shards
+
+    def create(self, data: TCreate) -> TModel:
+        """
+        Creates a new item in the shard of its shard key.
+
+        Arguments:
+            data: Creation data.
+
+        Raises:
+            CommitFailed: If the service fails to commit the operation.
+        """
+        shard = get_shard(self._get_shard_key(data), len(self._services))
+        return self._to_sharded(shard, self._services[shard].create(data))
+
+    def delete_by_pk(self, pk: int, *, expected_version: int | None = None) -> None:
+        """
+        Deletes the item with the given ID from its shard.
+
+        Arguments:
+            pk: The application-wide ID of the item.
+            expected_version: If set, the item is only deleted if its version matches it.
+
+        Raises:
+            CommitFailed: If the service fails to commit the operation.
+            NotFound: If the item doesn't exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
+        """
+        shard, local_id = self._split_id(pk)
+        self._services[shard].delete_by_pk(local_id, expected_version=expected_version)
+
+    def get_all(self) -> list[TModel]:
+        """
+        Returns all items from all shards, ordered by ID.
+        """
+
+        def get_all(shard: int) -> list[TModel]:
+            items = sorted(self._services[shard].get_all(), key=lambda item: item.id)  # type: ignore[attr-defined]
+            return [self._to_sharded(shard, item) for item in items]
+
+        return list(heapq.merge(*self._shards.map(get_all), key=lambda item: item.id))  # type: ignore[attr-defined]
+
+    def get_by_pk(self, pk: int) -> TModel | None:
+        """
+        Returns the item with the given ID if it exists.
+
+        Arguments:
+            pk: The application-wide ID of the item.
+        """
+        try:
+            shard, local_id = self._split_id(pk)
+        except NotFound:
+            return None
+
+        item = self._services[shard].get_by_pk(local_id)
+        return None if item is None else self._to_sharded(shard, item)
+
+    def get_page(self, *, limit: int, cursor: str | None = None) -> tuple[list[TModel], str | None]:
+        """
+        Returns a page of items ordered by ID and the cursor of the next page.
+
+        Every shard returns its page after the cursor in parallel, and the pages are merged.
+
+        Arguments:
+            limit: The maximum number of items to return.
+            cursor: The cursor of the requested page, `None` for the first page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        after = None if cursor is None else self._decode_id_cursor(cursor)
+
+        def get_page(shard: int) -> tuple[list[TModel], str | None]:
+            if after is None:
+                local_cursor = None
+            else:
+                local_cursor = self._make_local_key_cursor(shard, [], after)
+                if local_cursor is None:
+                    # Every item of the shard precedes the cursor.
+                    return [], None
+
+            items, next_cursor = self._services[shard].get_page(limit=limit, cursor=local_cursor)
+            return [self._to_sharded(shard, item) for item in items], next_cursor
+
+        return self._merge_pages(
+            self._shards.map(get_page),
+            limit=limit,
+            key=lambda item: (item.id,),  # type: ignore[attr-defined]
+            make_cursor=lambda item: encode_cursor([item.id]),  # type: ignore[attr-defined]
+        )
+
+    def update(self, pk: int, data: TUpdate, *, expected_version: int | None = None) -> TModel:
+        """
+        Updates the item with the given ID in its shard.
+
+        The shard key of the item must not be changed, because the item would stay in its old shard.
+
+        Arguments:
+            pk: The application-wide ID of the item.
+            data: Update data.
+            expected_version: If set, the item is only updated if its version matches it.
+
+        Raises:
+            CommitFailed: If the service fails to commit the operation.
+            NotFound: If the item doesn't exist.
+            VersionConflict: If the version of the item doesn't match `expected_version`.
+        """
+        shard, local_id = self._split_id(pk)
+        return self._to_sharded(
+            shard, self._services[shard].update(local_id, data, expected_version=expected_version)
+        )
+
+    def _decode_id_cursor(self, cursor: str) -> int:
+        """
+        Decodes a `get_page()` cursor into the application-wide ID of the last item of the previous page.
+
+        Raises:
+            InvalidCursor: If the cursor is malformed.
+        """
+        try:
+            (id,) = decode_cursor(cursor, size=1)
+            return int(id)
+        except (TypeError, ValueError):
+            raise InvalidCursor(cursor)
+
+    @abstractmethod
+    def _get_shard_key(self, data: TCreate) -> str:
+        """
+        Returns the shard key of the given creation data.
+
+        Arguments:
+            data: Creation data.
+        """
+
+    def _make_local_key_cursor(self, shard: int, values: list[Any], id: int) -> str | None:
+        """
+        Returns the cursor of the given shard from a sharded keyset cursor whose last key column is the
+        application-wide ID, `None` if every item of the shard with the same leading key values precedes
+        the cursor and there are no other key columns.
+
+        The items are ordered by application-wide ID, so items with the same leading key values in the
+        shards before the cursor's shard precede the cursor, and the ones in the shards after it follow it.
+
+        Arguments:
+            shard: The shard to create the cursor for.
+            values: The leading key values of the cursor.
+            id: The application-wide ID of the cursor.
+        """
+        cursor_shard, local_id = split_sharded_id(id)
+        if shard < cursor_shard:
+            if len(values) == 0:
+                return None
+            local_id = 1 << SHARD_ID_BITS  # Greater than every ID of the shard.
+        elif shard > cursor_shard:
+            local_id = 0  # Less than every ID of the shard.
+
+        return encode_cursor([*values, local_id])
+
+    @abstractmethod
+    def _make_service(self, session: Session) -> TService:
+        """
+        Creates the service of a shard.
+
+        Arguments:
+            session: The session of the shard.
+        """
+
+    def _merge_pages(
+        self,
+        pages: list[tuple[list[TModel], str | None]],
+        *,
+        limit: int,
+        key: Callable[[TModel], tuple],
+        make_cursor: Callable[[TModel], str],
+    ) -> tuple[list[TModel], str | None]:
+        """
+        Merges the pages of the shards and returns the first `limit` items and the cursor of the next page.
+
+        Arguments:
+            pages: The items (ordered by `key`) and next page cursor of every shard.
+            limit: The page size.
+            key: Returns the key values of an item, the last one must be the application-wide ID.
+            make_cursor: Returns the cursor of the page after the given item.
+        """
+        merged = list(heapq.merge(*(items for items, _ in pages), key=key))
+        if len(merged) <= limit and all(cursor is None for _, cursor in pages):
+            return merged, None
+
+        items = merged[:limit]
+        return items, make_cursor(items[-1])
+
+    def _split_id(self, pk: int) -> tuple[int, int]:
+        """
+        Returns the shard and the ID in the shard of the given application-wide ID.
+
+        Raises:
+            NotFound: If the ID doesn't belong to any shard.
+        """
+        shard, local_id = split_sharded_id(pk)
+        if not (0 <= shard < len(self._services)):
+            raise NotFound(str(pk))
+
+        return shard, local_id
+
+    def _to_sharded(self, shard: int, item: TModel) -> TModel:
+        """
+        Returns a transient copy of the given item of the given shard with its application-wide ID.
+        """
+        return self._model(**{**item.dict(), "id": make_sharded_id(shard, item.id)})  # type: ignore[attr-defined]
@@ -1,10 +1,11 @@
-from typing import Generator, Protocol
+from typing import AsyncGenerator, Generator, Protocol
 
 from datetime import datetime, timezone
 
 from fastapi import APIRouter
 from pydantic.datetime_parse import parse_datetime
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 class SessionContextProvider(Protocol):
@@ -16,12 +17,26 @@ class SessionContextProvider(Protocol):
         ...
 
 
+class AsyncSessionContextProvider(Protocol):
+    """
+    Async session context provider FastAPI dependency/context manager.
+    """
+
+    def __call__(self) -> AsyncGenerator[AsyncSession, None]:
+        ...
+
+
 class APIFactory(Protocol):
     """
     API factory protocol.
     """
 
-    def __call__(self, *, session_provider: SessionContextProvider) -> APIRouter:
+    def __call__(
+        self,
+        *,
+        session_provider: SessionContextProvider,
+        async_session_provider: AsyncSessionContextProvider | None = None,
+    ) -> APIRouter:
         ...
 
 
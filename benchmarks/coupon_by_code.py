@@ -0,0 +1,69 @@
+"""
+Measures coupon lookups by code against a large coupon table.
+
+Execute with `python -m benchmarks.coupon_by_code`.
+"""
+
+from typing import Callable
+
+import os
+import random
+import tempfile
+import time
+
+from sqlmodel import Session, create_engine
+from typer import Typer
+
+from app_model.coupon.service import CouponService
+
+from .seed import make_code, seed_coupons
+
+
+def measure_lookups_per_second(lookup: Callable[[str], object], codes: list[str]) -> float:
+    """
+    Executes `lookup` for every code and returns the achieved lookups/sec.
+    """
+    start = time.perf_counter()
+    for code in codes:
+        lookup(code)
+    return len(codes) / (time.perf_counter() - start)
+
+
+def create_cli_app() -> Typer:
+    app = Typer()
+
+    @app.command()
+    def run(coupons: int = 10_000_000, lookups: int = 10_000, database_url: str | None = None):
+        """
+        Seeds the database with `coupons` coupons and measures `lookups` random code lookups.
+
+        If no database URL is given, a temporary SQLite database is used. The given
+        database is expected to be empty.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine(database_url or f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+
+            start = time.perf_counter()
+            seed_coupons(engine, coupons)
+            print(f"seeded {coupons} coupons in {time.perf_counter() - start:.1f}s")
+
+            codes = [make_code(random.randrange(coupons)) for _ in range(lookups)]
+
+            with Session(engine) as session:
+                service = CouponService(session)
+                results = {
+                    "get_by_code": measure_lookups_per_second(service.get_by_code, codes),
+                    "status_by_code": measure_lookups_per_second(service.status_by_code, codes),
+                }
+
+            engine.dispose()
+
+        for name, value in results.items():
+            print(f"{name}: {value:.1f} lookups/sec")
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
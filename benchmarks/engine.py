@@ -0,0 +1,80 @@
+"""
+Compares the request throughput of a process-wide, pooled database engine with
+the legacy behavior of creating a new engine for every request.
+
+Execute with `python -m benchmarks.engine`.
+"""
+
+from typing import Callable
+
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.future import Engine
+from typer import Typer
+
+from app.main import create_app, create_database_engine, get_database_engine
+from app.settings import get_settings
+
+
+def measure_requests_per_second(app: FastAPI, url: str, *, requests: int) -> float:
+    """
+    Executes `requests` GET requests sequentially and returns the achieved requests/sec.
+    """
+    with TestClient(app) as client:
+        client.get(url)  # Warm-up.
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = client.get(url)
+            assert response.status_code == 200
+        return requests / (time.perf_counter() - start)
+
+
+def make_per_request_engine_dependency() -> Callable[[], Engine]:
+    """
+    Returns a dependency that creates a new engine for every request, just like the original implementation.
+    """
+    settings = get_settings()
+
+    def get_per_request_engine() -> Engine:
+        return create_database_engine(settings)
+
+    return get_per_request_engine
+
+
+def create_cli_app() -> Typer:
+    app = Typer()
+
+    @app.command()
+    def run(requests: int = 1000, database_url: str | None = None):
+        """
+        Runs the benchmark against a temporary SQLite database or the given database.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.environ["DATABASE_URL"] = database_url or f"sqlite:///{tmp_dir}/benchmark.db"
+            get_settings.cache_clear()
+            url = f"{get_settings().api_prefix}/customer/"
+
+            results: dict[str, float] = {}
+
+            app = create_app()
+            app.dependency_overrides[get_database_engine] = make_per_request_engine_dependency()
+            results["engine-per-request"] = measure_requests_per_second(app, url, requests=requests)
+
+            app = create_app()
+            results["shared-engine"] = measure_requests_per_second(app, url, requests=requests)
+
+        for name, value in results.items():
+            print(f"{name}: {value:.1f} requests/sec")
+
+        print(f"speedup: {results['shared-engine'] / results['engine-per-request']:.2f}x")
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
@@ -0,0 +1,461 @@
+"""
+HTTP API benchmark and load-test suite.
+
+Seeds datasets of the given sizes, starts the application with uvicorn, drives every
+route of the coupon, customer and customer-coupon APIs with concurrent clients, and
+reports p50/p95/p99 latency and throughput per route as JSON.
+
+Execute with `python -m benchmarks.http_api run`, compare two result files with
+`python -m benchmarks.http_api compare <baseline.json> <current.json>`.
+"""
+
+from typing import Any, Callable, Iterator, NamedTuple
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+from sqlmodel import SQLModel, create_engine
+from typer import Typer
+
+from app_model import initialize_database
+
+from .seed import make_code, seed_dataset
+
+State = dict[str, Any]
+"""
+State that is shared by the scenarios of a benchmark run, for example to delete the created items.
+"""
+
+
+class Dataset(NamedTuple):
+    """
+    Describes the seeded dataset.
+    """
+
+    coupons: int
+    customers: int
+    links: int
+
+
+class Scenario(NamedTuple):
+    """
+    Benchmark scenario that calls a single route.
+    """
+
+    name: str
+    method: str
+    make_request: Callable[[int, State], tuple[str, Any]]
+    """Returns the path (relative to the API prefix) and JSON body of the `i`th request."""
+    on_response: Callable[[int, httpx.Response, State], None] | None = None
+    """Optional callback that can record data from the `i`th response in the state."""
+
+
+def make_coupon(code: str) -> dict:
+    """
+    Returns coupon creation data with the given code.
+    """
+    now = datetime.utcnow()
+    return {
+        "code": code,
+        "description": f"Coupon {code}",
+        "discount": 10,
+        "discount_type": "percent",
+        "valid_from": now.isoformat(),
+        "valid_until": (now + timedelta(days=7)).isoformat(),
+    }
+
+
+def record_id(key: str) -> Callable[[int, httpx.Response, State], None]:
+    """
+    Returns an `on_response` callback that records the ID of created items under `key`.
+    """
+
+    def on_response(i: int, response: httpx.Response, state: State) -> None:
+        if response.status_code == 200:
+            state.setdefault(key, {})[i] = response.json()["id"]
+
+    return on_response
+
+
+def get_recorded(state: State, key: str, i: int) -> Any:
+    """
+    Returns the `i`th recorded item under `key`, or `0` (which doesn't exist) if there isn't one.
+    """
+    return state.get(key, {}).get(i, 0)
+
+
+def make_scenarios(dataset: Dataset, run_id: str) -> list[Scenario]:
+    """
+    Returns the benchmark scenarios for the given dataset.
+
+    Write scenarios are ordered so that delete scenarios remove items created earlier in the run.
+
+    Arguments:
+        dataset: The seeded dataset.
+        run_id: Unique, alphanumeric ID that is used to create unique codes and usernames.
+    """
+    coupons, customers, links = dataset
+    bulk_size = 100
+
+    def coupon_id(i: int) -> int:
+        return i % coupons + 1
+
+    def linked_coupon_id(i: int) -> int:
+        return i % max(links, 1) + 1
+
+    def customer_id(i: int) -> int:
+        return i % customers + 1
+
+    return [
+        # -- Coupon API
+        Scenario("coupon.get_all", "GET", lambda i, s: ("/coupon/?limit=100", None)),
+        Scenario("coupon.get_by_id", "GET", lambda i, s: (f"/coupon/{coupon_id(i)}", None)),
+        Scenario("coupon.status", "GET", lambda i, s: (f"/coupon/{coupon_id(i)}/status", None)),
+        Scenario("coupon.get_by_code", "GET", lambda i, s: (f"/coupon/by-code/{make_code(i % coupons)}", None)),
+        Scenario(
+            "coupon.status_by_code", "GET", lambda i, s: (f"/coupon/by-code/{make_code(i % coupons)}/status", None)
+        ),
+        Scenario(
+            "coupon.status_batch",
+            "POST",
+            lambda i, s: (
+                "/coupon/status/batch",
+                {"ids": [coupon_id(i * 20 + j) for j in range(20)], "customer_id": customer_id(i)},
+            ),
+        ),
+        Scenario("coupon.valid", "GET", lambda i, s: (f"/coupon/valid?limit=100&customer_id={customer_id(i)}", None)),
+        Scenario("coupon.status_cache", "GET", lambda i, s: ("/coupon/status/cache", None)),
+        Scenario("coupon.customers", "GET", lambda i, s: (f"/coupon/{linked_coupon_id(i)}/customers", None)),
+        Scenario(
+            "coupon.create",
+            "POST",
+            lambda i, s: ("/coupon/", make_coupon(f"C{run_id}X{i}")),
+            record_id("coupon.create"),
+        ),
+        Scenario("coupon.update", "PUT", lambda i, s: (f"/coupon/{coupon_id(i)}", {"description": f"Updated {i}"})),
+        Scenario(
+            "coupon.bulk_create",
+            "POST",
+            lambda i, s: ("/coupon/bulk", [make_coupon(f"B{run_id}X{i}X{j}") for j in range(bulk_size)]),
+        ),
+        Scenario(
+            "coupon.bulk_update",
+            "PUT",
+            lambda i, s: (
+                "/coupon/bulk",
+                [
+                    {"id": coupon_id(i * bulk_size + j), "data": {"description": f"Bulk {i}"}}
+                    for j in range(bulk_size)
+                ],
+            ),
+        ),
+        Scenario("coupon.delete", "DELETE", lambda i, s: (f"/coupon/{get_recorded(s, 'coupon.create', i)}", None)),
+        # -- Customer API
+        Scenario("customer.get_all", "GET", lambda i, s: ("/customer/?limit=100", None)),
+        Scenario("customer.get_by_id", "GET", lambda i, s: (f"/customer/{customer_id(i)}", None)),
+        Scenario("customer.coupons", "GET", lambda i, s: (f"/customer/{customer_id(i)}/coupons", None)),
+        Scenario(
+            "customer.create",
+            "POST",
+            lambda i, s: ("/customer/", {"name": f"Customer {i}", "username": f"c{run_id}x{i}".lower()}),
+            record_id("customer.create"),
+        ),
+        Scenario("customer.update", "PUT", lambda i, s: (f"/customer/{customer_id(i)}", {"name": f"Updated {i}"})),
+        Scenario(
+            "customer.bulk_create",
+            "POST",
+            lambda i, s: (
+                "/customer/bulk",
+                [{"name": "Bulk", "username": f"b{run_id}x{i}x{j}".lower()} for j in range(bulk_size)],
+            ),
+        ),
+        Scenario(
+            "customer.bulk_update",
+            "PUT",
+            lambda i, s: (
+                "/customer/bulk",
+                [{"id": customer_id(i * bulk_size + j), "data": {"name": f"Bulk {i}"}} for j in range(bulk_size)],
+            ),
+        ),
+        # -- Customer coupon API
+        Scenario("customer_coupon.get_all", "GET", lambda i, s: ("/customer-coupon/?limit=100", None)),
+        Scenario(
+            "customer_coupon.get_by_id",
+            "GET",
+            lambda i, s: (f"/customer-coupon/{(i % max(links, 1)) % customers + 1}/{linked_coupon_id(i)}", None),
+        ),
+        Scenario(
+            "customer_coupon.create",
+            "POST",
+            lambda i, s: (
+                "/customer-coupon/",
+                {"customer_id": get_recorded(s, "customer.create", i), "coupon_id": coupon_id(i)},
+            ),
+        ),
+        Scenario(
+            "customer_coupon.delete",
+            "DELETE",
+            lambda i, s: (f"/customer-coupon/{get_recorded(s, 'customer.create', i)}/{coupon_id(i)}", None),
+        ),
+        Scenario(
+            "customer_coupon.bulk_create",
+            "POST",
+            lambda i, s: (
+                "/customer-coupon/bulk",
+                [
+                    {"customer_id": get_recorded(s, "customer.create", i), "coupon_id": coupon_id(i + j + 1)}
+                    for j in range(bulk_size)
+                ],
+            ),
+        ),
+        Scenario(
+            "customer_coupon.bulk_delete",
+            "DELETE",
+            lambda i, s: (
+                "/customer-coupon/bulk",
+                [
+                    {"customer_id": get_recorded(s, "customer.create", i), "coupon_id": coupon_id(i + j + 1)}
+                    for j in range(bulk_size)
+                ],
+            ),
+        ),
+        Scenario(
+            "customer.delete", "DELETE", lambda i, s: (f"/customer/{get_recorded(s, 'customer.create', i)}", None)
+        ),
+    ]
+
+
+def run_scenario(
+    scenario: Scenario, *, base_url: str, requests: int, concurrency: int, state: State
+) -> dict[str, float | int]:
+    """
+    Executes `requests` requests of the given scenario with `concurrency` concurrent clients.
+
+    Returns:
+        Request count, error count, throughput (requests/sec) and p50/p95/p99 latency (milliseconds).
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies: list[float] = []
+    errors = 0
+
+    def worker() -> None:
+        nonlocal errors
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while True:
+                with lock:
+                    i = next(counter)
+                if i >= requests:
+                    return
+
+                path, body = scenario.make_request(i, state)
+                start = time.perf_counter()
+                response = client.request(scenario.method, path, json=body)
+                elapsed = time.perf_counter() - start
+
+                if scenario.on_response is not None:
+                    scenario.on_response(i, response, state)
+
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code >= 400:
+                        errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    duration = time.perf_counter() - start
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / duration,
+        "p50": percentiles[49] * 1000,
+        "p95": percentiles[94] * 1000,
+        "p99": percentiles[98] * 1000,
+    }
+
+
+def get_free_port() -> int:
+    """
+    Returns a free local TCP port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(database_url: str, *, workers: int) -> Iterator[str]:
+    """
+    Starts the application with uvicorn in a subprocess and yields its base URL once it's ready.
+    """
+    port = get_free_port()
+    env = {**os.environ, "DATABASE_URL": database_url}
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:create_app",
+            "--factory",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env=env,
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                httpx.get(f"{base_url}/openapi.json").raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError("The server failed to start.")
+                time.sleep(0.1)
+
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def get_commit() -> str | None:
+    """
+    Returns the current git commit hash if available.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def create_cli_app() -> Typer:
+    app = Typer()
+
+    @app.command()
+    def run(
+        sizes: str = "10000",
+        requests: int = 500,
+        concurrency: int = 16,
+        workers: int = 1,
+        database_url: str | None = None,
+        scenarios: str | None = None,
+        output: str | None = None,
+    ):
+        """
+        Runs the benchmark for every dataset size (comma-separated number of coupons, for
+        example "10000,1000000,10000000") and prints or saves the results as JSON.
+
+        If no database URL is given, a temporary SQLite database is created for each size.
+        Otherwise the schema of the given database (for example a local PostgreSQL instance)
+        is dropped and recreated for each size. `scenarios` is an optional, comma-separated
+        list of scenario name prefixes to run.
+        """
+        from app.settings import get_settings
+
+        api_prefix = get_settings().api_prefix.rstrip("/")
+        selected = None if scenarios is None else tuple(scenarios.split(","))
+
+        report: dict[str, Any] = {
+            "commit": get_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "database": (database_url or "sqlite").split(":", 1)[0],
+            "concurrency": concurrency,
+            "workers": workers,
+            "requests": requests,
+            "results": {},
+        }
+
+        for size in (int(value) for value in sizes.split(",")):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                url = database_url or f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+                engine = create_engine(url)
+                initialize_database(engine)
+                SQLModel.metadata.drop_all(engine)
+
+                start = time.perf_counter()
+                dataset = Dataset(*seed_dataset(engine, size))
+                engine.dispose()
+                print(f"Seeded {dataset} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+                results: dict[str, Any] = {}
+                state: State = {}
+                with run_server(url, workers=workers) as base_url:
+                    for scenario in make_scenarios(dataset, run_id=f"{size}T{int(time.time())}"):
+                        if selected is not None and not scenario.name.startswith(selected):
+                            continue
+
+                        results[scenario.name] = result = run_scenario(
+                            scenario,
+                            base_url=f"{base_url}{api_prefix}",
+                            requests=requests,
+                            concurrency=concurrency,
+                            state=state,
+                        )
+                        print(
+                            f"{size} {scenario.name}: {result['throughput']:.1f} req/s, "
+                            f"p95 {result['p95']:.1f} ms, {result['errors']} errors",
+                            file=sys.stderr,
+                        )
+
+                report["results"][str(size)] = results
+
+        serialized = json.dumps(report, indent=2)
+        if output is None:
+            print(serialized)
+        else:
+            with open(output, "w") as f:
+                f.write(serialized)
+
+    @app.command()
+    def compare(baseline: str, current: str):
+        """
+        Compares the throughput and p95 latency of two benchmark result files.
+        """
+        with open(baseline) as f:
+            baseline_report = json.load(f)
+        with open(current) as f:
+            current_report = json.load(f)
+
+        print(f"baseline: {baseline_report['commit']}, current: {current_report['commit']}")
+        for size, results in current_report["results"].items():
+            baseline_results = baseline_report["results"].get(size, {})
+            for name, result in results.items():
+                base = baseline_results.get(name)
+                if base is None:
+                    print(f"{size} {name}: no baseline")
+                    continue
+
+                throughput_change = (result["throughput"] / base["throughput"] - 1) * 100
+                p95_change = (result["p95"] / base["p95"] - 1) * 100
+                print(f"{size} {name}: throughput {throughput_change:+.1f}%, p95 {p95_change:+.1f}%")
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
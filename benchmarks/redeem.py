@@ -0,0 +1,85 @@
+"""
+Measures concurrent redemptions of a single, popular coupon.
+
+Execute with `python -m benchmarks.redeem`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+
+from sqlmodel import Session
+from typer import Typer
+
+from app.main import create_database_engine
+from app.settings import Settings
+from app_model import initialize_database
+from app_model.coupon.model import CouponCreate, DiscountType
+from app_model.coupon.service import CouponService, RedemptionFailed
+
+
+def create_cli_app() -> Typer:
+    app = Typer()
+
+    @app.command()
+    def run(requests: int = 5_000, max_uses: int = 1_000, workers: int = 32, database_url: str | None = None):
+        """
+        Executes `requests` concurrent redemptions of a coupon with `max_uses` uses and reports
+        the throughput and whether the coupon was over-redeemed.
+
+        If no database URL is given, a temporary SQLite database is used. The given
+        database is expected to be empty.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            url = database_url or f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+            engine = create_database_engine(Settings(database_url=url, database_pool_size=workers))
+            initialize_database(engine)
+
+            now = datetime.utcnow()
+            with Session(engine) as session:
+                coupon = CouponService(session).create(
+                    CouponCreate(
+                        code="POPULAR",
+                        description="Popular coupon",
+                        discount=10,
+                        discount_type=DiscountType.percent,
+                        valid_from=now - timedelta(days=1),
+                        valid_until=now + timedelta(days=1),
+                        max_uses=max_uses,
+                    )
+                )
+                id = coupon.id
+                assert id is not None
+
+            def redeem(_: int) -> bool:
+                with Session(engine) as session:
+                    try:
+                        CouponService(session).redeem("POPULAR")
+                        return True
+                    except RedemptionFailed:
+                        return False
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                succeeded = sum(executor.map(redeem, range(requests)))
+            elapsed = time.perf_counter() - start
+
+            with Session(engine) as session:
+                redeemed = CouponService(session).get_by_pk(id)
+                uses = None if redeemed is None else redeemed.uses
+
+            engine.dispose()
+
+        print(f"{requests} redemptions in {elapsed:.2f}s ({requests / elapsed:.1f} redemptions/sec)")
+        print(f"succeeded: {succeeded}, uses: {uses}, max uses: {max_uses}")
+        if succeeded != min(requests, max_uses) or uses != succeeded:
+            raise SystemExit("Coupon was over- or under-redeemed.")
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
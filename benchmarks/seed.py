@@ -0,0 +1,99 @@
+"""
+Dataset seeding utilities for the benchmarks.
+"""
+
+from typing import Iterator
+
+from datetime import datetime, timedelta
+
+from sqlalchemy.future import Engine
+
+from app_cli.generate import insert_rows
+from app_model import initialize_database
+from app_model.coupon.model import CouponTable, DiscountType
+from app_model.customer.model import CustomerTable
+from app_model.customer_coupon.model import CustomerCouponTable
+
+
+def make_code(i: int) -> str:
+    """
+    Returns the code of the `i`th seeded coupon.
+    """
+    return f"BENCH{i:08d}"
+
+
+def iter_coupon_rows(count: int) -> Iterator[dict]:
+    """
+    Yields `count` coupon rows. Every second coupon is valid at the time of the call.
+    """
+    now = datetime.utcnow()
+    for i in range(count):
+        valid_from = now - timedelta(days=1) if i % 2 == 0 else now + timedelta(days=1)
+        yield {
+            "code": make_code(i),
+            "description": f"Benchmark coupon {i}",
+            "discount": 5 + i % 20,
+            "discount_type": DiscountType.percent if i % 3 else DiscountType.fix,
+            "valid_from": valid_from,
+            "valid_until": valid_from + timedelta(days=7),
+            "created_at": now,
+        }
+
+
+def iter_customer_rows(count: int) -> Iterator[dict]:
+    """
+    Yields `count` customer rows.
+    """
+    now = datetime.utcnow()
+    for i in range(count):
+        yield {"username": f"bench{i:08d}", "name": f"Benchmark customer {i}", "created_at": now}
+
+
+def iter_link_rows(count: int, *, customers: int, coupons: int) -> Iterator[dict]:
+    """
+    Yields `count` unique customer-coupon links. The first `count` coupons are linked
+    to customers in a round-robin fashion, the remaining coupons stay public.
+    """
+    for i in range(min(count, coupons)):
+        yield {"customer_id": i % customers + 1, "coupon_id": i + 1}
+
+
+def seed_coupons(engine: Engine, count: int, *, batch_size: int = 50_000) -> None:
+    """
+    Creates the database schema and inserts `count` coupons with bulk inserts (`COPY` on PostgreSQL).
+
+    Arguments:
+        engine: The engine of the database to seed.
+        count: The number of coupons to insert.
+        batch_size: The number of rows per insert statement and transaction.
+    """
+    initialize_database(engine)
+    insert_rows(engine, CouponTable, iter_coupon_rows(count), batch_size=batch_size)
+
+
+def seed_dataset(engine: Engine, coupons: int, *, batch_size: int = 50_000) -> tuple[int, int, int]:
+    """
+    Creates the database schema and inserts a dataset with `coupons` coupons,
+    one customer for every 10 coupons and one link for every 10 coupons.
+
+    Arguments:
+        engine: The engine of the database to seed.
+        coupons: The number of coupons to insert.
+        batch_size: The number of rows per insert statement and transaction.
+
+    Returns:
+        The number of coupons, customers and links.
+    """
+    customers = max(coupons // 10, 1)
+    links = coupons // 10
+
+    seed_coupons(engine, coupons, batch_size=batch_size)
+    insert_rows(engine, CustomerTable, iter_customer_rows(customers), batch_size=batch_size)
+    insert_rows(
+        engine,
+        CustomerCouponTable,
+        iter_link_rows(links, customers=customers, coupons=coupons),
+        batch_size=batch_size,
+    )
+
+    return coupons, customers, links
@@ -0,0 +1,62 @@
+"""
+Compares the default (response model) and the fast (row-based) serialization of list routes.
+
+Execute with `python -m benchmarks.serialization`.
+"""
+
+import os
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import create_engine
+from typer import Typer
+
+from app.main import register_routes
+
+from .seed import seed_coupons
+
+
+def create_cli_app() -> Typer:
+    app = Typer()
+
+    @app.command()
+    def run(coupons: int = 10_000, page_size: int = 1000, requests: int = 200):
+        """
+        Seeds a temporary SQLite database with `coupons` coupons and measures `requests` coupon list
+        requests with `page_size` items per page, with and without fast serialization.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine(
+                f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}", connect_args={"check_same_thread": False}
+            )
+            seed_coupons(engine, coupons)
+
+            clients: dict[str, TestClient] = {}
+            for name, fast_serialization in (("default", False), ("fast", True)):
+                api = FastAPI()
+                api.state.database_engine = engine
+                register_routes(api, api_prefix="/api", fast_serialization=fast_serialization)
+                clients[name] = TestClient(api)
+
+            url = f"/api/coupon/?limit={page_size}"
+            contents = {name: client.get(url).content for name, client in clients.items()}
+            if contents["default"] != contents["fast"]:
+                raise SystemExit("The outputs of the default and fast serialization differ.")
+
+            for name, client in clients.items():
+                start = time.perf_counter()
+                for _ in range(requests):
+                    client.get(url)
+                elapsed = time.perf_counter() - start
+                print(f"{name}: {requests / elapsed:.1f} requests/sec, {elapsed / requests * 1000:.2f} ms/request")
+
+            engine.dispose()
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
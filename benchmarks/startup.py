@@ -0,0 +1,119 @@
+"""
+Measures the cold start of application workers: the time from starting a new Python process
+to the response of its first request, broken down into imports, `create_app()`, startup
+(schema initialization) and the first request.
+
+Execute with `python -m benchmarks.startup`.
+"""
+
+from typing import Any
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_worker() -> None:
+    """
+    Starts the application in the current process, executes its first request and prints the
+    timestamps of the phases as JSON. The database is configured with the `DATABASE_URL` variable.
+    """
+    from fastapi.testclient import TestClient
+
+    from app.main import create_app
+
+    imported_at = time.time()
+    app = create_app()
+    created_at = time.time()
+    with TestClient(app) as client:
+        started_at = time.time()
+        client.get("/api/v1/coupon/", params={"limit": 1}).raise_for_status()
+        responded_at = time.time()
+
+    # For comparison: the cost of the DDL check the workers executed on every startup before the schema fingerprint.
+    from sqlmodel import SQLModel
+
+    ddl_start = time.perf_counter()
+    SQLModel.metadata.create_all(app.state.database_engine)
+    ddl_seconds = time.perf_counter() - ddl_start
+
+    print(
+        json.dumps(
+            {
+                "imported_at": imported_at,
+                "created_at": created_at,
+                "started_at": started_at,
+                "responded_at": responded_at,
+                "ddl_seconds": ddl_seconds,
+            }
+        )
+    )
+
+
+def start_worker(database_url: str) -> dict[str, float]:
+    """
+    Starts a worker process and returns the durations of its startup phases in milliseconds.
+    """
+    env = {**os.environ, "DATABASE_URL": database_url, "REDEMPTION_COMPACTION_INTERVAL": "0"}
+    spawned_at = time.time()
+    output = subprocess.check_output(
+        [sys.executable, "-c", "from benchmarks.startup import run_worker; run_worker()"],
+        env=env,
+        text=True,
+    )
+    result: dict[str, Any] = json.loads(output.strip().splitlines()[-1])
+    return {
+        "imports": (result["imported_at"] - spawned_at) * 1000,
+        "create_app": (result["created_at"] - result["imported_at"]) * 1000,
+        "startup": (result["started_at"] - result["created_at"]) * 1000,
+        "first request": (result["responded_at"] - result["started_at"]) * 1000,
+        "time to first request": (result["responded_at"] - spawned_at) * 1000,
+        "skipped DDL check": result["ddl_seconds"] * 1000,
+    }
+
+
+def create_cli_app():
+    # Typer is imported here, so it isn't part of the measured imports of the workers.
+    from typer import Typer
+
+    app = Typer()
+
+    @app.command()
+    def run(workers: int = 4, rounds: int = 3, database_url: str | None = None):
+        """
+        Starts a worker on an uninitialized database, then `rounds` times `workers` workers in parallel
+        (like a uvicorn scale-up) on the initialized database, and prints the median duration of the
+        startup phases per worker. The imports phase includes the start of the interpreter.
+
+        If no database URL is given, a temporary SQLite database is used. The tables of the given
+        database must not exist.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            url = database_url or f"sqlite:///{os.path.join(tmp_dir, 'startup.db')}"
+
+            first = start_worker(url)
+            print("First worker (creates the schema):")
+            for name, value in first.items():
+                if name != "skipped DDL check":
+                    print(f"  {name}: {value:.1f} ms")
+
+            timings: list[dict[str, float]] = []
+            with ThreadPoolExecutor(workers) as executor:
+                for _ in range(rounds):
+                    timings.extend(executor.map(start_worker, [url] * workers))
+
+            print(f"Workers on an initialized database (median of {len(timings)}, {workers} in parallel):")
+            for name in timings[0]:
+                print(f"  {name}: {statistics.median(t[name] for t in timings):.1f} ms")
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
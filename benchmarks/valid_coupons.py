@@ -0,0 +1,143 @@
+"""
+Measures the "currently valid coupons" query against coupon tables of growing size.
+
+Execute with `python -m benchmarks.valid_coupons`.
+"""
+
+from typing import Callable, Iterator
+
+from datetime import datetime, timedelta
+import os
+import tempfile
+import time
+
+from sqlmodel import Session, SQLModel, create_engine
+from typer import Typer
+
+from app_cli.generate import insert_rows
+from app_model import initialize_database
+from app_model.coupon.model import CouponTable, DiscountType
+from app_model.coupon.service import CouponService
+from app_model.customer.model import CustomerTable
+from app_model.customer_coupon.model import CustomerCouponTable
+
+from .seed import iter_customer_rows, make_code
+
+CUSTOMERS = 100
+
+
+def iter_history_rows(count: int, *, now: datetime) -> Iterator[dict]:
+    """
+    Yields `count` coupon rows that were created every 10 minutes until `now` and are valid for a week,
+    so roughly the last 1000 coupons are valid at `now` and all the others are expired.
+    """
+    for i in range(count):
+        valid_from = now - timedelta(minutes=10 * (count - i))
+        yield {
+            "code": make_code(i),
+            "description": f"Benchmark coupon {i}",
+            "discount": 5 + i % 20,
+            "discount_type": DiscountType.percent,
+            "valid_from": valid_from,
+            "valid_until": valid_from + timedelta(days=7),
+            "created_at": now,
+        }
+
+
+def iter_history_link_rows(count: int) -> Iterator[dict]:
+    """
+    Yields links that make every 10th coupon customer-specific.
+    """
+    for i in range(0, count, 10):
+        yield {"customer_id": i % CUSTOMERS + 1, "coupon_id": i + 1}
+
+
+def measure_ms(call: Callable[[], object], repeat: int) -> float:
+    """
+    Executes `call` `repeat` times and returns the average duration in milliseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def create_cli_app() -> Typer:
+    app = Typer()
+
+    @app.command()
+    def run(
+        sizes: str = "10000,100000,1000000",
+        page_size: int = 100,
+        repeat: int = 50,
+        baseline_max_size: int = 100_000,
+        database_url: str | None = None,
+    ):
+        """
+        Seeds coupon tables of the given (comma-separated) sizes with a constant number of currently
+        valid coupons and a growing history of expired ones, and measures valid coupon queries.
+
+        The baseline loads every coupon and filters them in Python, the way clients had to before
+        the `/coupon/valid` route. It is skipped above `baseline_max_size` coupons.
+
+        If no database URL is given, temporary SQLite databases are used. The tables of the given
+        database are dropped after every size.
+        """
+        results: list[tuple[int, dict[str, float]]] = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for size in (int(value) for value in sizes.split(",")):
+                engine = create_engine(database_url or f"sqlite:///{os.path.join(tmp_dir, f'benchmark-{size}.db')}")
+                now = datetime.utcnow()
+                initialize_database(engine)
+                insert_rows(engine, CustomerTable, iter_customer_rows(CUSTOMERS))
+                insert_rows(engine, CouponTable, iter_history_rows(size, now=now))
+                insert_rows(engine, CustomerCouponTable, iter_history_link_rows(size))
+
+                with Session(engine) as session:
+                    service = CouponService(session)
+
+                    def get_all_pages(customer_id: int | None = None) -> int:
+                        count, cursor = 0, None
+                        while True:
+                            items, cursor = service.get_valid_page(
+                                now, customer_id=customer_id, limit=page_size, cursor=cursor
+                            )
+                            count += len(items)
+                            if cursor is None:
+                                return count
+
+                    def filter_all() -> int:
+                        return sum(1 for c in service.get_all() if c.valid_from <= now < c.valid_until)
+
+                    timings = {
+                        "first page": measure_ms(lambda: service.get_valid_page(now, limit=page_size), repeat),
+                        "first page (customer)": measure_ms(
+                            lambda: service.get_valid_page(now, customer_id=1, limit=page_size), repeat
+                        ),
+                        "all pages": measure_ms(get_all_pages, repeat),
+                    }
+                    if size <= baseline_max_size:
+                        timings["python filter (baseline)"] = measure_ms(filter_all, max(repeat // 10, 1))
+
+                    print(f"{size} coupons, {get_all_pages()} valid:")
+                    for name, value in timings.items():
+                        print(f"  {name}: {value:.2f} ms")
+
+                results.append((size, timings))
+                if database_url is not None:
+                    SQLModel.metadata.drop_all(engine)
+                engine.dispose()
+
+        smallest_size, smallest = results[0]
+        for size, timings in results[1:]:
+            ratios = ", ".join(
+                f"{name} x{timings[name] / smallest[name]:.1f}" for name in timings if name in smallest
+            )
+            print(f"{size / smallest_size:.0f}x coupons: {ratios}")
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
@@ -0,0 +1,100 @@
+"""
+Counts the SQL statements and measures the latency of `Service.update()` and `Service.delete_by_pk()`
+with single-statement writes and with the ORM (load, modify, commit, refresh) implementation.
+
+Execute with `python -m benchmarks.write_statements`.
+"""
+
+from typing import Callable
+
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
+from typer import Typer
+
+from app_cli.generate import insert_rows
+from app_model import initialize_database
+from app_model.customer.model import CustomerTable, CustomerUpdate
+from app_model.customer.service import CustomerService
+
+from .seed import iter_customer_rows
+
+
+class ORMCustomerService(CustomerService):
+    __slots__ = ()
+
+    single_statement_writes = False
+
+
+def measure(engine, call: Callable[[int], object], ids: range) -> tuple[float, float]:
+    """
+    Calls `call` with every ID and returns the average number of statements and duration in milliseconds.
+    """
+    statements = 0
+
+    def count_statement(*args) -> None:
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        start = time.perf_counter()
+        for id in ids:
+            call(id)
+        seconds = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    return statements / len(ids), seconds / len(ids) * 1000
+
+
+def create_cli_app() -> Typer:
+    app = Typer()
+
+    @app.command()
+    def run(operations: int = 1000, database_url: str | None = None):
+        """
+        Updates and then deletes `operations` customers with both implementations, each operation in
+        a new session like in a request, and prints the statements and latency per operation.
+
+        If no database URL is given, a temporary SQLite database is used (SQLAlchemy doesn't support
+        `RETURNING` for SQLite, so updates need an extra `SELECT`). The tables of the given database
+        are dropped at the end.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            engine = create_engine(database_url or f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}")
+            initialize_database(engine)
+            insert_rows(engine, CustomerTable, iter_customer_rows(2 * operations))
+
+            for name, service_class, ids in (
+                ("single statement", CustomerService, range(1, operations + 1)),
+                ("ORM", ORMCustomerService, range(operations + 1, 2 * operations + 1)),
+            ):
+
+                def update(id: int) -> None:
+                    with Session(engine) as session:
+                        service_class(session).update(id, CustomerUpdate(name=f"Updated {id}"))
+
+                def delete(id: int) -> None:
+                    with Session(engine) as session:
+                        service_class(session).delete_by_pk(id)
+
+                update_statements, update_ms = measure(engine, update, ids)
+                delete_statements, delete_ms = measure(engine, delete, ids)
+                print(f"{name}:")
+                print(f"  update: {update_statements:.1f} statements, {update_ms:.3f} ms")
+                print(f"  delete: {delete_statements:.1f} statements, {delete_ms:.3f} ms")
+
+            if database_url is not None:
+                SQLModel.metadata.drop_all(engine)
+            engine.dispose()
+
+    return app
+
+
+if __name__ == "__main__":
+    app = create_cli_app()
+    app()
@@ -1,7 +1,9 @@
-from typing import Callable
+from typing import Any, Callable
 
 from fastapi.testclient import TestClient
 
+from app_utils.pagination import encode_cursor
+
 
 class TestAPI:
     __slots__ = ()
@@ -17,6 +19,17 @@ class TestAPI:
         assert isinstance(data, list)
         assert len(data) == 0
 
+    def test_get_all_invalid_cursor(self, client: TestClient, make_url: Callable[[str], str]):
+        url = make_url(self.router_prefix)
+        response = client.get(url, params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+        # Well-formed cursors with values that don't match the type of the key column.
+        cursors: list[list[Any]] = [[{}], [[1]], [None], ["1"], [True]]
+        for values in cursors:
+            response = client.get(url, params={"cursor": encode_cursor(values)})
+            assert response.status_code == 400
+
     def test_get_by_id_missing(self, client: TestClient, make_url: Callable[[str], str]):
         url = make_url(f"{self.router_prefix}/1")
         response = client.get(url)
@@ -0,0 +1,55 @@
+import pytest
+
+from sqlalchemy import func, select
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.pool import StaticPool
+
+from app_cli.generate import Distribution, generate, iter_coupon_rows, iter_customer_rows, iter_link_rows
+from app_model.customer_coupon.model import CustomerCouponTable
+
+
+class TestGenerate:
+    __slots__ = ()
+
+    @pytest.fixture
+    def engine(self):
+        return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @pytest.mark.parametrize("distribution", list(Distribution))
+    def test_generate(self, engine, distribution: Distribution):
+        stats = generate(engine, customers=7, coupons=11, links=50, seed=1, distribution=distribution, batch_size=8)
+        assert [(s.table, s.rows) for s in stats] == [("customer", 7), ("coupon", 11), ("customer_coupon", 50)]
+
+        with engine.connect() as connection:
+            links = connection.execute(select(CustomerCouponTable.customer_id, CustomerCouponTable.coupon_id)).all()
+
+        assert len(set(links)) == 50
+        assert all(1 <= customer_id <= 7 and 1 <= coupon_id <= 11 for customer_id, coupon_id in links)
+
+    def test_not_empty(self, engine):
+        generate(engine, customers=2, coupons=2, links=2)
+        with pytest.raises(ValueError):
+            generate(engine, customers=2, coupons=2, links=2)
+
+        generate(engine, customers=3, coupons=3, links=9, clear=True)
+        with engine.connect() as connection:
+            assert connection.execute(select(func.count()).select_from(CustomerCouponTable)).scalar() == 9
+
+    def test_too_many_links(self, engine):
+        with pytest.raises(ValueError):
+            generate(engine, customers=2, coupons=2, links=5)
+
+    def test_not_null_columns(self):
+        # PostgreSQL databases are loaded with COPY, which only writes the columns of the rows.
+        rows = (
+            ("customer", next(iter_customer_rows(1))),
+            ("coupon", next(iter_coupon_rows(1, seed=1))),
+            (
+                "customer_coupon",
+                next(iter_link_rows(1, customers=1, coupons=1, seed=1, distribution=Distribution.uniform)),
+            ),
+        )
+        for name, row in rows:
+            for column in SQLModel.metadata.tables[name].columns:
+                if not column.nullable and column.server_default is None:
+                    assert column.name in row, f"{name}.{column.name}"
@@ -0,0 +1,364 @@
+from typing import Callable
+
+from datetime import datetime, timedelta
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+
+from app_utils.pagination import encode_cursor
+from tests.api_tester import TestAPI as _TestAPI
+
+ROUTER_PREFIX = "coupon"
+
+
+def make_coupon_data(code: str, *, valid_from: datetime, valid_until: datetime) -> dict:
+    return {
+        "code": code,
+        "description": f"Coupon {code}",
+        "discount": 10,
+        "discount_type": "percent",
+        "valid_from": valid_from.isoformat(),
+        "valid_until": valid_until.isoformat(),
+    }
+
+
+class TestCouponAPI(_TestAPI):
+    __slots__ = ()
+
+    router_prefix = ROUTER_PREFIX
+
+    def test_by_code(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        coupons = {
+            "VALID1": make_coupon_data(
+                "VALID1", valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1)
+            ),
+            "FUTURE1": make_coupon_data(
+                "FUTURE1", valid_from=now + timedelta(days=1), valid_until=now + timedelta(days=2)
+            ),
+        }
+
+        for data in coupons.values():
+            response = client.post(make_url(self.router_prefix), json=data)
+            assert response.status_code == 200
+
+        for code, expected_status in (("VALID1", "valid"), ("FUTURE1", "invalid")):
+            response = client.get(make_url(f"{self.router_prefix}/by-code/{code}"))
+            assert response.status_code == 200
+            assert response.json()["code"] == code
+
+            response = client.get(make_url(f"{self.router_prefix}/by-code/{code}/status"))
+            assert response.status_code == 200
+            assert response.json() == {"status": expected_status}
+
+        response = client.get(make_url(f"{self.router_prefix}/by-code/MISSING1"))
+        assert response.status_code == 404
+
+        response = client.get(make_url(f"{self.router_prefix}/by-code/MISSING1/status"))
+        assert response.status_code == 404
+
+    def test_status_cache_invalidation(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        data = make_coupon_data("CACHED1", valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1))
+        response = client.post(make_url(self.router_prefix), json=data)
+        assert response.status_code == 200
+        id = response.json()["id"]
+
+        status_url = make_url(f"{self.router_prefix}/{id}/status")
+        for _ in range(2):
+            response = client.get(status_url)
+            assert response.status_code == 200
+            assert response.json() == {"status": "valid"}
+
+        response = client.get(make_url(f"{self.router_prefix}/status/cache"))
+        assert response.status_code == 200
+        stats = response.json()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+        response = client.put(
+            make_url(f"{self.router_prefix}/{id}"), json={"valid_until": (now - timedelta(hours=1)).isoformat()}
+        )
+        assert response.status_code == 200
+
+        response = client.get(status_url)
+        assert response.status_code == 200
+        assert response.json() == {"status": "invalid"}
+
+        response = client.delete(make_url(f"{self.router_prefix}/{id}"))
+        assert response.status_code == 200
+
+        response = client.get(status_url)
+        assert response.status_code == 404
+
+    def test_status_batch(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        valid = {"valid_from": now - timedelta(days=1), "valid_until": now + timedelta(days=1)}
+        future = {"valid_from": now + timedelta(days=1), "valid_until": now + timedelta(days=2)}
+        for code, window in (("PUBLIC1", valid), ("LINKED1", valid), ("FUTURE1", future)):
+            response = client.post(make_url(self.router_prefix), json=make_coupon_data(code, **window))
+            assert response.status_code == 200
+
+        response = client.post(make_url("customer-coupon"), json={"customer_id": 1, "coupon_id": 2})
+        assert response.status_code == 200
+
+        url = make_url(f"{self.router_prefix}/status/batch")
+        payload = {"ids": [1, 2, 3, 42], "codes": ["LINKED1", "MISSING1"]}
+
+        response = client.post(url, json=payload)
+        assert response.status_code == 200
+        assert [item["status"] for item in response.json()] == ["valid", "valid", "invalid", None, "valid", None]
+
+        for customer_id, linked_status in ((1, "valid"), (2, "invalid")):
+            response = client.post(url, json={**payload, "customer_id": customer_id})
+            assert response.status_code == 200
+            assert [item["status"] for item in response.json()] == [
+                "valid",
+                linked_status,
+                "invalid",
+                None,
+                linked_status,
+                None,
+            ]
+
+        response = client.post(url, json={"ids": list(range(1000))})
+        assert response.status_code == 422
+
+    def test_redeem(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        valid = {"valid_from": now - timedelta(days=1), "valid_until": now + timedelta(days=1)}
+        future = {"valid_from": now + timedelta(days=1), "valid_until": now + timedelta(days=2)}
+        for code, window, max_uses in (("PUBLIC1", valid, 2), ("LINKED1", valid, None), ("FUTURE1", future, None)):
+            data = {**make_coupon_data(code, **window), "max_uses": max_uses}
+            response = client.post(make_url(self.router_prefix), json=data)
+            assert response.status_code == 200
+
+        response = client.post(make_url("customer-coupon"), json={"customer_id": 1, "coupon_id": 2})
+        assert response.status_code == 200
+
+        def redeem(code: str, customer_id: int | None = None):
+            return client.post(
+                make_url(f"{self.router_prefix}/by-code/{code}/redeem"), json={"customer_id": customer_id}
+            )
+
+        for expected_uses in (1, 2):
+            response = redeem("PUBLIC1")
+            assert response.status_code == 200
+            assert response.json()["uses"] == expected_uses
+
+        for code, customer_id, expected_status, expected_detail in (
+            ("PUBLIC1", None, 409, "exhausted"),
+            ("LINKED1", None, 409, "not_eligible"),
+            ("LINKED1", 2, 409, "not_eligible"),
+            ("LINKED1", 1, 200, None),
+            ("LINKED1", 1, 409, "already_redeemed"),
+            ("FUTURE1", None, 409, "invalid"),
+            ("MISSING1", None, 404, "Coupon not found."),
+        ):
+            response = redeem(code, customer_id)
+            assert response.status_code == expected_status
+            if expected_detail is not None:
+                assert response.json()["detail"] == expected_detail
+
+        response = client.get(make_url("customer-coupon/1/2"))
+        assert response.status_code == 200
+        assert response.json()["redeemed_at"] is not None
+
+        # Only limited coupons count their uses, see the redemption stats of unlimited coupons.
+        response = client.get(make_url(f"{self.router_prefix}/2"))
+        assert response.status_code == 200
+        assert response.json()["uses"] is None
+
+        response = client.get(make_url(f"{self.router_prefix}/1/redemptions"), params={"limit": 1})
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        assert response.headers["link"]
+
+        response = client.get(make_url(f"{self.router_prefix}/2/redemptions"))
+        assert response.status_code == 200
+        assert [(item["coupon_id"], item["customer_id"]) for item in response.json()] == [(2, 1)]
+
+        response = client.get(make_url(f"{self.router_prefix}/1/redemptions/stats"))
+        assert response.status_code == 200
+        assert response.json() == {"coupon_id": 1, "count": 0, "pending": 2, "compacted_at": None}
+
+        response = client.get(make_url(f"{self.router_prefix}/42/redemptions/stats"))
+        assert response.status_code == 404
+
+    def test_redeem_changes_version(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        data = make_coupon_data("PUBLIC1", valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1))
+        response = client.post(make_url(self.router_prefix), json={**data, "max_uses": 2})
+        assert response.status_code == 200
+
+        id_url = make_url(f"{self.router_prefix}/1")
+        etag = client.get(id_url).headers["ETag"]
+
+        response = client.post(make_url(f"{self.router_prefix}/by-code/PUBLIC1/redeem"), json={})
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
+
+        assert client.get(id_url, headers={"If-None-Match": etag}).status_code == 200
+        response = client.put(id_url, json={"description": "Updated"}, headers={"If-Match": etag})
+        assert response.status_code == 412
+
+        response = client.put(id_url, json={"description": "Updated"}, headers={"If-Match": '"2"'})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"3"'
+
+    def test_bulk_delete_linked(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        for code in ("LINKED1", "PUBLIC1"):
+            data = make_coupon_data(code, valid_from=now, valid_until=now + timedelta(days=1))
+            response = client.post(make_url(self.router_prefix), json=data)
+            assert response.status_code == 200
+
+        response = client.post(make_url("customer"), json={"name": "Customer", "username": "customer"})
+        assert response.status_code == 200
+        response = client.post(make_url("customer-coupon"), json={"customer_id": 1, "coupon_id": 1})
+        assert response.status_code == 200
+
+        response = client.request("DELETE", make_url(f"{self.router_prefix}/bulk"), json=[1, 2])
+        assert response.status_code == 200
+        assert response.json() == {"succeeded": 2, "errors": []}
+
+        # The links of the deleted coupons are deleted with them.
+        response = client.get(make_url("customer-coupon/1/1"))
+        assert response.status_code == 404
+        response = client.get(make_url("customer-coupon/"))
+        assert response.json() == []
+
+    def test_relation_invalid_cursor(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        data = make_coupon_data("CODE1", valid_from=now, valid_until=now + timedelta(days=1))
+        response = client.post(make_url(self.router_prefix), json=data)
+        assert response.status_code == 200
+
+        for url, values in (
+            (make_url(f"{self.router_prefix}/1/customers"), [{}]),
+            (make_url(f"{self.router_prefix}/1/customers"), [None]),
+            (make_url("customer-coupon/"), [1, [1]]),
+            (make_url("customer-coupon/"), [None, 1]),
+            (make_url("customer-coupon/"), [1, {}]),
+        ):
+            response = client.get(url, params={"cursor": encode_cursor(values)})
+            assert response.status_code == 400
+
+    def test_export(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        for i in range(6):
+            data = make_coupon_data(
+                f"EXPORT{i}", valid_from=now + timedelta(days=i), valid_until=now + timedelta(days=10)
+            )
+            response = client.post(make_url(self.router_prefix), json=data)
+            assert response.status_code == 200
+
+        expected = client.get(make_url(self.router_prefix)).json()
+
+        response = client.get(make_url(f"{self.router_prefix}/export"))
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+        params = {
+            "format": "csv",
+            "valid_from_min": (now + timedelta(days=1)).isoformat(),
+            "valid_from_max": (now + timedelta(days=3)).isoformat(),
+        }
+        response = client.get(make_url(f"{self.router_prefix}/export"), params=params)
+        assert response.status_code == 200
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["code"] for row in rows] == ["EXPORT1", "EXPORT2", "EXPORT3"]
+        assert rows[0]["valid_from"] == expected[1]["valid_from"]
+        assert rows[0]["max_uses"] == ""
+        assert rows[0]["uses"] == ""
+
+        response = client.get(make_url(f"{self.router_prefix}/export"), params={"valid_until_max": now.isoformat()})
+        assert response.status_code == 200
+        assert response.text == ""
+
+    def test_import(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        valid = make_coupon_data("IMPORT1", valid_from=now, valid_until=now + timedelta(days=1))
+        lines = [
+            json.dumps(valid),
+            "",
+            json.dumps({**valid, "code": "IMPORT2", "max_uses": 5}),
+            json.dumps({**valid, "code": "bad code", "discount": 0}),
+            "not json",
+            json.dumps({**valid, "code": "IMPORT3", "valid_until": valid["valid_from"]}),
+            json.dumps(valid),
+        ]
+        response = client.post(
+            make_url(f"{self.router_prefix}/import"),
+            files={"file": ("coupons.ndjson", "\n".join(lines).encode())},
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["imported"] == 2
+        assert result["rejected"] == 4
+        assert [error["line"] for error in result["errors"]] == [4, 5, 6, 7]
+        assert "code:" in result["errors"][0]["detail"] and "discount:" in result["errors"][0]["detail"]
+        assert "valid_from" in result["errors"][2]["detail"]
+
+        response = client.get(make_url(f"{self.router_prefix}/by-code/IMPORT2"))
+        assert response.status_code == 200
+        assert response.json()["max_uses"] == 5
+        assert response.json()["uses"] == 0
+
+        # Exported coupons can be imported again, duplicate codes are rejected by the database.
+        exported = client.get(make_url(f"{self.router_prefix}/export"), params={"format": "csv"}).text
+        exported += f"IMPORT4,Imported,1.5,fix,{valid['valid_from']},{valid['valid_until']},,,,\r\n"
+        response = client.post(
+            make_url(f"{self.router_prefix}/import"),
+            params={"format": "csv"},
+            files={"file": ("coupons.csv", exported.encode())},
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert result["imported"] == 1
+        assert [error["line"] for error in result["errors"]] == [2, 3]
+
+        response = client.get(make_url(f"{self.router_prefix}/by-code/IMPORT4"))
+        assert response.status_code == 200
+        assert response.json()["discount"] == 1.5
+        assert response.json()["max_uses"] is None
+
+    def test_get_valid(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        for code, valid_from, valid_until in (
+            ("EXPIRED1", now - timedelta(days=3), now - timedelta(days=1)),
+            ("VALID3", now - timedelta(days=1), now + timedelta(days=3)),
+            ("VALID1", now - timedelta(days=2), now + timedelta(days=1)),
+            ("LINKED2", now - timedelta(days=1), now + timedelta(days=2)),
+            ("FUTURE1", now + timedelta(days=1), now + timedelta(days=4)),
+        ):
+            data = make_coupon_data(code, valid_from=valid_from, valid_until=valid_until)
+            response = client.post(make_url(self.router_prefix), json=data)
+            assert response.status_code == 200
+
+        response = client.post(make_url("customer-coupon"), json={"customer_id": 1, "coupon_id": 4})
+        assert response.status_code == 200
+
+        def get_codes(**params) -> list[str]:
+            codes: list[str] = []
+            url: str | None = make_url(f"{self.router_prefix}/valid")
+            while url is not None:
+                response = client.get(url, params=params)
+                assert response.status_code == 200
+                codes.extend(item["code"] for item in response.json())
+                url, params = response.links.get("next", {}).get("url"), {}
+
+            return codes
+
+        assert get_codes() == ["VALID1", "LINKED2", "VALID3"]
+        assert get_codes(limit=1) == ["VALID1", "LINKED2", "VALID3"]
+        assert get_codes(limit=2, customer_id=1) == ["VALID1", "LINKED2", "VALID3"]
+        assert get_codes(limit=1, customer_id=2) == ["VALID1", "VALID3"]
+        assert get_codes(at=(now + timedelta(days=2, hours=12)).isoformat()) == ["VALID3", "FUTURE1"]
+        assert get_codes(at=(now - timedelta(days=2, hours=12)).isoformat()) == ["EXPIRED1"]
+
+        response = client.get(make_url(f"{self.router_prefix}/valid"), params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+import io
+import json
+
+import pytest
+
+from sqlalchemy import func
+from sqlalchemy import select as sa_select
+from sqlmodel import Session, create_engine, select
+
+from app_model import initialize_database
+from app_model.coupon.importer import CouponBatchValidator, import_coupons, iter_records
+from app_model.coupon.model import CouponTable
+from app_utils.serialization import FileFormat, iter_text_lines
+
+
+def make_line(code: str, **overrides) -> str:
+    now = datetime.utcnow()
+    return json.dumps(
+        {
+            "code": code,
+            "description": f"Coupon {code}",
+            "discount": 10,
+            "discount_type": "percent",
+            "valid_from": now.isoformat(),
+            "valid_until": (now + timedelta(days=1)).isoformat(),
+            **overrides,
+        }
+    )
+
+
+class UploadedFile:
+    """
+    Binary file that only supports iteration, like `SpooledTemporaryFile` before Python 3.11 (no `readable()`).
+    """
+
+    __slots__ = ("_file",)
+
+    def __init__(self, content: bytes) -> None:
+        self._file = io.BytesIO(content)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+def test_iter_records_csv():
+    lines = io.StringIO('code,discount,max_uses\r\nA,1,\r\n"multi\nline",2,3\r\nC,3,\r\n', newline="")
+    assert list(iter_records(lines, FileFormat.csv)) == [
+        (2, {"code": "A", "discount": "1"}),
+        (4, {"code": "multi\nline", "discount": "2", "max_uses": "3"}),
+        (5, {"code": "C", "discount": "3"}),
+    ]
+
+
+def test_validator():
+    validator = CouponBatchValidator()
+    records = [
+        (1, json.loads(make_line("GOOD1", max_uses="3"))),
+        (2, json.loads(make_line("bad", discount=-1, discount_type="other"))),
+        (3, json.loads(make_line("GOOD2", valid_from="2024-01-01T10:00:00Z"))),
+        (4, json.loads(make_line("GOOD3", max_uses=1.5, description=None))),
+        (5, json.loads(make_line("GOOD4", valid_from="2024-01-01T10:00:00+02:00"))),
+    ]
+    lines, rows, rejections = validator.validate(records)
+
+    assert lines == [1, 3]
+    assert rows[0]["max_uses"] == 3
+    assert rows[1]["valid_from"] == datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    assert rows[1]["max_uses"] is None
+    assert [rejection.line for rejection in rejections] == [2, 4, 5]
+    assert [detail.split(":")[0] for detail in rejections[0].detail.split("; ")] == [
+        "code",
+        "discount",
+        "discount_type",
+    ]
+    assert [detail.split(":")[0] for detail in rejections[1].detail.split("; ")] == ["description", "max_uses"]
+
+
+@pytest.mark.parametrize("workers", (1, 3))
+def test_import_coupons(tmp_path, workers: int):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}", connect_args={"check_same_thread": False})
+    initialize_database(engine)
+
+    lines = [make_line(f"IMPORT{i}") for i in range(1, 101)]
+    lines[4] = make_line("IMPORT1")  # Duplicate code in the same batch, rejected by the database.
+    lines[49] = make_line("IMPORT50", discount=0)  # Invalid row.
+
+    try:
+        with Session(engine) as session:
+            result = import_coupons(session, iter(lines), format=FileFormat.ndjson, batch_size=7, workers=workers)
+            count = session.execute(sa_select(func.count()).select_from(CouponTable)).scalar_one()
+    finally:
+        engine.dispose()
+
+    assert result.imported == 98
+    assert result.rejected == 2
+    assert [error.line for error in result.errors] == [5, 50]
+    assert count == 98
+
+
+def test_import_uploaded_file(session: Session):
+    now = datetime.utcnow()
+    content = (
+        "code,description,discount,discount_type,valid_from,valid_until\r\n"
+        f'UPLOAD1,"Kupon – ünïcode\r\nline",5,fix,{now.isoformat()},{(now + timedelta(days=1)).isoformat()}\r\n'
+    )
+    result = import_coupons(session, iter_text_lines(UploadedFile(content.encode())), format=FileFormat.csv)
+    assert (result.imported, result.rejected) == (1, 0)
+
+    coupon = session.exec(select(CouponTable)).one()
+    assert coupon.description == "Kupon – ünïcode\r\nline"
+
+    with pytest.raises(UnicodeDecodeError):
+        list(iter_text_lines(UploadedFile("ünïcode\n".encode("latin-1"))))
+
+
+def test_import_max_errors(session: Session):
+    lines = ["not json"] * 10 + [make_line("VALID1")] + [make_line("VALID1")] * 5
+    result = import_coupons(session, iter(lines), format=FileFormat.ndjson, batch_size=2, workers=1, max_errors=3)
+    assert (result.imported, result.rejected) == (1, 15)
+    assert [error.line for error in result.errors] == [1, 2, 3]
+
+    result = import_coupons(session, iter(lines[10:]), format=FileFormat.ndjson, batch_size=4, max_errors=2)
+    assert (result.imported, result.rejected) == (0, 6)
+    assert [error.line for error in result.errors] == [1, 2]
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import time
+
+import pytest
+
+from sqlmodel import Session, create_engine
+
+from app_model import initialize_database
+from app_model.coupon.model import CouponCreate, DiscountType
+from app_model.coupon.service import CouponService, RedemptionFailed
+from app_model.coupon_redemption.service import CouponRedemptionService
+from app_model.customer.model import CustomerCreate
+from app_model.customer.service import CustomerService
+from app_model.customer_coupon.model import CustomerCouponCreate
+from app_model.customer_coupon.service import CustomerCouponService
+
+
+class TestCouponRedemption:
+    __slots__ = ()
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'redeem.db'}", connect_args={"check_same_thread": False})
+        initialize_database(engine)
+        yield engine
+        engine.dispose()
+
+    def _create_coupon(self, engine, code: str, *, max_uses: int | None = None) -> int:
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            coupon = CouponService(session).create(
+                CouponCreate(
+                    code=code,
+                    description=code,
+                    discount=10,
+                    discount_type=DiscountType.percent,
+                    valid_from=now - timedelta(days=1),
+                    valid_until=now + timedelta(days=1),
+                    max_uses=max_uses,
+                )
+            )
+            assert coupon.id is not None
+            return coupon.id
+
+    def _redeem_concurrently(self, engine, code: str, customer_ids: list[int | None], *, workers: int = 16) -> int:
+        def redeem(customer_id: int | None) -> bool:
+            with Session(engine) as session:
+                try:
+                    CouponService(session).redeem(code, customer_id=customer_id)
+                    return True
+                except RedemptionFailed:
+                    return False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            succeeded = sum(executor.map(redeem, customer_ids))
+
+        elapsed = time.perf_counter() - start
+        print(f"{code}: {len(customer_ids)} redemptions in {elapsed:.2f}s ({len(customer_ids) / elapsed:.0f}/sec)")
+        return succeeded
+
+    def test_max_uses_under_contention(self, engine):
+        id = self._create_coupon(engine, "POPULAR1", max_uses=50)
+
+        assert self._redeem_concurrently(engine, "POPULAR1", [None] * 400) == 50
+
+        with Session(engine) as session:
+            coupon = CouponService(session).get_by_pk(id)
+            assert coupon is not None and coupon.uses == 50
+            assert CouponRedemptionService(session).stats(id).pending == 50
+
+    def test_single_use_per_customer_under_contention(self, engine):
+        id = self._create_coupon(engine, "LINKED1")
+        with Session(engine) as session:
+            for i in range(10):
+                customer = CustomerService(session).create(CustomerCreate(name="Customer", username=f"customer{i}"))
+                assert customer.id is not None
+                CustomerCouponService(session).create(CustomerCouponCreate(customer_id=customer.id, coupon_id=id))
+
+        assert self._redeem_concurrently(engine, "LINKED1", [i % 10 + 1 for i in range(300)]) == 10
+
+        with Session(engine) as session:
+            coupon = CouponService(session).get_by_pk(id)
+            assert coupon is not None and coupon.uses == 0  # Only limited coupons count their uses.
+
+            redemptions, _ = CouponRedemptionService(session).get_page_by_coupon(id, limit=100)
+            assert len(redemptions) == 10
+            assert {r.customer_id for r in redemptions} == set(range(1, 11))
+
+
+class TestCouponExport:
+    __slots__ = ()
+
+    def test_filters_with_offset(self, session: Session):
+        now = datetime.utcnow().replace(microsecond=0)
+        service = CouponService(session)
+        for i in range(5):
+            service.create(
+                CouponCreate(
+                    code=f"EXPORT{i}",
+                    description=f"Coupon {i}",
+                    discount=10,
+                    discount_type=DiscountType.fix,
+                    valid_from=now + timedelta(days=i),
+                    valid_until=now + timedelta(days=10),
+                )
+            )
+
+        # The filters are the same instants as the stored UTC values, in another timezone.
+        tz = timezone(timedelta(hours=-5))
+        rows = service.iter_export(
+            ["code"],
+            valid_from_min=(now + timedelta(days=1)).replace(tzinfo=timezone.utc).astimezone(tz),
+            valid_from_max=(now + timedelta(days=3)).replace(tzinfo=timezone.utc).astimezone(tz),
+        )
+        assert [row.code for row in rows] == ["EXPORT1", "EXPORT2", "EXPORT3"]
@@ -0,0 +1,150 @@
+from typing import Generator
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sqlmodel import Session, create_engine
+
+from app_model import initialize_database
+from app_model.coupon.model import CouponCreate, CouponTable, CouponUpdate, DiscountType
+from app_model.coupon.service import CouponService
+from app_model.coupon.sharding import ShardedCouponService
+from app_utils.service import NotFound
+from app_utils.sharding import (
+    SHARD_ID_BITS,
+    ShardedService,
+    ShardSet,
+    get_shard,
+    make_sharded_id,
+    split_sharded_id,
+)
+
+
+@pytest.fixture(name="shards")
+def shards_fixture(tmp_path) -> Generator[ShardSet, None, None]:
+    engines = [
+        create_engine(f"sqlite:///{tmp_path / f'shard{i}.db'}", connect_args={"check_same_thread": False})
+        for i in range(3)
+    ]
+    for engine in engines:
+        initialize_database(engine)
+
+    shards = ShardSet(engines)
+    yield shards
+    shards.close()
+
+
+def make_coupon(code: str, *, valid_from: datetime, valid_until: datetime) -> CouponCreate:
+    return CouponCreate(
+        code=code,
+        description=f"Coupon {code}",
+        discount=10,
+        discount_type=DiscountType.fix,
+        valid_from=valid_from,
+        valid_until=valid_until,
+        max_uses=1,
+    )
+
+
+def get_id(item: CouponTable) -> int:
+    assert item.id is not None
+    return item.id
+
+
+class TestSharding:
+    __slots__ = ()
+
+    def test_sharded_id(self):
+        id = make_sharded_id(3, 42)
+        assert id == (3 << SHARD_ID_BITS) + 42
+        assert split_sharded_id(id) == (3, 42)
+        assert split_sharded_id(42) == (0, 42)
+        assert get_shard("ABCD1", 3) == get_shard("ABCD1", 3)
+
+    def test_abstract_sharded_service(self):
+        class IncompleteService(ShardedService[CouponService, CouponTable, CouponCreate, CouponUpdate]):
+            __slots__ = ()
+
+            def _make_service(self, session: Session) -> CouponService:
+                return CouponService(session)
+
+        # Subclasses that don't implement every abstract method can not be instantiated.
+        assert ShardedService.__abstractmethods__ == frozenset({"_get_shard_key", "_make_service"})
+        assert IncompleteService.__abstractmethods__ == frozenset({"_get_shard_key"})
+        assert not ShardedCouponService.__abstractmethods__
+
+    def test_sharded_coupon_service(self, shards: ShardSet):
+        now = datetime.utcnow()
+        with shards.sessions() as sessions:
+            service = ShardedCouponService(shards, sessions)
+
+            created = [
+                service.create(
+                    make_coupon(
+                        f"CODE{i}",
+                        valid_from=now - timedelta(days=1),
+                        # Some coupons share the same validity window.
+                        valid_until=now + timedelta(days=i % 4 + 1) if i < 18 else now - timedelta(hours=1),
+                    )
+                )
+                for i in range(20)
+            ]
+
+            # Coupons are distributed by the hash of their code, the shard is encoded in the ID.
+            assert {split_sharded_id(get_id(item))[0] for item in created} == {0, 1, 2}
+            for item in created:
+                assert split_sharded_id(get_id(item))[0] == get_shard(item.code, 3)
+
+            # -- Point lookups
+
+            coupon = created[5]
+            assert coupon.id is not None
+            by_pk, by_code = service.get_by_pk(coupon.id), service.get_by_code(coupon.code)
+            assert by_pk is not None and by_pk.code == coupon.code
+            assert by_code is not None and by_code.id == coupon.id
+            assert service.get_by_code("MISSING") is None
+            assert service.get_by_pk(make_sharded_id(7, 1)) is None
+
+            updated = service.update(coupon.id, CouponUpdate(description="Updated"))
+            assert (updated.id, updated.description, updated.version) == (coupon.id, "Updated", 2)
+
+            redeemed = service.redeem(coupon.code)
+            assert (redeemed.id, redeemed.uses) == (coupon.id, 1)
+
+            # -- Fan-out queries
+
+            ids = sorted(get_id(item) for item in created)
+            assert [item.id for item in service.get_all()] == ids
+
+            paged: list[int] = []
+            cursor = None
+            while True:
+                items, cursor = service.get_page(limit=3, cursor=cursor)
+                paged.extend(get_id(item) for item in items)
+                if cursor is None:
+                    break
+            assert paged == ids
+
+            expected = sorted(
+                # The returned coupons have UTC datetimes.
+                (item for item in created if item.valid_until > now.replace(tzinfo=timezone.utc)),
+                key=lambda item: (item.valid_until, item.valid_from, item.id),
+            )
+            valid: list[int] = []
+            cursor = None
+            while True:
+                items, cursor = service.get_valid_page(now, limit=4, cursor=cursor)
+                valid.extend(get_id(item) for item in items)
+                if cursor is None:
+                    break
+            assert valid == [item.id for item in expected]
+
+            # -- Delete
+
+            service.delete_by_pk(coupon.id)
+            assert service.get_by_pk(coupon.id) is None
+            with pytest.raises(NotFound):
+                service.delete_by_pk(coupon.id)
+            with pytest.raises(NotFound):
+                service.update(make_sharded_id(7, 1), CouponUpdate(description="Missing"))
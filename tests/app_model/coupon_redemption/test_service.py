@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlmodel import Session
+
+from app_model.coupon.model import CouponCreate, DiscountType
+from app_model.coupon.service import CouponService
+from app_model.coupon_redemption.model import CouponRedemptionTable
+from app_model.coupon_redemption.service import CouponRedemptionService
+from app_utils.service import NotFound
+
+
+class TestCouponRedemptionService:
+    __slots__ = ()
+
+    def _create_coupons(self, session: Session, *codes: str) -> list[int]:
+        now = datetime.utcnow()
+        service = CouponService(session)
+        ids = []
+        for code in codes:
+            coupon = service.create(
+                CouponCreate(
+                    code=code,
+                    description=code,
+                    discount=10,
+                    discount_type=DiscountType.fix,
+                    valid_from=now - timedelta(days=1),
+                    valid_until=now + timedelta(days=1),
+                )
+            )
+            assert coupon.id is not None
+            ids.append(coupon.id)
+
+        return ids
+
+    def test_compaction(self, session: Session):
+        first, second = self._create_coupons(session, "FIRST1", "SECOND1")
+        coupon_service = CouponService(session)
+        service = CouponRedemptionService(session)
+
+        for code in ("FIRST1", "FIRST1", "SECOND1"):
+            coupon_service.redeem(code)
+
+        assert service.stats(first).count == 0
+        assert service.stats(first).pending == 2
+
+        result = service.compact(settle_seconds=0)
+        assert (result.coupons, result.redemptions, result.watermark) == (2, 3, 3)
+
+        stats = service.stats(first)
+        assert (stats.count, stats.pending) == (2, 0)
+        assert stats.compacted_at is not None
+
+        coupon_service.redeem("FIRST1")
+        assert (service.stats(first).count, service.stats(first).pending) == (2, 1)
+
+        result = service.compact(settle_seconds=0)
+        assert (result.coupons, result.redemptions, result.watermark) == (1, 1, 4)
+        assert (service.stats(first).count, service.stats(first).pending) == (3, 0)
+        assert (service.stats(second).count, service.stats(second).pending) == (1, 0)
+
+        result = service.compact(settle_seconds=0)
+        assert (result.coupons, result.redemptions, result.watermark) == (0, 0, 4)
+
+    def test_compaction_settle_time(self, session: Session):
+        (id,) = self._create_coupons(session, "FRESH1")
+        CouponService(session).redeem("FRESH1")
+
+        service = CouponRedemptionService(session)
+        assert service.compact(settle_seconds=60).redemptions == 0
+        assert service.stats(id).pending == 1
+
+    def test_out_of_order_compaction(self, session: Session):
+        (id,) = self._create_coupons(session, "LATE1")
+        service = CouponRedemptionService(session)
+        redeemed_at = datetime.utcnow() - timedelta(hours=1)
+
+        session.add(CouponRedemptionTable(id=10, coupon_id=id, redeemed_at=redeemed_at))
+        session.commit()
+        assert service.compact(settle_seconds=0).watermark == 10
+
+        # A redemption that committed after the compaction with a lower ID and an old timestamp.
+        session.add(CouponRedemptionTable(id=5, coupon_id=id, redeemed_at=redeemed_at))
+        session.commit()
+        assert service.stats(id).pending == 1
+
+        result = service.compact(settle_seconds=60)
+        assert (result.coupons, result.redemptions, result.watermark) == (1, 1, 10)
+        assert (service.stats(id).count, service.stats(id).pending) == (2, 0)
+
+    def test_compaction_batches(self, session: Session):
+        first, second = self._create_coupons(session, "BATCH1", "BATCH2")
+        for code in ("BATCH1", "BATCH2", "BATCH1", "BATCH1", "BATCH2"):
+            CouponService(session).redeem(code)
+
+        service = CouponRedemptionService(session)
+        result = service.compact(settle_seconds=0, batch_size=2)
+        assert (result.coupons, result.redemptions, result.watermark) == (2, 5, 5)
+        assert service.stats(first).count == 3
+        assert service.stats(second).count == 2
+
+    def test_overlapping_compaction(self, session: Session):
+        (id,) = self._create_coupons(session, "OVERLAP1")
+        CouponService(session).redeem("OVERLAP1")
+
+        service = CouponRedemptionService(session)
+        service.compact(settle_seconds=0)
+
+        # A run that selected the same redemptions can not flag them again.
+        with pytest.raises(ValueError):
+            service._mark_compacted([1])
+        session.rollback()
+
+        assert service.stats(id).count == 1
+
+    def test_paging(self, session: Session):
+        (id,) = self._create_coupons(session, "PAGED1")
+        for _ in range(5):
+            CouponService(session).redeem("PAGED1")
+
+        service = CouponRedemptionService(session)
+        items, cursor = service.get_page_by_coupon(id, limit=3)
+        assert [item.id for item in items] == [1, 2, 3]
+        assert cursor is not None
+
+        items, cursor = service.get_page_by_coupon(id, limit=3, cursor=cursor)
+        assert [item.id for item in items] == [4, 5]
+        assert cursor is None
+
+        with pytest.raises(NotFound):
+            service.get_page_by_coupon(42, limit=3)
+
+        with pytest.raises(NotFound):
+            service.stats(42)
@@ -1,6 +1,9 @@
 from typing import Any, Callable
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+import csv
+import io
+import json
 
 from fastapi.testclient import TestClient
 
@@ -29,6 +32,15 @@ class TestCustomerAPI(_TestAPI):
             response = client.post(url, json=data)
             assert response.status_code == 422, f"Data name: {name}"
 
+    def test_create_conflict(self, client: TestClient, make_url: Callable[[str], str]):
+        url = make_url(self.router_prefix)
+        response = client.post(url, json={"name": "Jack", "username": "jack"})
+        assert response.status_code == 200
+
+        # Commit failures (duplicate usernames) are client errors.
+        response = client.post(url, json={"name": "Jack", "username": "jack"})
+        assert response.status_code == 400
+
     def test_create_success(self, client: TestClient, make_url: Callable[[str], str]):
         base_url = make_url(self.router_prefix)
 
@@ -122,3 +134,248 @@ class TestCustomerAPI(_TestAPI):
 
         response = client.delete(id_url)
         assert response.status_code == 404
+
+    def test_conditional_requests(self, client: TestClient, make_url: Callable[[str], str]):
+        base_url = make_url(self.router_prefix)
+        id_url = make_url(f"{self.router_prefix}/1")
+
+        response = client.post(base_url, json={"name": "Jack", "username": "jack"})
+        assert response.status_code == 200
+        assert response.json()["version"] == 1
+
+        # -- Conditional get
+
+        response = client.get(id_url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert etag == '"1"'
+
+        response = client.get(id_url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+        response = client.get(id_url, headers={"If-None-Match": '"2"'})
+        assert response.status_code == 200
+
+        # -- Conditional update
+
+        response = client.put(id_url, json={"name": "John"}, headers={"If-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["version"] == 2
+        assert response.headers["ETag"] == '"2"'
+
+        response = client.put(id_url, json={"name": "Jim"}, headers={"If-Match": etag})
+        assert response.status_code == 412
+
+        response = client.put(id_url, json={"name": "Jim"}, headers={"If-Match": "invalid"})
+        assert response.status_code == 412
+
+        response = client.get(id_url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["name"] == "John"
+
+        # -- Conditional delete
+
+        response = client.delete(id_url, headers={"If-Match": etag})
+        assert response.status_code == 412
+
+        response = client.delete(id_url, headers={"If-Match": '"2"'})
+        assert response.status_code == 200
+
+        response = client.delete(id_url, headers={"If-Match": '"2"'})
+        assert response.status_code == 404
+
+    def test_get_all_paging(self, client: TestClient, make_url: Callable[[str], str]):
+        base_url = make_url(self.router_prefix)
+
+        for i in range(5):
+            response = client.post(base_url, json={"name": f"Customer {i}", "username": f"customer{i}"})
+            assert response.status_code == 200
+
+        ids: list[int] = []
+        url: str | None = f"{base_url}?limit=2"
+        while url is not None:
+            response = client.get(url)
+            assert response.status_code == 200
+
+            response_data = response.json()
+            assert 0 < len(response_data) <= 2
+            ids.extend(item["id"] for item in response_data)
+
+            url = response.links.get("next", {}).get("url")
+
+        assert ids == [1, 2, 3, 4, 5]
+
+    def test_bulk(self, client: TestClient, make_url: Callable[[str], str]):
+        bulk_url = make_url(f"{self.router_prefix}/bulk")
+
+        customers = [{"name": f"Customer {i}", "username": f"customer{i}"} for i in range(3)]
+        customers.append(customers[0])  # Duplicate username.
+
+        response = client.post(bulk_url, json=customers)
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data["succeeded"] == 3
+        assert [error["index"] for error in response_data["errors"]] == [3]
+
+        response = client.put(bulk_url, json=[{"id": 1, "data": {"name": "New Name"}}, {"id": 42, "data": {}}])
+        assert response.status_code == 200
+        assert response.json() == {"succeeded": 1, "errors": [{"index": 1, "detail": "Not found: 42"}]}
+
+        response = client.get(make_url(f"{self.router_prefix}/1"))
+        assert response.json()["name"] == "New Name"
+
+        response = client.request("DELETE", bulk_url, json=[2, 3, 42])
+        assert response.status_code == 200
+        assert response.json() == {"succeeded": 2, "errors": [{"index": 2, "detail": "Not found: 42"}]}
+
+        response = client.get(make_url(self.router_prefix))
+        assert [item["id"] for item in response.json()] == [1]
+
+    def test_export(self, client: TestClient, make_url: Callable[[str], str]):
+        items = [{"name": f"Customer {i}", "username": f"export{i}"} for i in range(5)]
+        response = client.post(make_url(f"{self.router_prefix}/bulk"), json=items)
+        assert response.status_code == 200
+
+        expected = client.get(make_url(self.router_prefix)).json()
+
+        response = client.get(make_url(f"{self.router_prefix}/export"))
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+        response = client.get(make_url(f"{self.router_prefix}/export"), params={"format": "csv"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [row["username"] for row in rows] == [item["username"] for item in expected]
+        assert [row["created_at"] for row in rows] == [item["created_at"] for item in expected]
+
+    def test_get_eligible_coupons(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        for username in ("eligible1", "eligible2"):
+            response = client.post(make_url(self.router_prefix), json={"name": username, "username": username})
+            assert response.status_code == 200
+
+        for code, valid_from, valid_until in (
+            ("PUBLIC1", now - timedelta(days=1), now + timedelta(days=3)),
+            ("LINKED1", now - timedelta(days=1), now + timedelta(days=1)),
+            ("EXPIRED1", now - timedelta(days=2), now - timedelta(days=1)),
+            ("FUTURE1", now + timedelta(days=1), now + timedelta(days=2)),
+        ):
+            data = {
+                "code": code,
+                "description": code,
+                "discount": 10,
+                "discount_type": "percent",
+                "valid_from": valid_from.isoformat(),
+                "valid_until": valid_until.isoformat(),
+            }
+            response = client.post(make_url("coupon"), json=data)
+            assert response.status_code == 200
+
+        def link(customer_id: int, coupon_id: int) -> None:
+            response = client.post(
+                make_url("customer-coupon"), json={"customer_id": customer_id, "coupon_id": coupon_id}
+            )
+            assert response.status_code == 200
+
+        def unlink(customer_id: int, coupon_id: int) -> None:
+            response = client.delete(make_url(f"customer-coupon/{customer_id}/{coupon_id}"))
+            assert response.status_code == 200
+
+        def assert_eligible(expected: dict[int, list[str]]) -> None:
+            # Every check is repeated, the first request may load the data and the second may be served from the view.
+            for _ in range(2):
+                for customer_id, codes in expected.items():
+                    response = client.get(make_url(f"{self.router_prefix}/{customer_id}/coupons/eligible"))
+                    assert response.status_code == 200
+                    assert [item["code"] for item in response.json()] == codes
+
+        link(1, 2)
+        assert_eligible({1: ["LINKED1", "PUBLIC1"], 2: ["PUBLIC1"]})
+
+        response = client.put(make_url("coupon/3"), json={"valid_until": (now + timedelta(days=2)).isoformat()})
+        assert response.status_code == 200
+        assert_eligible({1: ["LINKED1", "EXPIRED1", "PUBLIC1"], 2: ["EXPIRED1", "PUBLIC1"]})
+
+        link(2, 1)
+        assert_eligible({1: ["LINKED1", "EXPIRED1"], 2: ["EXPIRED1", "PUBLIC1"]})
+
+        response = client.put(make_url("coupon/2"), json={"valid_until": (now + timedelta(days=4)).isoformat()})
+        assert response.status_code == 200
+        assert_eligible({1: ["EXPIRED1", "LINKED1"], 2: ["EXPIRED1", "PUBLIC1"]})
+
+        unlink(2, 1)
+        unlink(1, 2)
+        assert_eligible({1: ["EXPIRED1", "PUBLIC1", "LINKED1"], 2: ["EXPIRED1", "PUBLIC1", "LINKED1"]})
+
+        response = client.delete(make_url("coupon/1"))
+        assert response.status_code == 200
+        assert_eligible({1: ["EXPIRED1", "LINKED1"], 2: ["EXPIRED1", "LINKED1"]})
+
+        # Redeemed links and exhausted coupons are not eligible.
+        link(1, 2)
+        assert_eligible({1: ["EXPIRED1", "LINKED1"], 2: ["EXPIRED1"]})
+        response = client.post(make_url("coupon/by-code/LINKED1/redeem"), json={"customer_id": 1})
+        assert response.status_code == 200
+        assert_eligible({1: ["EXPIRED1"], 2: ["EXPIRED1"]})
+
+        valid = {
+            "valid_from": (now - timedelta(days=1)).isoformat(),
+            "valid_until": (now + timedelta(days=5)).isoformat(),
+        }
+        data = {"code": "LIMITED1", "description": "", "discount": 10, "discount_type": "fix", "max_uses": 1, **valid}
+        response = client.post(make_url("coupon"), json=data)
+        assert response.status_code == 200
+        assert_eligible({1: ["EXPIRED1", "LIMITED1"], 2: ["EXPIRED1", "LIMITED1"]})
+        response = client.post(make_url("coupon/by-code/LIMITED1/redeem"), json={})
+        assert response.status_code == 200
+        assert_eligible({1: ["EXPIRED1"], 2: ["EXPIRED1"]})
+
+        # Imported coupons are public.
+        data = {"code": "IMPORT1", "description": "", "discount": 10, "discount_type": "fix", **valid}
+        response = client.post(make_url("coupon/import"), files={"file": ("coupons.ndjson", json.dumps(data))})
+        assert response.status_code == 200
+        assert response.json()["imported"] == 1
+        assert_eligible({1: ["EXPIRED1", "IMPORT1"], 2: ["EXPIRED1", "IMPORT1"]})
+
+        response = client.get(make_url(f"{self.router_prefix}/42/coupons/eligible"))
+        assert response.status_code == 404
+
+    def test_get_eligible_coupons_pages(self, client: TestClient, make_url: Callable[[str], str]):
+        now = datetime.utcnow()
+        response = client.post(make_url(self.router_prefix), json={"name": "Paged", "username": "paged"})
+        assert response.status_code == 200
+
+        for i in range(5):
+            data = {
+                "code": f"PAGED{i}",
+                "description": "",
+                "discount": 10,
+                "discount_type": "percent",
+                "valid_from": (now - timedelta(days=1)).isoformat(),
+                "valid_until": (now + timedelta(days=5 - i)).isoformat(),
+            }
+            response = client.post(make_url("coupon"), json=data)
+            assert response.status_code == 200
+
+        response = client.post(make_url("customer-coupon"), json={"customer_id": 1, "coupon_id": 3})
+        assert response.status_code == 200
+
+        # Pages are served from the view after the first request.
+        for _ in range(2):
+            codes: list[str] = []
+            url: str | None = make_url(f"{self.router_prefix}/1/coupons/eligible?limit=2")
+            while url is not None:
+                response = client.get(url)
+                assert response.status_code == 200
+                assert len(response.json()) <= 2
+                codes.extend(item["code"] for item in response.json())
+                url = response.links.get("next", {}).get("url")
+
+            assert codes == ["PAGED4", "PAGED3", "PAGED2", "PAGED1", "PAGED0"]
+
+        for cursor in ("invalid", "W251bGwsbnVsbCwxXQ=="):  # The second one is [null,null,1].
+            response = client.get(make_url(f"{self.router_prefix}/1/coupons/eligible?cursor={cursor}"))
+            assert response.status_code == 400
@@ -0,0 +1,17 @@
+import pytest
+
+from fastapi.testclient import TestClient
+
+from .test_api import TestCustomerAPI
+
+
+class TestAsyncCustomerAPI(TestCustomerAPI):
+    """
+    Runs the customer API tests with the async session provider.
+    """
+
+    __slots__ = ()
+
+    @pytest.fixture(name="client")
+    def client_fixture(self, async_client: TestClient) -> TestClient:
+        return async_client
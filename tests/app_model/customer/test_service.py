@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlmodel import Session
+
+from app_model.coupon.model import CouponCreate, DiscountType
+from app_model.coupon.service import CouponService
+from app_model.customer.model import CustomerCreate
+from app_model.customer.service import CustomerService
+from app_model.customer_coupon.eligibility import EligibleCouponView
+from app_model.customer_coupon.model import CustomerCouponCreate
+from app_model.customer_coupon.service import CustomerCouponService
+from app_utils.service import InvalidCursor, NotFound
+
+
+class TestEligibleCoupons:
+    __slots__ = ()
+
+    @pytest.mark.parametrize("with_view", (False, True))
+    def test_pages(self, session: Session, with_view: bool):
+        now = datetime.utcnow()
+        customers = CustomerService(session)
+        for username in ("paged1", "paged2"):
+            customers.create(CustomerCreate(name=username, username=username))
+
+        coupons = CouponService(session)
+        for code, valid_from, valid_until, max_uses in (
+            ("PUBLIC1", now - timedelta(days=1), now + timedelta(days=4), None),
+            ("PUBLIC2", now - timedelta(days=1), now + timedelta(days=2), None),
+            ("LINKED1", now - timedelta(days=1), now + timedelta(days=3), None),
+            ("LINKED2", now - timedelta(days=1), now + timedelta(days=1), None),
+            ("OTHER1", now - timedelta(days=1), now + timedelta(days=1), None),
+            ("EXPIRED1", now - timedelta(days=2), now - timedelta(days=1), None),
+            ("FUTURE1", now + timedelta(days=1), now + timedelta(days=2), None),
+            ("EXHAUSTED1", now - timedelta(days=1), now + timedelta(days=1), 1),
+        ):
+            coupons.create(
+                CouponCreate(
+                    code=code,
+                    description=code,
+                    discount=10,
+                    discount_type=DiscountType.percent,
+                    valid_from=valid_from,
+                    valid_until=valid_until,
+                    max_uses=max_uses,
+                )
+            )
+
+        links = CustomerCouponService(session)
+        for customer_id, coupon_id in ((1, 3), (1, 4), (2, 5)):
+            links.create(CustomerCouponCreate(customer_id=customer_id, coupon_id=coupon_id))
+
+        coupons.redeem("EXHAUSTED1")
+
+        view = EligibleCouponView(max_size=10, ttl=60) if with_view else None
+        service = CustomerService(session, eligible_coupon_view=view)
+        codes: list[str] = []
+        cursor: str | None = None
+        while True:
+            items, cursor = service.get_eligible_coupons(1, limit=2, cursor=cursor)
+            assert len(items) <= 2
+            codes.extend(item.code for item in items)
+            if cursor is None:
+                break
+
+        assert codes == ["LINKED2", "PUBLIC2", "LINKED1", "PUBLIC1"]
+
+        items, cursor = service.get_eligible_coupons(1, limit=4)
+        assert [item.code for item in items] == codes
+        assert cursor is None
+
+        with pytest.raises(InvalidCursor):
+            service.get_eligible_coupons(1, limit=2, cursor="invalid")
+
+        with pytest.raises(NotFound):
+            service.get_eligible_coupons(42, limit=2)
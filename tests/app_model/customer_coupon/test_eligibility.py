@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+import time
+
+from app_model.coupon.model import Coupon, DiscountType
+from app_model.customer_coupon.eligibility import EligibleCouponView
+
+NOW = datetime.now(timezone.utc)
+
+
+def make_coupon(
+    id: int,
+    *,
+    valid_from: datetime = NOW - timedelta(days=1),
+    valid_until: datetime = NOW + timedelta(days=1),
+    max_uses: int | None = None,
+    uses: int = 0,
+):
+    return Coupon(
+        id=id,
+        code=f"COUPON{id}",
+        description="",
+        discount=10,
+        discount_type=DiscountType.fix,
+        valid_from=valid_from,
+        valid_until=valid_until,
+        max_uses=max_uses,
+        created_at=NOW,
+        uses=uses,
+        version=1,
+    )
+
+
+def get_ids(view: EligibleCouponView, customer_id: int) -> tuple[list[int] | None, list[int] | None]:
+    linked, public = view.get(customer_id, at=NOW)
+    return (
+        None if linked is None else sorted(c.id for c in linked),
+        None if public is None else sorted(c.id for c in public),
+    )
+
+
+class TestEligibleCouponView:
+    __slots__ = ()
+
+    def test_incremental_updates(self):
+        view = EligibleCouponView(max_size=10, ttl=60)
+        assert get_ids(view, 1) == (None, None)
+
+        view.set_linked(1, [make_coupon(1), make_coupon(2, valid_until=NOW)], version=view.version)
+        view.set_public([make_coupon(3), make_coupon(4, valid_from=NOW + timedelta(seconds=1))], version=view.version)
+        assert get_ids(view, 1) == ([1], [3])
+
+        view.add_link(1, make_coupon(3))
+        assert get_ids(view, 1) == ([1, 3], [])
+
+        view.update_coupon(make_coupon(2), public=False)
+        view.add_public(make_coupon(5))
+        assert get_ids(view, 1) == ([1, 2, 3], [5])
+
+        view.remove_link(1, 3, public_coupon=make_coupon(3))
+        view.remove_coupon(1)
+        assert get_ids(view, 1) == ([2], [3, 5])
+
+        view.invalidate_coupon(2)
+        assert get_ids(view, 1) == (None, None)
+
+        stats = view.stats()
+        assert (stats.hits, stats.misses, stats.size) == (4, 2, 0)
+
+    def test_redeemed_and_exhausted_coupons(self):
+        view = EligibleCouponView(max_size=10, ttl=60)
+        view.set_linked(1, [make_coupon(1), make_coupon(2, max_uses=2, uses=2)], version=view.version)
+        view.set_public([make_coupon(3, max_uses=2, uses=1)], version=view.version)
+        assert get_ids(view, 1) == ([1], [3])
+
+        view.remove_redeemed(1, 1)
+        view.update_coupon(make_coupon(3, max_uses=2, uses=2), public=True)
+        assert get_ids(view, 1) == ([], [])
+
+    def test_concurrent_change_during_load(self):
+        view = EligibleCouponView(max_size=10, ttl=60)
+        version = view.version
+        view.add_link(1, make_coupon(1))  # Committed after the data below was loaded.
+        view.set_linked(1, [], version=version)
+        view.set_public([make_coupon(1)], version=version)
+        assert get_ids(view, 1) == (None, None)
+
+    def test_lru_eviction_and_expiration(self):
+        view = EligibleCouponView(max_size=2, ttl=0.05)
+        for customer_id in (1, 2, 3):
+            view.set_linked(customer_id, [make_coupon(customer_id)], version=view.version)
+
+        assert get_ids(view, 1)[0] is None
+        assert get_ids(view, 3)[0] == [3]
+
+        time.sleep(0.1)
+        assert get_ids(view, 3)[0] is None
+        assert view.stats().size == 1
@@ -0,0 +1,90 @@
+import pytest
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, inspect, text, update
+from sqlmodel import SQLModel, create_engine
+
+from app_model import initialize_database
+from app_model.schema import SchemaMismatch, get_schema_fingerprint, read_schema_fingerprint, schema_version_table
+
+
+class TestSchema:
+    __slots__ = ()
+
+    def test_fingerprint(self):
+        engine = create_engine("sqlite://")
+        metadata = MetaData()
+        Table("a", metadata, Column("id", Integer, primary_key=True))
+        fingerprint = get_schema_fingerprint(metadata, engine.dialect)
+        assert fingerprint == get_schema_fingerprint(metadata, engine.dialect)
+
+        Table("b", metadata, Column("id", Integer, primary_key=True))
+        assert get_schema_fingerprint(metadata, engine.dialect) != fingerprint
+
+    def test_initialize_database(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+        try:
+            assert read_schema_fingerprint(engine) is None
+            assert initialize_database(engine)
+            assert read_schema_fingerprint(engine) == get_schema_fingerprint(SQLModel.metadata, engine.dialect)
+            assert "coupon" in inspect(engine).get_table_names()
+
+            # The schema is current, the DDL is skipped.
+            assert not initialize_database(engine)
+            assert initialize_database(engine, force=True)
+
+            # Outdated fingerprint, for example after a model change.
+            with engine.begin() as connection:
+                connection.execute(update(schema_version_table).values(fingerprint="outdated"))
+
+            assert initialize_database(engine)
+            assert not initialize_database(engine)
+        finally:
+            engine.dispose()
+
+    def test_model_change(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+        try:
+            assert initialize_database(engine)
+
+            # Simulate a database that was initialized before the models got a new column and index.
+            with engine.begin() as connection:
+                connection.execute(text("DROP INDEX ix_coupon_valid_until_valid_from_id"))
+                connection.execute(text("ALTER TABLE coupon DROP COLUMN version"))
+                connection.execute(update(schema_version_table).values(fingerprint="outdated"))
+
+            # The column can not be added, the fingerprint is not updated and every startup fails.
+            for _ in range(2):
+                with pytest.raises(SchemaMismatch, match="coupon.version"):
+                    initialize_database(engine)
+                assert read_schema_fingerprint(engine) == "outdated"
+
+            # After the manual migration, the missing index is created.
+            with engine.begin() as connection:
+                connection.execute(text("ALTER TABLE coupon ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+            assert initialize_database(engine)
+            assert "ix_coupon_valid_until_valid_from_id" in {
+                index["name"] for index in inspect(engine).get_indexes("coupon")
+            }
+            assert not initialize_database(engine)
+        finally:
+            engine.dispose()
+
+    def test_new_model_column(self, tmp_path, monkeypatch: pytest.MonkeyPatch):
+        engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+        try:
+            assert initialize_database(engine)
+            fingerprint = read_schema_fingerprint(engine)
+
+            # A copy of the models with a new column, the models of the application are not changed.
+            metadata = MetaData()
+            for table in SQLModel.metadata.sorted_tables:
+                table.to_metadata(metadata)
+            metadata.tables["customer"].append_column(Column("nickname", String, nullable=True))
+            monkeypatch.setattr(SQLModel, "metadata", metadata)
+
+            with pytest.raises(SchemaMismatch, match="customer.nickname"):
+                initialize_database(engine)
+            assert read_schema_fingerprint(engine) == fingerprint
+        finally:
+            engine.dispose()
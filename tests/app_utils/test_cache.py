@@ -0,0 +1,32 @@
+import time
+
+from app_utils.cache import TTLCache
+
+
+class TestTTLCache:
+    __slots__ = ()
+
+    def test_lru_eviction(self):
+        cache: TTLCache[int, str] = TTLCache(max_size=2, ttl=60)
+        cache.set(1, "a")
+        cache.set(2, "b")
+        assert cache.get(1) == "a"  # 2 is now the least recently used entry.
+
+        cache.set(3, "c")
+        assert cache.get(2) is None
+        assert cache.get(1) == "a"
+        assert cache.get(3) == "c"
+
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.size) == (3, 1, 2)
+
+    def test_expiration_and_invalidation(self):
+        cache: TTLCache[int, str] = TTLCache(max_size=10, ttl=0.01)
+        cache.set(1, "a")
+        time.sleep(0.02)
+        assert cache.get(1) is None
+        assert cache.stats().size == 0
+
+        cache.set(1, "a")
+        cache.invalidate(1)
+        assert cache.get(1) is None
@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+import hashlib
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlmodel import create_engine
+
+from app_model import initialize_database
+from app_model.idempotency.model import IdempotencyKeyTable
+from app_model.idempotency.store import DatabaseIdempotencyStore
+from app_utils.idempotency import IdempotencyMiddleware, IdempotencyRecord, StoredResponse
+
+
+def make_store(tmp_path, *, cache_size: int = 10) -> DatabaseIdempotencyStore:
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}", connect_args={"check_same_thread": False})
+    initialize_database(engine)
+    return DatabaseIdempotencyStore(engine, ttl=60, lock_timeout=10, cache_size=cache_size)
+
+
+def make_app(store: DatabaseIdempotencyStore, **options) -> tuple[FastAPI, list[dict]]:
+    executed: list[dict] = []
+
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, store=store, **options)
+
+    @app.post("/items")
+    def create_item(item: dict) -> dict:
+        executed.append(item)
+        return {"id": len(executed), **item}
+
+    @app.post("/fail")
+    def fail() -> None:
+        executed.append({})
+        raise HTTPException(status_code=503)
+
+    return app, executed
+
+
+class TestIdempotency:
+    __slots__ = ()
+
+    def test_replay(self, tmp_path):
+        store = make_store(tmp_path)
+        app, executed = make_app(store)
+        client = TestClient(app)
+        headers = {"Idempotency-Key": "key-1"}
+
+        response = client.post("/items", json={"name": "a"}, headers=headers)
+        assert response.status_code == 200
+        assert "idempotent-replayed" not in response.headers
+
+        for _ in range(2):
+            replayed = client.post("/items", json={"name": "a"}, headers=headers)
+            assert replayed.status_code == 200
+            assert replayed.json() == response.json() == {"id": 1, "name": "a"}
+            assert replayed.headers["idempotent-replayed"] == "true"
+            assert replayed.headers["content-type"] == response.headers["content-type"]
+
+        assert len(executed) == 1
+
+        # A different request with the same key.
+        response = client.post("/items", json={"name": "b"}, headers=headers)
+        assert response.status_code == 422
+
+        # Requests without a key and with other keys are executed.
+        assert client.post("/items", json={"name": "a"}).json()["id"] == 2
+        assert client.post("/items", json={"name": "a"}, headers={"Idempotency-Key": "key-2"}).json()["id"] == 3
+
+        assert client.post("/items", json={}, headers={"Idempotency-Key": "k" * 256}).status_code == 400
+
+        # Paths are part of the stored key, longer paths than the column are rejected before reaching the app.
+        long_path = "/items/" + "p" * 256
+        assert client.post(long_path, json={}, headers={"Idempotency-Key": "key-3"}).status_code == 414
+        assert client.post(long_path, json={}).status_code == 404
+
+        # Other workers (without the cached response) replay the stored response.
+        other_app, other_executed = make_app(make_store(tmp_path, cache_size=0))
+        replayed = TestClient(other_app).post("/items", json={"name": "a"}, headers=headers)
+        assert replayed.json() == {"id": 1, "name": "a"}
+        assert replayed.headers["idempotent-replayed"] == "true"
+        assert len(other_executed) == 0
+
+    def test_size_limits(self, tmp_path):
+        store = make_store(tmp_path)
+        app, executed = make_app(store, max_body_size=64, max_response_size=64)
+        client = TestClient(app)
+
+        response = client.post("/items", json={"name": "a" * 100}, headers={"Idempotency-Key": "large-request"})
+        assert response.status_code == 413
+        assert executed == []
+
+        def stream():
+            yield b'{"name": '
+            yield b'"' + b"a" * 100 + b'"}'
+
+        # Without Content-Length, the body is read until the limit.
+        response = client.post("/items", content=stream(), headers={"Idempotency-Key": "large-request"})
+        assert response.status_code == 413
+        assert executed == []
+
+        # Requests without a key are not limited.
+        assert client.post("/items", json={"name": "a" * 100}).status_code == 200
+
+        # Large responses are sent but not saved, the key is released.
+        headers = {"Idempotency-Key": "large-response"}
+        for id in (2, 3):
+            response = client.post("/items", json={"name": "a" * 50}, headers=headers)
+            assert response.status_code == 200
+            assert response.json()["id"] == id
+            assert "idempotent-replayed" not in response.headers
+
+    def test_failed_request_is_released(self, tmp_path):
+        store = make_store(tmp_path)
+        app, executed = make_app(store)
+        client = TestClient(app)
+
+        for _ in range(2):
+            assert client.post("/fail", headers={"Idempotency-Key": "key-1"}).status_code == 503
+
+        assert len(executed) == 2
+
+    def test_reservation(self, tmp_path):
+        store = make_store(tmp_path)
+        key = ("POST", "/items", "key-1")
+        fingerprint = hashlib.sha256(b"?{}").hexdigest()  # No query string, empty JSON object body.
+
+        assert store.reserve(key, fingerprint) is None
+        assert store.reserve(key, fingerprint) == IdempotencyRecord(fingerprint, None)
+
+        app, executed = make_app(store)
+        response = TestClient(app).post("/items", json={}, headers={"Idempotency-Key": "key-1"})
+        assert response.status_code == 409
+        assert len(executed) == 0
+
+        # The reservation of a failed worker expires after the lock timeout.
+        with store._engine.begin() as connection:
+            connection.execute(
+                update(IdempotencyKeyTable).values(created_at=datetime.utcnow() - timedelta(seconds=20))
+            )
+
+        assert store.reserve(key, "other") is None
+
+        record = IdempotencyRecord("other", StoredResponse(201, [("content-type", "text/plain")], b"created"))
+        store.save(key, record)
+        assert store.get_cached(key) == record
+        assert make_store(tmp_path, cache_size=0).reserve(key, "other") == record
+
+        store.release(key)
+        assert store.reserve(key, "other") == record
+
+        with store._engine.begin() as connection:
+            connection.execute(
+                update(IdempotencyKeyTable).values(created_at=datetime.utcnow() - timedelta(seconds=120))
+            )
+
+        assert store.delete_expired() == 1
+        assert store.reserve(key, "fingerprint") is None
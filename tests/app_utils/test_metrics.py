@@ -0,0 +1,92 @@
+import pytest
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session, create_engine
+
+from app.main import create_app, get_database_session
+from app.settings import get_settings
+from app_utils.metrics import Histogram, MetricsMiddleware, RequestMetrics, get_request_stats, instrument_engine
+
+
+def make_app(tmp_path) -> tuple[FastAPI, RequestMetrics]:
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}", connect_args={"check_same_thread": False})
+    instrument_engine(engine)
+    metrics = RequestMetrics()
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    def get_session():
+        with Session(engine) as session:
+            yield session
+
+    @app.get("/items/{count}")
+    def get_items(count: int, session: Session = Depends(get_session)) -> int:
+        # N+1 style route: one statement per item.
+        return sum(session.execute(text("SELECT :i"), {"i": i}).scalar_one() for i in range(count))
+
+    return app, metrics
+
+
+class TestMetrics:
+    __slots__ = ()
+
+    def test_histogram(self):
+        histogram = Histogram("latency", "Latency.", buckets=(1, 2))
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe((("route", "/a"),), value)
+
+        assert list(histogram.render()) == [
+            "# HELP latency Latency.",
+            "# TYPE latency histogram",
+            'latency_bucket{route="/a",le="1"} 2',
+            'latency_bucket{route="/a",le="2"} 3',
+            'latency_bucket{route="/a",le="+Inf"} 4',
+            'latency_sum{route="/a"} 6',
+            'latency_count{route="/a"} 4',
+        ]
+
+    def test_request_metrics(self, tmp_path):
+        app, metrics = make_app(tmp_path)
+        client = TestClient(app)
+
+        response = client.get("/items/3")
+        assert response.status_code == 200
+        assert 'desc="3 queries"' in response.headers["Server-Timing"]
+
+        response = client.get("/items/5")
+        assert 'desc="5 queries"' in response.headers["Server-Timing"]
+
+        assert client.get("/unknown").status_code == 404
+        assert get_request_stats() is None
+
+        rendered = metrics.render()
+        assert 'http_requests_total{method="GET",route="/items/{count}",status="200"} 2' in rendered
+        assert 'http_requests_total{method="GET",route="<unmatched>",status="404"} 1' in rendered
+        assert 'http_request_db_queries_sum{method="GET",route="/items/{count}"} 8' in rendered
+        assert 'http_request_db_queries_bucket{method="GET",route="/items/{count}",le="3"} 1' in rendered
+        assert 'http_request_duration_seconds_count{method="GET",route="/items/{count}"} 2' in rendered
+        assert 'http_request_pool_wait_seconds_count{method="GET",route="/items/{count}"} 2' in rendered
+
+    def test_metrics_route(self, client: TestClient, session: Session, monkeypatch: pytest.MonkeyPatch):
+        # Disabled by default.
+        assert client.get("/metrics").status_code == 404
+        assert "server-timing" not in client.get("/api/v1/coupon/").headers
+
+        monkeypatch.setenv("METRICS", "true")
+        get_settings.cache_clear()
+        try:
+            app = create_app()
+        finally:
+            get_settings.cache_clear()
+
+        app.dependency_overrides[get_database_session] = lambda: session
+        client = TestClient(app)
+        assert client.get("/api/v1/coupon/").status_code == 200
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'http_requests_total{method="GET",route="/api/v1/coupon/",status="200"} 1' in response.text
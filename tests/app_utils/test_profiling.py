@@ -0,0 +1,95 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+from typer.testing import CliRunner
+
+from app_cli.main import create_cli_app
+from app_model.coupon.service import CouponService
+from app_utils.profiling import ProfilingMiddleware, instrument_routes, load_profiles
+
+
+def make_app(session: Session, tmp_path, *, max_profiles: int = 1000, recount_interval: float = 10) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/coupons/{page}")
+    def get_coupons(page: int) -> int:
+        return len(CouponService(session).get_all())
+
+    @app.get("/ping")
+    async def ping() -> str:
+        return "pong"
+
+    instrument_routes(app.routes)
+    app.add_middleware(
+        ProfilingMiddleware,
+        directory=tmp_path,
+        secret="secret",
+        max_profiles=max_profiles,
+        recount_interval=recount_interval,
+    )
+    return app
+
+
+class TestProfiling:
+    __slots__ = ()
+
+    def test_profiling(self, session: Session, tmp_path):
+        client = TestClient(make_app(session, tmp_path))
+
+        assert client.get("/coupons/1").status_code == 200
+        assert client.get("/coupons/1", headers={"X-Profile": "wrong"}).status_code == 200
+        assert load_profiles(tmp_path) == []
+
+        assert client.get("/coupons/1", headers={"X-Profile": "secret"}).json() == 0
+        assert client.get("/ping", headers={"X-Profile": "secret"}).json() == "pong"
+        assert client.get("/unknown", headers={"X-Profile": "secret"}).status_code == 404
+
+        profiles = load_profiles(tmp_path)
+        assert [(info.method, info.route, info.status) for _, info in profiles] == [
+            ("GET", "/coupons/{page}", 200),
+            ("GET", "/ping", 200),
+        ]
+        assert profiles[0][1].services == ["Service.get_all"]
+        assert profiles[1][1].services == []
+        assert [info.route for _, info in load_profiles(tmp_path, route="/ping")] == ["/ping"]
+
+        result = CliRunner().invoke(create_cli_app(), ["profile-summary", "--directory", str(tmp_path)])
+        assert result.exit_code == 0
+        assert "GET /coupons/{page}: 1 profiles" in result.output
+        assert "services: Service.get_all" in result.output
+        assert "function calls" in result.output
+
+    def test_max_profiles(self, session: Session, tmp_path):
+        client = TestClient(make_app(session, tmp_path, max_profiles=2))
+        for _ in range(4):
+            assert client.get("/ping", headers={"X-Profile": "secret"}).status_code == 200
+
+        assert len(load_profiles(tmp_path)) == 2
+
+    def test_max_profiles_resume(self, session: Session, tmp_path):
+        client = TestClient(make_app(session, tmp_path, max_profiles=2, recount_interval=0))
+        for _ in range(3):
+            assert client.get("/ping", headers={"X-Profile": "secret"}).status_code == 200
+
+        profiles = load_profiles(tmp_path)
+        assert len(profiles) == 2
+
+        # Profiling continues once old profiles are removed.
+        for path, _ in profiles:
+            path.unlink()
+            path.with_suffix(".json").unlink()
+
+        assert client.get("/ping", headers={"X-Profile": "secret"}).status_code == 200
+        assert len(load_profiles(tmp_path)) == 1
+
+    def test_header_requires_secret(self, session: Session, tmp_path):
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping() -> str:
+            return "pong"
+
+        instrument_routes(app.routes)
+        app.add_middleware(ProfilingMiddleware, directory=tmp_path)
+        assert TestClient(app).get("/ping", headers={"X-Profile": ""}).status_code == 200
+        assert load_profiles(tmp_path) == []
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, create_engine
+
+from app.main import create_app
+from app.settings import get_settings
+from app_model import initialize_database
+from app_model.coupon.model import CouponTable, DiscountType
+from app_model.customer.model import CustomerTable
+from app_utils.replicas import ReplicaPool
+
+
+class TestReplicas:
+    __slots__ = ()
+
+    def test_replica_pool(self):
+        pool = ReplicaPool(["a", "b"])
+        assert [pool.get() for _ in range(3)] == ["a", "b", "a"]
+
+        with pytest.raises(ValueError):
+            ReplicaPool([])
+
+    @pytest.mark.parametrize("async_database", (False, True))
+    def test_read_your_writes(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, async_database: bool):
+        # The replica is not replicated, so the database that served a request is visible in its response.
+        primary_path, replica_path = tmp_path / "primary.db", tmp_path / "replica.db"
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{primary_path}")
+        monkeypatch.setenv("DATABASE_REPLICA_URLS", f'["sqlite:///{replica_path}"]')
+        if async_database:
+            monkeypatch.setenv("DATABASE_ASYNC_URL", f"sqlite+aiosqlite:///{primary_path}")
+            monkeypatch.setenv("DATABASE_ASYNC_REPLICA_URLS", f'["sqlite+aiosqlite:///{replica_path}"]')
+        get_settings.cache_clear()
+
+        replica_engine = create_engine(f"sqlite:///{replica_path}")
+        initialize_database(replica_engine)
+        with Session(replica_engine) as session:
+            session.add(CustomerTable(name="Replica", username="replica"))
+            session.commit()
+        replica_engine.dispose()
+
+        try:
+            with TestClient(create_app()) as client:
+                url = "/api/v1/customer/"
+                response = client.get(url)
+                assert response.status_code == 200
+                assert [item["name"] for item in response.json()] == ["Replica"]
+
+                response = client.post(url, json={"name": "Primary", "username": "primary"})
+                assert response.status_code == 200
+                assert "db_primary_until" in response.cookies
+
+                # Reads after the write use the primary.
+                assert [item["name"] for item in client.get(url).json()] == ["Primary"]
+                assert client.get(f"{url}1").json()["name"] == "Primary"
+
+                # Other clients and expired windows use the replica.
+                client.cookies.clear()
+                assert [item["name"] for item in client.get(url).json()] == ["Replica"]
+                response = client.get(url, cookies={"db_primary_until": "1"})
+                assert [item["name"] for item in response.json()] == ["Replica"]
+        finally:
+            get_settings.cache_clear()
+
+    @pytest.mark.parametrize("async_database", (False, True))
+    def test_replica_reads_are_not_cached(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, async_database: bool
+    ):
+        # The replica has a stale copy of the valid public coupon that expired on the primary.
+        primary_path, replica_path = tmp_path / "primary.db", tmp_path / "replica.db"
+        monkeypatch.setenv("DATABASE_URL", f"sqlite:///{primary_path}")
+        monkeypatch.setenv("DATABASE_REPLICA_URLS", f'["sqlite:///{replica_path}"]')
+        if async_database:
+            monkeypatch.setenv("DATABASE_ASYNC_URL", f"sqlite+aiosqlite:///{primary_path}")
+            monkeypatch.setenv("DATABASE_ASYNC_REPLICA_URLS", f'["sqlite+aiosqlite:///{replica_path}"]')
+        get_settings.cache_clear()
+
+        now = datetime.utcnow()
+        for path, valid_until in ((primary_path, now - timedelta(days=1)), (replica_path, now + timedelta(days=1))):
+            engine = create_engine(f"sqlite:///{path}")
+            initialize_database(engine)
+            with Session(engine) as session:
+                session.add(CustomerTable(name="Customer", username="customer"))
+                session.add(
+                    CouponTable(
+                        code="CODE",
+                        description="Coupon",
+                        discount=10,
+                        discount_type=DiscountType.fix,
+                        valid_from=now - timedelta(days=2),
+                        valid_until=valid_until,
+                    )
+                )
+                session.commit()
+            engine.dispose()
+
+        primary = {"db_primary_until": f"{now.timestamp() + 3600}"}
+        try:
+            with TestClient(create_app()) as client:
+                status_url, eligible_url = "/api/v1/coupon/1/status", "/api/v1/customer/1/coupons/eligible"
+                assert client.get(status_url).json() == {"status": "valid"}
+                assert [item["code"] for item in client.get(eligible_url).json()] == ["CODE"]
+                assert client.get("/api/v1/coupon/status/cache").json()["size"] == 0
+
+                # Primary reads see the current data and populate the shared caches.
+                assert client.get(status_url, cookies=primary).json() == {"status": "invalid"}
+                assert client.get(eligible_url, cookies=primary).json() == []
+                assert client.get("/api/v1/coupon/status/cache").json()["size"] == 1
+        finally:
+            get_settings.cache_clear()
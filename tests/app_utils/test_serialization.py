@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.main import get_database_session, register_routes
+from app_model.coupon.model import CouponTable, DiscountType
+from app_model.customer.model import CustomerTable
+from app_model.customer_coupon.model import CustomerCouponTable
+
+
+class TestFastSerialization:
+    __slots__ = ()
+
+    def _make_client(self, session: Session, *, fast_serialization: bool) -> TestClient:
+        app = FastAPI()
+        register_routes(app, api_prefix="/api", fast_serialization=fast_serialization)
+        app.dependency_overrides[get_database_session] = lambda: session
+        return TestClient(app)
+
+    @pytest.fixture
+    def seeded_session(self, session: Session) -> Session:
+        now = datetime.utcnow()
+        for i in range(7):
+            session.add(
+                CouponTable(
+                    code=f"CODE{i:04d}",
+                    description=f'Kupon {i} – ünïcode "quoted"',
+                    discount=12.5 if i % 2 else 10,
+                    discount_type=DiscountType.percent if i % 2 else DiscountType.fix,
+                    valid_from=now - timedelta(days=i),
+                    valid_until=(now + timedelta(days=i)).replace(microsecond=0),
+                    max_uses=i if i % 3 else None,
+                )
+            )
+            session.add(CustomerTable(name=f"Customer {i}", username=f"customer{i}"))
+        session.commit()
+
+        for i in range(1, 6):
+            session.add(CustomerCouponTable(customer_id=i, coupon_id=i, redeemed_at=now if i % 2 else None))
+        session.commit()
+        return session
+
+    @pytest.mark.parametrize("path", ("/api/coupon/", "/api/customer/", "/api/customer-coupon/"))
+    def test_output_is_identical(self, seeded_session: Session, path: str):
+        default_client = self._make_client(seeded_session, fast_serialization=False)
+        fast_client = self._make_client(seeded_session, fast_serialization=True)
+
+        url: str | None = f"{path}?limit=3"
+        pages = 0
+        while url is not None:
+            expected = default_client.get(url)
+            actual = fast_client.get(url)
+            assert actual.status_code == expected.status_code == 200
+            assert actual.headers["content-type"] == expected.headers["content-type"]
+            assert actual.content == expected.content
+            assert actual.headers.get("link") == expected.headers.get("link")
+
+            pages += 1
+            url = expected.links.get("next", {}).get("url")
+
+        assert pages > 1
+
+    def test_invalid_cursor(self, session: Session):
+        response = self._make_client(session, fast_serialization=True).get("/api/coupon/?cursor=invalid")
+        assert response.status_code == 400
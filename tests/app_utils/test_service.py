@@ -0,0 +1,192 @@
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from sqlmodel import Session, select
+
+from app_model.coupon.model import CouponTable, DiscountType
+from app_model.coupon.service import CouponService
+from app_model.customer.model import CustomerTable, CustomerUpdate
+from app_model.customer.service import CustomerService
+from app_model.customer_coupon.model import CustomerCouponTable
+from app_model.customer_coupon.service import CustomerCouponService
+from app_utils.service import InvalidCursor, NotFound, RelationLoading, VersionConflict
+
+
+class ORMCustomerService(CustomerService):
+    __slots__ = ()
+
+    single_statement_writes = False
+
+
+class TestService:
+    __slots__ = ()
+
+    def test_get_page_composite_key(self, session: Session):
+        keys = [(customer_id, coupon_id) for customer_id in range(1, 4) for coupon_id in range(1, 4)]
+        session.add_all([CustomerCouponTable(customer_id=c, coupon_id=k) for c, k in reversed(keys)])
+        session.commit()
+
+        service = CustomerCouponService(session)
+
+        result: list[tuple[int, int]] = []
+        cursor: str | None = None
+        while True:
+            items, cursor = service.get_page(limit=4, cursor=cursor)
+            result.extend((item.customer_id, item.coupon_id) for item in items)
+            if cursor is None:
+                break
+
+        assert result == keys
+
+    def test_get_page_invalid_cursor(self, session: Session):
+        service = CustomerCouponService(session)
+
+        with pytest.raises(InvalidCursor):
+            service.get_page(limit=1, cursor="bm90LWpzb24=")
+
+    def test_iter_all(self, session: Session):
+        keys = [(customer_id, coupon_id) for customer_id in range(1, 4) for coupon_id in range(1, 4)]
+        session.add_all([CustomerCouponTable(customer_id=c, coupon_id=k) for c, k in reversed(keys)])
+        session.commit()
+
+        service = CustomerCouponService(session)
+
+        rows = service.iter_all(["coupon_id", "customer_id"], batch_size=2)
+        assert [tuple(row) for row in rows] == [(k, c) for c, k in keys]
+
+        rows = service.iter_all(["customer_id"], where=[CustomerCouponTable.coupon_id == 2], batch_size=2)
+        assert [tuple(row) for row in rows] == [(1,), (2,), (3,)]
+
+    @pytest.mark.parametrize("loading", list(RelationLoading))
+    def test_get_related_page(self, session: Session, loading: RelationLoading):
+        now = datetime.utcnow()
+        session.add(
+            CouponTable(
+                code="ABCD1",
+                description="Coupon",
+                discount=1,
+                discount_type=DiscountType.fix,
+                valid_from=now,
+                valid_until=now,
+            )
+        )
+        session.add_all([CustomerTable(name=f"Customer {i}", username=f"customer{i}") for i in range(5)])
+        session.commit()
+        session.add_all([CustomerCouponTable(customer_id=id, coupon_id=1) for id in (4, 2, 5, 1)])
+        session.commit()
+        session.expunge_all()
+
+        statements: list[str] = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            service = CouponService(session)
+            items, cursor = service.get_related_page(1, "customers", limit=3, loading=loading)
+            assert [item.id for item in items] == [1, 2, 4]
+            assert cursor is not None
+            assert len(statements) == (1 if loading == RelationLoading.joined else 2)
+
+            items, cursor = service.get_related_page(1, "customers", limit=3, cursor=cursor, loading=loading)
+            assert [item.id for item in items] == [5]
+            assert cursor is None
+
+            with pytest.raises(NotFound):
+                service.get_related_page(42, "customers", limit=3, loading=loading)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+    @pytest.mark.parametrize(
+        ("service_class", "update_statements", "delete_statements"),
+        (
+            (CustomerService, 2, 2),  # UPDATE + SELECT (no RETURNING in SQLite), DELETE links + DELETE
+            (ORMCustomerService, 3, 4),  # SELECT + UPDATE + refresh, SELECT + SELECT links + DELETE links + DELETE
+        ),
+    )
+    def test_update_and_delete_statements(
+        self, session: Session, service_class: type[CustomerService], update_statements: int, delete_statements: int
+    ):
+        session.add_all([CustomerTable(name=f"Customer {i}", username=f"customer{i}") for i in range(2)])
+        session.add(
+            CouponTable(
+                code="ABCD1",
+                description="Coupon",
+                discount=1,
+                discount_type=DiscountType.fix,
+                valid_from=datetime.utcnow(),
+                valid_until=datetime.utcnow(),
+            )
+        )
+        session.commit()
+        session.add_all([CustomerCouponTable(customer_id=id, coupon_id=1) for id in (1, 2)])
+        session.commit()
+        session.expunge_all()
+
+        statements: list[str] = []
+
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        service = service_class(session)
+        engine = session.get_bind()
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            item = service.update(1, CustomerUpdate(name="Updated"))
+            assert (item.id, item.name, item.username) == (1, "Updated", "customer0")
+            assert len(statements) == update_statements
+
+            session.expunge_all()
+            statements.clear()
+            service.delete_by_pk(1)
+            assert len(statements) == delete_statements
+
+            with pytest.raises(NotFound):
+                service.update(1, CustomerUpdate(name="Updated"))
+
+            with pytest.raises(NotFound):
+                service.delete_by_pk(1)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+
+        assert session.get(CustomerTable, 1) is None
+        assert [link.customer_id for link in session.exec(select(CustomerCouponTable))] == [2]
+
+    @pytest.mark.parametrize("service_class", (CustomerService, ORMCustomerService))
+    def test_expected_version(self, session: Session, service_class: type[CustomerService]):
+        session.add_all([CustomerTable(name=f"Customer {i}", username=f"customer{i}") for i in range(2)])
+        session.commit()
+        session.expunge_all()
+
+        service = service_class(session)
+        item = service.update(1, CustomerUpdate(name="Updated"), expected_version=1)
+        assert (item.name, item.version) == ("Updated", 2)
+
+        item = service.update(1, CustomerUpdate(name="Updated again"))
+        assert item.version == 3
+
+        with pytest.raises(VersionConflict):
+            service.update(1, CustomerUpdate(name="Conflict"), expected_version=2)
+
+        with pytest.raises(NotFound):
+            service.update(42, CustomerUpdate(name="Missing"), expected_version=1)
+
+        with pytest.raises(VersionConflict):
+            service.delete_by_pk(1, expected_version=2)
+
+        service.delete_by_pk(1, expected_version=3)
+        session.expunge_all()
+        assert session.get(CustomerTable, 1) is None
+        other = session.get(CustomerTable, 2)
+        assert other is not None and other.version == 1
+
+    def test_update_statement_returning(self, session: Session):
+        statement = CustomerService(session)._make_update_statement(1, {"name": "Updated"}, returning=True)
+        sql = str(statement.compile(dialect=PGDialect()))
+        assert sql.startswith("UPDATE customer SET name=")
+        assert "RETURNING customer.username, customer.name, customer.id, customer.created_at" in sql
@@ -0,0 +1,29 @@
+from typing import Generator
+
+from pathlib import Path
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.settings import get_settings
+
+
+@pytest.fixture(name="async_client")
+def async_client_fixture(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Generator[TestClient, None, None]:
+    """
+    Client of an application that uses the async session provider where possible.
+
+    The sync and async engines share a temporary SQLite database file.
+    """
+    database_path = tmp_path / "database.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{database_path}")
+    monkeypatch.setenv("DATABASE_ASYNC_URL", f"sqlite+aiosqlite:///{database_path}")
+    get_settings.cache_clear()
+
+    try:
+        with TestClient(create_app()) as client:
+            yield client
+    finally:
+        get_settings.cache_clear()
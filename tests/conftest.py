@@ -1,3 +1,4 @@
+from .async_client_fixture import *  # noqa
 from .client_fixture import *  # noqa
 from .make_url_fixture import *  # noqa
 from .session_fixture import *  # noqa